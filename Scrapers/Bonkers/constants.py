@@ -15,4 +15,7 @@ BONKERS_URLS = {
     "womens_co_ord_sets": "https://www.bonkerscorner.com/collections/co-ord-sets",
     "womens_sweatshirt_hoodies": "https://www.bonkerscorner.com/collections/sweatshirts-hoodies-women",
 
-}
\ No newline at end of file
+}
+
+# Starting rate for the adaptive limiter; it used to be a fixed 1s sleep between pages
+REQUESTS_PER_SECOND = 1.0
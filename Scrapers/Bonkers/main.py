@@ -1,67 +1,226 @@
+import argparse
 import requests
 import json
+import os
 import re
+import sys
 from datetime import datetime
 import time
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, parse_qs, urlencode
-from constants import BONKERS_URLS
+from constants import BONKERS_URLS, REQUESTS_PER_SECOND
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.archive import RawArchive
+from shared.cache import ResponseCache
+from shared.checkpoint import Checkpoint
+from shared.extract import script_by_id
+from shared.fetcher import FetchEngine
+from shared.history import HistoryStore
+from shared.metrics import Metrics, profile_run
+from shared.models import BonkersProduct, ImageList, Variant
+from shared.output import convert_to_json
+from shared.parsepool import ParsePool
+from shared.ratelimit import shared_limiter
+from shared.seen_index import SeenIndex, SeenIds
+from shared.shopify import fetch_collection, image_urls
 
 class BonkersCornerScraper:
-    def __init__(self):
+    def __init__(self, ndjson=False, legacy_json=False, resume=False):
         self.base_url = "https://www.bonkerscorner.com"
-        self.seen_products = set()
-        self.products = []
-        self.headers = {
+        index = SeenIndex()
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Without --ndjson products still stream to disk, into a journal converted at the end
+        self.checkpoint = Checkpoint(index, "bonkers")
+        stem = f"bonkers_products_{self.timestamp}" if ndjson else self.checkpoint.journal_stem(self.timestamp)
+        state = self.checkpoint.begin(resume, datetime.now().isoformat(), stem, journal=not ndjson)
+        # Per-run dedup backed by the shared index; IDs are written with each checkpoint
+        self.seen_products = SeenIds(index, "bonkers", since=state["run_at"], commit_every=None)
+        # Price/availability deltas; removals are only trusted when every category finished
+        self.history = HistoryStore().begin("bonkers", state["run_at"])
+        # Every page body, so parser fixes can be replayed without a re-crawl
+        self.archive = RawArchive("bonkers", state["run_at"])
+        self.incomplete = False
+        self.metrics = Metrics("bonkers")
+        self.limiter = shared_limiter()
+        self.limiter.configure(self.base_url, REQUESTS_PER_SECOND)
+        self.product_count = state["products"]
+        self.legacy_json = legacy_json or state["journal"]
+        self.sink = self.checkpoint.open_sink()
+        self.headers = self._request_headers()
+
+    def _request_headers(self):
+        """Headers sent with every request; the crawl queue sends the same ones"""
+        return {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
         }
 
-    def run(self):
+    def run(self, concurrent=True, use_cache=True, bulk=False, parse_processes=0):
         print("Starting Bonkers Corner scrape...")
-        for category, base_url in BONKERS_URLS.items():
-            print(f"Scraping category: {category.replace('_', ' ').title()}")
-            self._scrape_category(base_url, category)
+        if bulk:
+            self._run_bulk(concurrent, use_cache)
+        elif concurrent:
+            self._run_concurrent(use_cache, parse_processes)
+        else:
+            for category, base_url in BONKERS_URLS.items():
+                if self.checkpoint.is_complete(category):
+                    continue
+                print(f"Scraping category: {category.replace('_', ' ').title()}")
+                self._scrape_category(base_url, category)
+            self.limiter.save()
         
-        self._save_data()
-        print(f"Total products scraped: {len(self.products)}")
+        with self.metrics.stage("save"):
+            self._save_data()
+        print(f"Total products scraped: {self.product_count}")
+        prom_path, _ = self.metrics.export()
+        print(f"Metrics written to {prom_path}")
 
     def _scrape_category(self, base_url, category):
-        page = 1
+        page = self.checkpoint.next_page(category)
         while True:
             url = f"{base_url}?page={page}"
-            response = requests.get(url, headers=self.headers)
+            self.limiter.acquire(url)
+            started = time.perf_counter()
+            with self.metrics.stage("fetch", category):
+                response = requests.get(url, headers=self.headers)
+            self.limiter.feedback(url, response, time.perf_counter() - started)
+            self.metrics.record_response(category, response.status_code, len(response.content))
             
-            if response.status_code != 200:
+            if response.status_code == 404:
                 break
+            if response.status_code != 200:
+                print(f"HTTP {response.status_code} on {url}, stopping {category}")
+                # Not complete: the page cursor stays where it is for the next run
+                self.incomplete = True
+                return
+            self.archive.store(category, response.url, response.content)
                 
             products = self._extract_products(response.text, category)
             if not products:
                 break
                 
-            self.products.extend(products)
+            self._emit(products)
             page += 1
-            time.sleep(1)
+            self._checkpoint(category, page)
+        self._checkpoint(category)
+
+    def _run_concurrent(self, use_cache=True, parse_processes=0):
+        """Crawl all collections at once, merging each in category order as soon as it is ready.
+
+        With ``parse_processes``, pages are parsed in that many worker
+        processes; dedup still happens here, in category order.
+        """
+        cache = ResponseCache("bonkers") if use_cache else None
+        parsers = ParsePool("bonkers", parse_processes) if parse_processes else None
+        engine = FetchEngine(headers=self.headers, cache=cache, metrics=self.metrics, limiter=self.limiter,
+                             archive=self.archive, parsers=parsers)
+        jobs = {
+            category: self._scrape_category_async(engine, base_url, category)
+            for category, base_url in BONKERS_URLS.items()
+            if not self.checkpoint.is_complete(category)
+        }
+
+        def merge(category, pages):
+            print(f"Scraping category: {category.replace('_', ' ').title()}")
+            if isinstance(pages, Exception):
+                print(f"Failed to scrape {category}: {str(pages)}")
+                self.incomplete = True
+                return
+            # Same stop rule as the sequential loop: first page with nothing new ends the category
+            for collection in pages:
+                with self.metrics.stage("transform", category):
+                    products = self._process_collection(collection, category)
+                if not products:
+                    break
+                self._emit(products)
+            self._checkpoint(category)
+
+        try:
+            engine.run(jobs, on_result=merge)
+        finally:
+            if parsers is not None:
+                parsers.close()
+        engine.report()
+
+    def _run_bulk(self, concurrent=True, use_cache=True):
+        """Enumerate collections through products.json instead of the HTML pages"""
+        cache = ResponseCache("bonkers") if use_cache else None
+        engine = FetchEngine(
+            headers={**self.headers, "Accept": "application/json"},
+            max_concurrency=8 if concurrent else 1,
+            cache=cache,
+            metrics=self.metrics,
+            limiter=self.limiter,
+            archive=self.archive,
+        )
+        jobs = {
+            category: fetch_collection(engine, base_url, label=category)
+            for category, base_url in BONKERS_URLS.items()
+            if not self.checkpoint.is_complete(category)
+        }
+        results = engine.run(jobs)
+
+        for category, pages in results.items():
+            print(f"Scraping category: {category.replace('_', ' ').title()}")
+            if isinstance(pages, Exception):
+                print(f"Failed to scrape {category}: {str(pages)}")
+                self.incomplete = True
+                continue
+            for page in pages:
+                with self.metrics.stage("transform", category):
+                    products = self._process_shopify_products(page, category)
+                self._emit(products)
+            self._checkpoint(category)
+
+        engine.report()
+
+    async def _scrape_category_async(self, engine, base_url, category):
+        def build_request(page):
+            return base_url, {"page": page}
+
+        def parse(response, page):
+            if response is None or response.status_code != 200:
+                return None
+            return self._extract_collection(response.content)
+
+        return await engine.paginate(
+            build_request, parse, start=self.checkpoint.next_page(category), label=category,
+            remote="_extract_collection",
+        )
 
     def _extract_products(self, html, category):
-        soup = BeautifulSoup(html, 'html.parser')
-        script_tag = soup.find('script', id='web-pixels-manager-setup')
-        
-        if not script_tag:
+        with self.metrics.stage("parse", category):
+            collection = self._extract_collection(html)
+        if not collection:
             return []
+        with self.metrics.stage("transform", category):
+            return self._process_collection(collection, category)
+
+    def _extract_collection(self, html):
+        """Pull the collection_viewed payload out of the web pixels script"""
+        script = script_by_id(html, 'web-pixels-manager-setup')
+        if script is None:
+            # Fall back to a full parse in case the markup defeats the fast path
+            soup = BeautifulSoup(html, 'html.parser')
+            script_tag = soup.find('script', id='web-pixels-manager-setup')
+            if not script_tag:
+                return None
+            script = script_tag.string
             
         # Extract JSON data from script
         pattern = r'webPixelsManagerAPI\.publish\("collection_viewed",\s*({.*?})\);'
-        match = re.search(pattern, script_tag.string, re.DOTALL)
+        match = re.search(pattern, script, re.DOTALL)
         
         if not match:
-            return []
+            return None
             
         try:
             data = json.loads(match.group(1))
-            return self._process_collection(data['collection'], category)
         except json.JSONDecodeError:
-            return []
+            return None
+        collection = data['collection']
+        return collection if collection['productVariants'] else None
 
     def _process_collection(self, collection, category):
         products = []
@@ -72,43 +231,99 @@ class BonkersCornerScraper:
             product_id = variant['product']['id']
             
             if product_id not in product_map:
-                product_map[product_id] = {
-                    "id": product_id,
-                    "title": variant['product']['title'],
-                    "url": urljoin(self.base_url, variant['product']['url']),
-                    "category": category,
-                    "vendor": variant['product']['vendor'],
-                    "variants": [],
-                    "images": set()
-                }
+                product_map[product_id] = (variant['product'], [], [])
+            _, variants, images = product_map[product_id]
                 
             # Add variant
-            product_map[product_id]['variants'].append({
-                "variant_id": variant['id'],
-                "price": variant['price']['amount'],
-                "size": variant['title'],
-                "sku": variant['sku']
-            })
+            variants.append(Variant(variant['id'], variant['price']['amount'], variant['title'], variant['sku']))
             
             # Add image
             if variant['image']['src']:
-                product_map[product_id]['images'].add(
-                    urljoin(self.base_url, variant['image']['src'])
-                )
+                images.append(urljoin(self.base_url, variant['image']['src']))
         
-        # Convert sets to lists and check duplicates
-        for product in product_map.values():
-            product['images'] = list(product['images'])
-            if product['id'] not in self.seen_products:
-                self.seen_products.add(product['id'])
-                products.append(product)
+        # Build compact products and check duplicates
+        for product_id, (product, variants, images) in product_map.items():
+            if product_id in self.seen_products:
+                continue
+            self.seen_products.add(product_id)
+            products.append(BonkersProduct(
+                product_id,
+                product['title'],
+                urljoin(self.base_url, product['url']),
+                category,
+                product['vendor'],
+                tuple(variants),
+                ImageList(images),
+            ))
                 
         return products
 
+    def _process_shopify_products(self, items, category):
+        """Same records as ``_process_collection``, built from products.json"""
+        products = []
+        for item in items:
+            product_id = str(item['id'])
+            if product_id in self.seen_products:
+                continue
+            self.seen_products.add(product_id)
+            products.append(BonkersProduct(
+                product_id,
+                item['title'],
+                urljoin(self.base_url, f"/products/{item['handle']}"),
+                category,
+                item['vendor'],
+                tuple(Variant(str(v['id']), float(v['price']), v['title'], v['sku']) for v in item['variants']),
+                ImageList(urljoin(self.base_url, src) for src in image_urls(item)),
+            ))
+        return products
+
+    def _emit(self, products):
+        """Hand a page of products to the NDJSON sink"""
+        self.sink.write_many(products)
+        self.product_count += len(products)
+        if products:
+            self.metrics.record_page(products[0].category, len(products))
+        self.history.observe([(p.id, self._product_price(p)) for p in products])
+
+    def _product_price(self, product):
+        """Lowest variant price, used as the product's price in the history store"""
+        prices = [float(v.price) for v in product.variants if v.price is not None]
+        return min(prices) if prices else None
+
+    def _checkpoint(self, category, next_page=None):
+        """Save the cursor; without ``next_page`` the category is done"""
+        self.checkpoint.commit(
+            self.sink, self.seen_products, self.history, self.product_count, category, next_page
+        )
+
     def _save_data(self):
-        with open("bonkers_products.json", "w") as f:
-            json.dump(self.products, f, indent=2)
+        self.seen_products.flush()
+        changes = self.history.finish(detect_removed=not self.incomplete)
+        print(f"History: {changes['new']} new | {changes['removed']} removed | {changes['price_changed']} price changes")
+        self.sink.close()
+        if self.legacy_json:
+            convert_to_json(self.sink.stem, "bonkers_products.json")
+        self.checkpoint.clear()
+        self.archive.close()
 
 if __name__ == "__main__":
-    scraper = BonkersCornerScraper()
-    scraper.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Bonkers Corner collections")
+    parser.add_argument("--sequential", action="store_true", help="fetch one page at a time")
+    parser.add_argument("--no-cache", action="store_true", help="skip the on-disk response cache")
+    parser.add_argument("--ndjson", action="store_true", help="stream products to NDJSON as pages are parsed")
+    parser.add_argument("--legacy-json", action="store_true", help="with --ndjson, also write bonkers_products.json")
+    parser.add_argument("--bulk", action="store_true", help="enumerate collections via Shopify products.json")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--parse-processes", type=int, default=0, help="parse pages in this many worker processes")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and tracemalloc")
+    args = parser.parse_args()
+
+    scraper = BonkersCornerScraper(ndjson=args.ndjson, legacy_json=args.legacy_json, resume=args.resume)
+    run = lambda: scraper.run(
+        concurrent=not args.sequential, use_cache=not args.no_cache, bulk=args.bulk,
+        parse_processes=args.parse_processes,
+    )
+    if args.profile:
+        profile_run(run, "bonkers")
+    else:
+        run()
\ No newline at end of file
@@ -8,4 +8,7 @@ URLS = {
     "streetwear_jackets": "https://www.shopcapsul.com/collections/streetwear-jackets",
     "streetwear_sweaters": "https://www.shopcapsul.com/collections/sweaters",
     "pants": "https://www.shopcapsul.com/collections/pants-denim",
-}
\ No newline at end of file
+}
+
+# Starting rate for the adaptive limiter (requests/s)
+REQUESTS_PER_SECOND = 2.0
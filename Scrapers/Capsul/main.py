@@ -1,46 +1,176 @@
+import argparse
 import requests
 import json
+import os
+import sys
+import time
+from datetime import datetime
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-from constants import URLS
+from constants import URLS, REQUESTS_PER_SECOND
 from green_cargos.services.shared.utils import random_useragent
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.archive import RawArchive
+from shared.cache import ResponseCache
+from shared.extract import scripts_by_type
+from shared.fetcher import FetchEngine
+from shared.metrics import Metrics, profile_run
+from shared.output import NdjsonWriter, convert_to_json
+from shared.parsepool import ParsePool
+from shared.ratelimit import shared_limiter
+from shared.seen_index import SeenIndex, SeenIds
+from shared.shopify import MAX_LIMIT, fetch_collection, image_urls, lowest_price, plain_text
+
 class CapsulScraper:
-    def __init__(self):
+    def __init__(self, ndjson=False, legacy_json=False, resume=False):
+        # Each collection is a single request, so there is no cursor to resume; the
+        # flag is accepted so the orchestrator can pass it to every scraper
         self.base_url = "https://www.shopcapsul.com"
-        self.seen_ids = set()
+        run_at = datetime.now().isoformat()
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.index = SeenIndex()
+        # Per-run dedup, so every run's output is a full snapshot of the store
+        self.seen_ids = SeenIds(self.index, "capsul", since=run_at)
         self.products = []
-        self.headers = {
-            "User-Agent": random_useragent(),
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        }
+        self.product_count = 0
+        self.metrics = Metrics("capsul")
+        # Every page body, so parser fixes can be replayed without a re-crawl
+        self.archive = RawArchive("capsul", run_at)
+        self.limiter = shared_limiter()
+        self.limiter.configure(self.base_url, REQUESTS_PER_SECOND)
+        self.legacy_json = legacy_json
+        self.sink = NdjsonWriter(f"capsul_products_{self.timestamp}") if ndjson else None
+        self.headers = self._request_headers()
         
         # Load existing products
         self._load_existing_data()
 
-    def run(self):
+    def _request_headers(self):
+        """Headers sent with every request; the crawl queue sends the same ones"""
+        return {
+            "User-Agent": random_useragent(),
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        }
+
+    def run(self, concurrent=True, use_cache=True, bulk=False, parse_processes=0):
         print("Starting Capsul scrape...")
-        for category, url in URLS.items():
-            print(f"Scraping category: {category.replace('_', ' ').title()}")
-            self._scrape_collection(url, category)
+        if bulk:
+            self._run_bulk(concurrent, use_cache)
+        elif concurrent:
+            self._run_concurrent(use_cache, parse_processes)
+        else:
+            for category, url in URLS.items():
+                print(f"Scraping category: {category.replace('_', ' ').title()}")
+                self._scrape_collection(url, category)
+            self.limiter.save()
         
-        self._save_data()
-        print(f"Total products scraped: {len(self.products)}")
+        with self.metrics.stage("save"):
+            self._save_data()
+        print(f"Total products scraped: {self.product_count}")
+        prom_path, _ = self.metrics.export()
+        print(f"Metrics written to {prom_path}")
+
+    def _run_concurrent(self, use_cache=True, parse_processes=0):
+        """Fetch all collections at once, merging each in category order as soon as it is ready.
+
+        With ``parse_processes``, pages are parsed in that many worker
+        processes; dedup still happens here, in category order.
+        """
+        cache = ResponseCache("capsul") if use_cache else None
+        parsers = ParsePool("capsul", parse_processes) if parse_processes else None
+        engine = FetchEngine(headers=self.headers, cache=cache, metrics=self.metrics, limiter=self.limiter,
+                             archive=self.archive, parsers=parsers)
+
+        def parse(response):
+            if response is None or not response.ok:
+                return None
+            return self._extract_itemlists(response.content)
+
+        jobs = {
+            category: engine.fetch_parsed(url, parse, label=category, remote="_extract_itemlists")
+            for category, url in URLS.items()
+        }
+
+        def merge(category, result):
+            print(f"Scraping category: {category.replace('_', ' ').title()}")
+            if isinstance(result, Exception) or result[1] is None:
+                print(f"Failed to scrape {category}")
+                return
+            with self.metrics.stage("transform", category):
+                for items in result[1]:
+                    self._process_itemlist(items, category)
+
+        try:
+            engine.run(jobs, on_result=merge)
+        finally:
+            if parsers is not None:
+                parsers.close()
+        engine.report()
+
+    def _run_bulk(self, concurrent=True, use_cache=True):
+        """Enumerate whole collections, with prices, through products.json"""
+        cache = ResponseCache("capsul") if use_cache else None
+        engine = FetchEngine(
+            headers={**self.headers, "Accept": "application/json"},
+            max_concurrency=8 if concurrent else 1,
+            cache=cache,
+            metrics=self.metrics,
+            limiter=self.limiter,
+            archive=self.archive,
+        )
+        results = engine.run({
+            category: fetch_collection(engine, url, label=category)
+            for category, url in URLS.items()
+        })
+
+        for category, pages in results.items():
+            print(f"Scraping category: {category.replace('_', ' ').title()}")
+            if isinstance(pages, Exception) or not pages:
+                print(f"Failed to scrape {category}")
+                continue
+            with self.metrics.stage("transform", category):
+                for page, items in enumerate(pages):
+                    self._process_shopify_products(items, category, first_position=page * MAX_LIMIT + 1)
+
+        engine.report()
 
     def _scrape_collection(self, url, category):
-        response = requests.get(url, headers=self.headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        scripts = soup.find_all('script', type='application/ld+json', attrs={'tt-ninja': True})
+        self.limiter.acquire(url)
+        started = time.perf_counter()
+        with self.metrics.stage("fetch", category):
+            response = requests.get(url, headers=self.headers)
+        self.limiter.feedback(url, response, time.perf_counter() - started)
+        self.metrics.record_response(category, response.status_code, len(response.content))
+        if response.status_code == 200:
+            self.archive.store(category, response.url, response.content)
+        with self.metrics.stage("parse", category):
+            itemlists = self._extract_itemlists(response.text)
+        with self.metrics.stage("transform", category):
+            for items in itemlists:
+                self._process_itemlist(items, category)
+
+    def _extract_itemlists(self, html):
+        """Return the itemListElement arrays from the page's ld+json blocks"""
+        scripts = scripts_by_type(html, 'application/ld+json', required_attr='tt-ninja')
+        if not scripts:
+            # Fall back to a full parse in case the markup defeats the fast path
+            soup = BeautifulSoup(html, 'html.parser')
+            tags = soup.find_all('script', type='application/ld+json', attrs={'tt-ninja': True})
+            scripts = [tag.string for tag in tags]
         
+        itemlists = []
         for script in scripts:
             try:
-                data = json.loads(script.string)
+                data = json.loads(script)
                 if data.get('@type') == 'ItemList':
-                    self._process_itemlist(data['itemListElement'], category)
+                    itemlists.append(data['itemListElement'])
             except json.JSONDecodeError:
                 continue
+        return itemlists
 
     def _process_itemlist(self, items, category):
+        products = []
         for item in items:
             product_id = self._extract_product_id(item['url'])
             if product_id in self.seen_ids:
@@ -48,7 +178,7 @@ class CapsulScraper:
                 
             self.seen_ids.add(product_id)
             
-            self.products.append({
+            products.append({
                 "id": product_id,
                 "name": self._clean_html_entities(item['name']),
                 "url": urljoin(self.base_url, item['url']),
@@ -58,21 +188,55 @@ class CapsulScraper:
                 "category": category,
                 "price": self._extract_price(item['description'])
             })
+        self._emit(products)
+
+    def _process_shopify_products(self, items, category, first_position=1):
+        """Same records as ``_process_itemlist``, built from products.json"""
+        products = []
+        for position, item in enumerate(items, start=first_position):
+            product_id = item['handle']
+            if product_id in self.seen_ids:
+                continue
+
+            self.seen_ids.add(product_id)
+
+            images = image_urls(item)
+            products.append({
+                "id": product_id,
+                "name": self._clean_html_entities(item['title']),
+                "url": urljoin(self.base_url, f"/products/{product_id}"),
+                "description": plain_text(item.get('body_html')),
+                "image": urljoin(self.base_url, images[0]) if images else None,
+                "position": position,
+                "category": category,
+                "price": lowest_price(item)
+            })
+        self._emit(products)
+
+    def _emit(self, products):
+        """Hand a page of products to the NDJSON sink, or keep them for the final dump"""
+        if self.sink:
+            self.sink.write_many(products)
+        else:
+            self.products.extend(products)
+        self.product_count += len(products)
+        if products:
+            self.metrics.record_page(products[0]["category"], len(products))
 
     def _load_existing_data(self):
-        """Load previously scraped products"""
+        """Carry products from a legacy products.json into this run's output"""
         try:
             with open("products.json", "r") as f:
                 existing = json.load(f)
-                self.products = existing
-                self.seen_ids = {p["id"] for p in existing}
         except FileNotFoundError:
-            pass
-
-    def _save_data(self):
-        """Save all products to single file"""
-        with open("products.json", "w") as f:
-            json.dump(self.products, f, indent=2)
+            return
+        for product in existing:
+            self.seen_ids.add(product["id"])
+        if self.sink:
+            self.sink.write_many(existing)
+        else:
+            self.products.extend(existing)
+        self.product_count += len(existing)
 
     # Keep existing helper methods:
     def _extract_product_id(self, url):
@@ -93,10 +257,35 @@ class CapsulScraper:
         return None
 
     def _save_data(self):
+        self.seen_ids.flush()
+        self.archive.close()
+        if self.sink:
+            self.sink.close()
+            if self.legacy_json:
+                convert_to_json(self.sink.stem, "capsul_products.json")
+            return
         with open("capsul_products.json", "w") as f:
             json.dump(self.products, f, indent=2)
     # _extract_product_id, _clean_html_entities, _extract_price
 
 if __name__ == "__main__":
-    scraper = CapsulScraper()
-    scraper.run()
+    parser = argparse.ArgumentParser(description="Scrape Capsul collections")
+    parser.add_argument("--sequential", action="store_true", help="fetch one collection at a time")
+    parser.add_argument("--no-cache", action="store_true", help="skip the on-disk response cache")
+    parser.add_argument("--ndjson", action="store_true", help="stream products to NDJSON as pages are parsed")
+    parser.add_argument("--legacy-json", action="store_true", help="with --ndjson, also write capsul_products.json")
+    parser.add_argument("--bulk", action="store_true", help="enumerate collections via Shopify products.json, with prices")
+    parser.add_argument("--resume", action="store_true", help="accepted for the orchestrator; collections have no cursor")
+    parser.add_argument("--parse-processes", type=int, default=0, help="parse pages in this many worker processes")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and tracemalloc")
+    args = parser.parse_args()
+
+    scraper = CapsulScraper(ndjson=args.ndjson, legacy_json=args.legacy_json, resume=args.resume)
+    run = lambda: scraper.run(
+        concurrent=not args.sequential, use_cache=not args.no_cache, bulk=args.bulk,
+        parse_processes=args.parse_processes,
+    )
+    if args.profile:
+        profile_run(run, "capsul")
+    else:
+        run()
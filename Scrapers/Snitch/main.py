@@ -1,104 +1,250 @@
+import argparse
+import asyncio
+import math
 import requests
 import time
 import json
 import os
+import sys
 from datetime import datetime
+from constants import REQUESTS_PER_SECOND
 from green_cargos.services.shared.utils import random_useragent
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.archive import RawArchive
+from shared.cache import ResponseCache
+from shared.checkpoint import Checkpoint
+from shared.fetcher import FetchEngine
+from shared.history import HistoryStore
+from shared.metrics import Metrics, profile_run
+from shared.output import convert_to_json, write_json_array
+from shared.ratelimit import shared_limiter
+from shared.seen_index import SeenIndex, SeenIds
+
 class SnitchScraper:
-    def __init__(self):
+    def __init__(self, ndjson=False, legacy_json=False, resume=False):
         self.base_url = "https://www.snitch.com"
         self.api_endpoint = "https://mxemjhp3rt.ap-south-1.awsapprunner.com/products/new-and-popular/v2"
         self.default_limit = 50  # API's maximum allowed limit
-        self.current_page = 1
+        self.index = SeenIndex()
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # The API is one feed, so metrics and the checkpoint cursor use a single category label
+        self.feed = "new_and_popular"
+        # Without --ndjson products still stream to disk, into a journal converted at the end
+        self.checkpoint = Checkpoint(self.index, "snitch")
+        stem = f"snitch_processed_{self.timestamp}" if ndjson else self.checkpoint.journal_stem(self.timestamp)
+        state = self.checkpoint.begin(resume, datetime.now().isoformat(), stem, journal=not ndjson)
+        self.current_page = self.checkpoint.next_page(self.feed)
         self.total_products = 0
-        self.fetched_products = 0
-        self.seen_ids = set()
-        
-        # Initialize data storage
-        self.all_products = []
-        self.processed_data = []
+        self.fetched_products = state["products"]
+        # IDs are written to the index with each checkpoint
+        self.seen_ids = SeenIds(self.index, "snitch", commit_every=None)
+        # Every product on every page is observed, including ones already seen.
+        # Removals are only trusted after a full fan-out crawl.
+        self.history = HistoryStore().begin("snitch", state["run_at"])
+        # Every API page, so parser fixes can be replayed without a re-crawl
+        self.archive = RawArchive("snitch", state["run_at"])
+        self.complete_crawl = False
+        self.metrics = Metrics("snitch")
+        self.limiter = shared_limiter()
+        self.limiter.configure(self.api_endpoint, REQUESTS_PER_SECOND)
         
         # File management
-        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # One scrape time per run, shared by every record
+        self.scraped_at = state["run_at"]
         self.raw_filename = f"snitch_raw_{self.timestamp}.json"
         self.processed_filename = f"snitch_processed_{self.timestamp}.json"
+        self.legacy_json = legacy_json or state["journal"]
+        self.sink = self.checkpoint.open_sink()
         
-        self.headers = {
+        self.headers = self._request_headers()
+
+    def _request_headers(self):
+        """Headers sent with every request; the crawl queue sends the same ones"""
+        return {
             "User-Agent": random_useragent(),
             "Accept": "application/json",
             "Referer": f"{self.base_url}/"
         }
 
-    def run(self):
+    def run(self, concurrent=True, fanout=False, budget=None, max_concurrency=8, use_cache=True):
         """Main execution flow with proper pagination"""
         print("Starting Snitch scrape...")
         self._load_existing_data()
         
-        while True:
-            response = self._fetch_page()
-            if not response or not response.get("data", {}).get("products"):
-                break
-                
-            data = response["data"]
-            products = data["products"]
-            
-            # Filter new products
-            new_products = [
-                p for p in products 
-                if p["shopify_product_id"] not in self.seen_ids
-            ]
-            
-            if not new_products:
-                print("\nReached end of new products. Stopping.")
-                break
-                
-            self._process_products(new_products)
-            self._update_progress(len(new_products), data["total_count"])
+        if fanout or concurrent:
+            engine = FetchEngine(
+                headers=self.headers,
+                max_concurrency=max_concurrency,
+                per_host=max_concurrency if fanout else 4,
+                cache=ResponseCache("snitch") if use_cache else None,
+                metrics=self.metrics,
+                limiter=self.limiter,
+                archive=self.archive,
+            )
+            if fanout:
+                engine.run({self.feed: self._fanout_async(engine, budget)})
+            else:
+                engine.run({self.feed: self._paginate_async(engine)})
+            engine.report()
+        else:
+            while True:
+                if not self._handle_page(self._fetch_page()):
+                    break
+                self.current_page += 1
+                self._checkpoint()
+            self.limiter.save()
             
-            # Check if we've fetched all available products
-            if self.fetched_products >= data["total_count"]:
+        with self.metrics.stage("save"):
+            self._save_data()
+        print(f"\nScraped {self.fetched_products}/{self.total_products} products")
+        prom_path, _ = self.metrics.export()
+        print(f"Metrics written to {prom_path}")
+
+    async def _paginate_async(self, engine):
+        """Page through the API on the shared fetch engine"""
+        while True:
+            payload = await self._fetch_page_async(engine, self.current_page)
+            if not self._handle_page(payload):
                 break
-                
             self.current_page += 1
-            time.sleep(0.5)
+            self._checkpoint()
+
+    async def _fanout_async(self, engine, budget=None):
+        """Read page 1, plan every page from total_count and fetch the rest at once.
+
+        ``budget`` caps the number of pages requested in this run. Fan-out
+        runs are not checkpointed; ``--resume`` only continues page walks.
+        """
+        first = await self._fetch_page_async(engine, 1)
+        if not first or not first.get("data", {}).get("products"):
+            return
+
+        total_count = first["data"]["total_count"]
+        last_page = math.ceil(total_count / self.default_limit)
+        if budget:
+            last_page = min(last_page, budget)
+        print(f"Planned {last_page} pages for {total_count} products")
+
+        complete = not budget or last_page * self.default_limit >= total_count
+        rest = await asyncio.gather(
+            *(self._fetch_page_async(engine, page) for page in range(2, last_page + 1))
+        )
+
+        # Merge in page order so dedup matches the sequential crawl
+        for page, payload in enumerate([first] + rest, start=1):
+            self.current_page = page
+            if not payload or not payload.get("data", {}).get("products"):
+                complete = False
+                continue
+            self._observe(payload["data"]["products"])
+            new_products = []
+            for product in payload["data"]["products"]:
+                if product["shopify_product_id"] in self.seen_ids:
+                    continue
+                self.seen_ids.add(product["shopify_product_id"])
+                new_products.append(product)
+            if new_products:
+                self._process_products(new_products)
+                self._update_progress(len(new_products), payload["data"]["total_count"])
+        self.complete_crawl = complete
+
+    def _observe(self, products):
+        self.history.observe([(p["shopify_product_id"], p.get("selling_price")) for p in products])
+
+    async def _fetch_page_async(self, engine, page):
+        """Fetch one API page through the engine; returns the decoded body or None"""
+        def decode(response):
+            try:
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                print(f"Failed to fetch page {page}: {str(e)}")
+                return None
+
+        _, payload = await engine.fetch_parsed(
+            self.api_endpoint,
+            decode,
+            params={
+                "page": page,
+                "limit": self.default_limit
+            },
+            retries=2,
+            label=self.feed,
+        )
+        return payload
+
+    def _handle_page(self, response):
+        """Process one API page; returns False once pagination should stop"""
+        if not response or not response.get("data", {}).get("products"):
+            return False
             
-        self._save_data()
-        print(f"\nScraped {self.fetched_products}/{self.total_products} products")
+        data = response["data"]
+        products = data["products"]
+        self._observe(products)
+        
+        # Filter new products
+        new_products = [
+            p for p in products 
+            if p["shopify_product_id"] not in self.seen_ids
+        ]
+        
+        if not new_products:
+            print("\nReached end of new products. Stopping.")
+            return False
+            
+        self._process_products(new_products)
+        self._update_progress(len(new_products), data["total_count"])
+        
+        # Check if we've fetched all available products
+        return self.fetched_products < data["total_count"]
 
     def _fetch_page(self):
         """Fetch a single page of products"""
+        self.limiter.acquire(self.api_endpoint)
+        started = time.perf_counter()
+        response = None
         try:
-            response = requests.get(
-                self.api_endpoint,
-                headers=self.headers,
-                params={
-                    "page": self.current_page,
-                    "limit": self.default_limit
-                },
-                timeout=30
-            )
+            with self.metrics.stage("fetch", self.feed):
+                response = requests.get(
+                    self.api_endpoint,
+                    headers=self.headers,
+                    params={
+                        "page": self.current_page,
+                        "limit": self.default_limit
+                    },
+                    timeout=30
+                )
+            self.limiter.feedback(self.api_endpoint, response, time.perf_counter() - started)
+            self.metrics.record_response(self.feed, response.status_code, len(response.content))
             response.raise_for_status()
-            return response.json()
+            self.archive.store(self.feed, response.url, response.content)
+            with self.metrics.stage("parse", self.feed):
+                return response.json()
         except Exception as e:
+            if response is None:
+                self.limiter.feedback(self.api_endpoint, None, time.perf_counter() - started)
             print(f"Failed to fetch page {self.current_page}: {str(e)}")
             return None
 
     def _load_existing_data(self):
-        """Load previous data to continue scraping"""
-        try:
-            # Load all JSON files in directory
-            for fname in os.listdir():
-                if fname.startswith("snitch_processed") and fname.endswith(".json"):
-                    with open(fname, "r") as f:
-                        data = json.load(f)
-                        for item in data:
-                            self.seen_ids.add(item["id"])
-                            self.total_products = max(self.total_products, item.get("total_count", 0))
-        except FileNotFoundError:
-            pass
+        """Import old processed snapshots into the seen-ID index on first use"""
+        if self.index.count("snitch"):
+            return
+        snapshots = sorted(
+            fname for fname in os.listdir()
+            if fname.startswith("snitch_processed") and fname.endswith((".json", ".ndjson", ".ndjson.part"))
+        )
+        if snapshots:
+            imported = self.index.import_snapshots("snitch", snapshots)
+            print(f"Imported {imported} products from {len(snapshots)} snapshots into the seen index")
 
     def _process_products(self, products):
+      with self.metrics.stage("transform", self.feed):
+          self._build_records(products)
+
+    def _build_records(self, products):
+      page = []
       for product in products:
           processed = {
               "id": product["shopify_product_id"],
@@ -114,12 +260,15 @@ class SnitchScraper:
               "colors": product["colors"],  # Color options array
               "main_image": product["preview_image"],
               "category": product["shopify_product_type"],
-              "scraped_at": datetime.now().isoformat(),
+              "scraped_at": self.scraped_at,
               "total_count": product.get("total_count", 0)
           }
           self.seen_ids.add(processed["id"])
           self.fetched_products += 1
-          self.processed_data.append(processed)
+          page.append(processed)
+      self.sink.write_many(page)
+      self.metrics.record_page(self.feed, len(page))
+
     def _parse_color_string(self, color_str):
       """Convert "['Beige']" → ["Beige"]"""
       if not color_str:
@@ -131,14 +280,53 @@ class SnitchScraper:
         progress = min((self.fetched_products / self.total_products) * 100, 100)
         print(f"Page {self.current_page}: +{new_count} products | Total: {self.fetched_products}/{self.total_products} ({progress:.1f}%)", end="\r")
 
+    def _checkpoint(self):
+        self.checkpoint.commit(
+            self.sink, self.seen_ids, self.history, self.fetched_products, self.feed, self.current_page
+        )
+
     def _save_data(self):
         """Save data with incremental naming"""
-        with open(self.raw_filename, "w") as f:
-            json.dump(self.all_products, f, indent=2)
+        self.seen_ids.flush()
+        changes = self.history.finish(detect_removed=self.complete_crawl)
+        print(f"\nHistory: {changes['new']} new | {changes['removed']} removed | {changes['price_changed']} price changes")
+        # Raw API products of every page this run fetched, including pages before a resume,
+        # read back from the archive one page at a time
+        raw_products = (
+            product
+            for body in self.archive.bodies()
+            for product in json.loads(body).get("data", {}).get("products") or []
+        )
+        write_json_array(raw_products, self.raw_filename)
+        self.archive.close()
             
-        with open(self.processed_filename, "w") as f:
-            json.dump(self.processed_data, f, indent=2)
+        self.sink.close()
+        if self.legacy_json:
+            convert_to_json(self.sink.stem, self.processed_filename)
+        self.checkpoint.clear()
 
 if __name__ == "__main__":
-    scraper = SnitchScraper()
-    scraper.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape the Snitch product API")
+    parser.add_argument("--sequential", action="store_true", help="use plain blocking requests")
+    parser.add_argument("--fanout", action="store_true", help="plan all pages from total_count and fetch them concurrently")
+    parser.add_argument("--budget", type=int, help="maximum number of pages to request in fan-out mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel requests in fan-out mode")
+    parser.add_argument("--no-cache", action="store_true", help="skip the on-disk response cache")
+    parser.add_argument("--ndjson", action="store_true", help="stream products to NDJSON as pages are parsed")
+    parser.add_argument("--legacy-json", action="store_true", help="with --ndjson, also write the snitch_processed JSON file")
+    parser.add_argument("--resume", action="store_true", help="continue the page walk from the last checkpoint")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and tracemalloc")
+    args = parser.parse_args()
+
+    scraper = SnitchScraper(ndjson=args.ndjson, legacy_json=args.legacy_json, resume=args.resume)
+    run = lambda: scraper.run(
+        concurrent=not args.sequential,
+        fanout=args.fanout,
+        budget=args.budget,
+        max_concurrency=args.concurrency,
+        use_cache=not args.no_cache,
+    )
+    if args.profile:
+        profile_run(run, "snitch")
+    else:
+        run()
\ No newline at end of file
@@ -17,4 +17,10 @@ ZARA_URLS = {
     "woman_coats": "https://www.zara.com/in/en/woman-outerwear-l1184.html?v1=2419032&regionGroupId=80&ajax=true",
     "woman_shoes": "https://www.zara.com/in/en/woman-shoes-l1251.html?v1=2445834&regionGroupId=80&ajax=true",
     "woman_bags": "https://www.zara.com/in/en/woman-bags-l1024.html?v1=2417728&regionGroupId=80&ajax=true",
-}
\ No newline at end of file
+}
+
+# Query params that only defeat caching; dropped from requests when the response cache is on
+CACHE_BUSTING_PARAMS = {"v1"}
+
+# Starting rate for the adaptive limiter; it used to be a fixed 1.2s sleep between pages
+REQUESTS_PER_SECOND = 1 / 1.2
@@ -1,39 +1,220 @@
+import argparse
+import os
+import sys
 import time
 import requests
-import json
 from urllib.parse import urljoin
 from datetime import datetime
-from constants import ZARA_URLS
+from constants import ZARA_URLS, CACHE_BUSTING_PARAMS, REQUESTS_PER_SECOND
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.archive import RawArchive
+from shared.cache import ResponseCache
+from shared.checkpoint import Checkpoint
+from shared.fetcher import FetchEngine, check_page
+from shared.history import HistoryStore
+from shared.jsonstream import CHUNK_SIZE, ArrayStream, iter_chunks, project
+from shared.metrics import Metrics, profile_run
+from shared.models import ImageList, ZaraProduct
+from shared.output import convert_to_json
+from shared.parsepool import ParsePool
+from shared.ratelimit import shared_limiter
+from shared.seen_index import SeenIndex, SeenIds
+
+# The parts of a commercial component that _extract_products and its helpers read
+PRODUCT_FIELDS = {
+    "type": None,
+    "id": None,
+    "name": None,
+    "price": None,
+    "seo": {"keyword": None, "seoProductId": None},
+    "detail": {"colors": {"xmedia": {"url": None}}},
+}
 
 class ZaraScraper:
-    def __init__(self):
+    def __init__(self, ndjson=False, legacy_json=False, resume=False):
         self.base_url = "https://www.zara.com"
-        self.seen_products = set()
-        self.products = []
-        self.headers = {
+        index = SeenIndex()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Without --ndjson products still stream to disk, into a journal converted at the end
+        self.checkpoint = Checkpoint(index, "zara")
+        stem = f"zara_products_{timestamp}" if ndjson else self.checkpoint.journal_stem(timestamp)
+        state = self.checkpoint.begin(resume, datetime.now().isoformat(), stem, journal=not ndjson)
+        # Per-run dedup backed by the shared index; IDs are written with each checkpoint
+        self.seen_products = SeenIds(index, "zara", since=state["run_at"], commit_every=None)
+        # Price/availability deltas; removals are only trusted when every category finished
+        self.history = HistoryStore().begin("zara", state["run_at"])
+        # Every page body, so parser fixes can be replayed without a re-crawl
+        self.archive = RawArchive("zara", state["run_at"])
+        self.incomplete = False
+        self.product_count = state["products"]
+        self.legacy_json = legacy_json
+        self.sink = self.checkpoint.open_sink(ensure_ascii=False)
+        self.headers = self._request_headers()
+        self.total_requests = 0
+        self.failed_requests = 0
+        self.run_timestamp = state["run_at"]
+        self.metrics = Metrics("zara")
+        self.limiter = shared_limiter()
+        self.limiter.configure(self.base_url, REQUESTS_PER_SECOND)
+
+    def _request_headers(self):
+        """Headers sent with every request; the crawl queue sends the same ones"""
+        return {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Accept": "application/json, text/plain, */*",
         }
-        self.total_requests = 0
-        self.failed_requests = 0
 
-    def run(self):
+    def run(self, concurrent=True, use_cache=True, parse_processes=0):
         print("🚀 Starting Zara scrape...")
         start_time = time.time()
         
-        for category, url in ZARA_URLS.items():
-            print(f"\n🔍 Scraping category: {category.replace('_', ' ').title()}")
-            self._scrape_category(url, category)
+        if concurrent:
+            self._run_concurrent(use_cache, parse_processes)
+        else:
+            for category, url in ZARA_URLS.items():
+                if self.checkpoint.is_complete(category):
+                    continue
+                print(f"\n🔍 Scraping category: {category.replace('_', ' ').title()}")
+                # A category that gave up keeps its page cursor for the next run
+                if self._scrape_category(url, category):
+                    self._checkpoint(category)
+            self.limiter.save()
         
-        self._save_data()
+        with self.metrics.stage("save"):
+            self._save_data()
         print(f"\n✅ Final Results:")
-        print(f"   Total Products: {len(self.products)}")
+        print(f"   Total Products: {self.product_count}")
         print(f"   Successful Requests: {self.total_requests}")
         print(f"   Failed Requests: {self.failed_requests}")
         print(f"   Execution Time: {time.time() - start_time:.2f}s")
+        prom_path, _ = self.metrics.export()
+        print(f"   Metrics: {prom_path}")
+
+    def _run_concurrent(self, use_cache=True, parse_processes=0):
+        """Crawl all categories at once, merging each in category order as soon as it is ready.
+
+        With ``parse_processes``, pages are parsed in that many worker
+        processes; dedup still happens here, in category order.
+        """
+        cache = ResponseCache("zara", busting_params=CACHE_BUSTING_PARAMS) if use_cache else None
+        parsers = ParsePool("zara", parse_processes) if parse_processes else None
+        engine = FetchEngine(headers=self.headers, cache=cache, metrics=self.metrics, limiter=self.limiter,
+                             archive=self.archive, parsers=parsers)
+        jobs = {
+            category: self._scrape_category_async(engine, url, category)
+            for category, url in ZARA_URLS.items()
+            if not self.checkpoint.is_complete(category)
+        }
+
+        def merge(category, pages):
+            print(f"\n🔍 Scraping category: {category.replace('_', ' ').title()}")
+            if isinstance(pages, Exception):
+                print(f"   🔥 Error: {str(pages)}")
+                self.incomplete = True
+                return
+            # Same stop rule as the sequential loop: first page with nothing new ends the category
+            for page, data in enumerate(pages, start=self.checkpoint.next_page(category)):
+                with self.metrics.stage("transform", category):
+                    new_products = self._extract_products(data, category)
+                if not new_products:
+                    print(f"\n   ⏹️ No valid products found on page {page}")
+                    break
+                self._emit(new_products)
+            self._checkpoint(category)
+            print(f"\r   📖 Pages {len(pages)} | Products: {self.product_count}", end="", flush=True)
+
+        try:
+            engine.run(jobs, on_result=merge)
+        finally:
+            if parsers is not None:
+                parsers.close()
+        self.total_requests += engine.total_requests
+        self.failed_requests += engine.failed_requests
+        engine.report()
+
+    async def _scrape_category_async(self, engine, base_url, category):
+        """Fetch a category's pages in order; deduplication happens at merge time"""
+        pages = []
+        page = self.checkpoint.next_page(category)
+        consecutive_errors = 0
+        category_ids = set()
+
+        while True:
+            params = {
+                "v1": int(time.time() * 1000),
+                "regionGroupId": "80",
+                "ajax": "true",
+                "page": page
+            }
+            try:
+                response, data = await engine.fetch_parsed(
+                    base_url, self._decode_page, params=params, retries=2, label=category, remote="_parse_body"
+                )
+            except ValueError as e:
+                consecutive_errors += 1
+                print(f"\n   🔥 Error on {category} page {page}: {str(e)}")
+                if consecutive_errors >= 3:
+                    raise
+                continue
+
+            check_page(base_url, response)
+            if not response.ok:
+                # 404: past the last page
+                return pages
+
+            with self.metrics.stage("parse", category):
+                valid = self._validate_response(data)
+            if not valid:
+                return pages
+
+            # A page with nothing new even within this category cannot add anything globally
+            page_ids = {
+                str(component.get("id"))
+                for group in data.get("productGroups", [])
+                for element in group.get("elements", [])
+                for component in element.get("commercialComponents", [])
+                if component.get("type") == "Product"
+            }
+            if not page_ids - category_ids:
+                return pages
+            category_ids |= page_ids
+
+            pages.append(data)
+            page += 1
+            consecutive_errors = 0
+
+    def _decode_page(self, response):
+        if response is None or not response.ok:
+            return None
+        return self._parse_body(response.content)
+
+    def _parse_body(self, body):
+        return self._parse_page(self._page_stream(), iter_chunks(body))
+
+    def _page_stream(self):
+        return ArrayStream("commercialComponents", require="productGroups")
+
+    def _parse_page(self, stream, chunks):
+        """Stream a category page down to its Product components.
+
+        Components are decoded one at a time as their bytes arrive and cut
+        down to ``PRODUCT_FIELDS``; the rest of the document is never
+        materialized. Returns a page of the API's shape holding only those
+        components, or None if the response is not a product listing.
+        """
+        components = [
+            project(component, PRODUCT_FIELDS)
+            for component in stream.items(chunks)
+            if isinstance(component, dict) and component.get("type") == "Product"
+        ]
+        if not stream.valid:
+            return None
+        return {"productGroups": [{"elements": [{"commercialComponents": components}]}]}
 
     def _scrape_category(self, base_url, category):
-        page = 1
+        """Crawl one category from its checkpointed page; False if it gave up before the end"""
+        page = self.checkpoint.next_page(category)
         max_retries = 3
         consecutive_errors = 0
         
@@ -42,7 +223,7 @@ class ZaraScraper:
                 # Track request metrics
                 self.total_requests += 1
                 
-                print(f"\r   📖 Page {page} | Products: {len(self.products)}", end="", flush=True)
+                print(f"\r   📖 Page {page} | Products: {self.product_count}", end="", flush=True)
                 
                 params = {
                     "v1": int(time.time() * 1000),
@@ -54,36 +235,50 @@ class ZaraScraper:
                 response = None
                 for attempt in range(max_retries):
                     try:
-                        response = requests.get(base_url, headers=self.headers, params=params)
+                        # 429/5xx slow the host's rate down, so the next acquire is the backoff
+                        self.limiter.acquire(base_url)
+                        started = time.perf_counter()
+                        with self.metrics.stage("fetch", category):
+                            response = requests.get(base_url, headers=self.headers, params=params, stream=True)
+                        self.limiter.feedback(base_url, response, time.perf_counter() - started)
+                        if not response.ok:
+                            self.metrics.record_response(category, response.status_code, len(response.content), attempt)
                         response.raise_for_status()
                         break
                     except requests.exceptions.HTTPError as e:
                         self.failed_requests += 1
                         if e.response.status_code == 404:
                             print(f"\n   🏁 Natural pagination end at page {page}")
-                            return
+                            return True
                         print(f"\n   ⚠️ HTTP Error {e.response.status_code} on attempt {attempt+1}")
-                        time.sleep(2 ** attempt)
                 
                 if not response or not response.ok:
                     print("\n   🔴 Max retries exceeded")
-                    return
+                    self.incomplete = True
+                    return False
                 
-                data = response.json()
+                # The body is parsed while it downloads, so "parse" includes the transfer
+                stream = self._page_stream()
+                with self.metrics.stage("parse", category), self.archive.writer() as archived:
+                    data = self._parse_page(stream, archived.tee(response.iter_content(CHUNK_SIZE)))
+                    archived.commit(category, response.url)
+                    valid = self._validate_response(data)
+                self.metrics.record_response(category, response.status_code, stream.bytes_read, attempt)
                 
-                if not self._validate_response(data):
+                if not valid:
                     print(f"\n   🚩 Invalid response structure on page {page}")
-                    return
+                    return True
                 
-                new_products = self._extract_products(data, category)
+                with self.metrics.stage("transform", category):
+                    new_products = self._extract_products(data, category)
                 if not new_products:
                     print(f"\n   ⏹️ No valid products found on page {page}")
-                    return
+                    return True
                 
-                self.products.extend(new_products)
+                self._emit(new_products)
                 page += 1
                 consecutive_errors = 0
-                time.sleep(1.2)
+                self._checkpoint(category, page)
                 
             except Exception as e:
                 consecutive_errors += 1
@@ -91,7 +286,8 @@ class ZaraScraper:
                 print(f"\n   🔥 Error on page {page}: {str(e)}")
                 if consecutive_errors >= 3:
                     print("   🛑 Too many consecutive errors, stopping category")
-                    return
+                    self.incomplete = True
+                    return False
 
     def _validate_response(self, data):
         """Ensure response contains valid product data"""
@@ -127,16 +323,16 @@ class ZaraScraper:
                         print(f"   🔗 Missing URL for {product_id}")
                         continue
                         
-                    product_data = {
-                        "id": product_id,
-                        "name": component.get("name", "Unnamed Product"),
-                        "price": self._parse_price(component.get("price")),
-                        "category": category,
-                        "url": product_url,
-                        "images": self._extract_images(component),
-                        "timestamp": datetime.now().isoformat(),
-                        # "vendor" : "Zara",
-                    }
+                    product_data = ZaraProduct(
+                        product_id,
+                        component.get("name", "Unnamed Product"),
+                        self._parse_price(component.get("price")),
+                        category,
+                        product_url,
+                        ImageList(self._extract_images(component)),
+                        # One timestamp string per run, shared by every record
+                        self.run_timestamp,
+                    )
                     
                     self.seen_products.add(product_id)
                     products.append(product_data)
@@ -161,29 +357,73 @@ class ZaraScraper:
             return None
         
     def _extract_images(self, component):
-        """Extract all unique image URLs"""
-        images = set()
+        """Extract all image URLs; ImageList drops the duplicates"""
+        images = []
         for color in component.get("detail", {}).get("colors", []):
             for media in color.get("xmedia", []):
                 try:
-                    img_url = media['url'].replace("{width}", "1024")
-                    images.add(img_url)
+                    images.append(media['url'].replace("{width}", "1024"))
                 except KeyError:
                     continue
-        return list(images)
+        return images
+
+    def _emit(self, products):
+        """Hand a page of products to the NDJSON sink"""
+        self.sink.write_many(products)
+        self.product_count += len(products)
+        if products:
+            self.metrics.record_page(products[0].category, len(products))
+        self.history.observe([(p.id, p.price) for p in products])
 
     def _save_data(self):
         """Save with pretty formatting and backup"""
+        self.seen_products.flush()
+        self.archive.close()
+        changes = self.history.finish(detect_removed=not self.incomplete)
+        print(f"\n📈 History: {changes['new']} new | {changes['removed']} removed | {changes['price_changed']} price changes")
+        self.sink.close()
+        if not self.checkpoint.state["journal"]:
+            print(f"\n💾 Data streamed to {self.sink.stem}-*.ndjson")
+            if self.legacy_json:
+                convert_to_json(self.sink.stem, f"{self.sink.stem}.json", ensure_ascii=False)
+            self.checkpoint.clear()
+            return
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"zara_products_{timestamp}.json"
         
         try:
-            with open(filename, "w") as f:
-                json.dump(self.products, f, indent=2, ensure_ascii=False)
+            convert_to_json(self.sink.stem, filename, ensure_ascii=False)
             print(f"\n💾 Data saved to {filename}")
         except Exception as e:
             print(f"\n❌ Failed to save data: {str(e)}")
+            print(f"   Records kept in {self.sink.stem}-*.ndjson")
+            self.checkpoint.clear(keep_journal=True)
+            return
+        self.checkpoint.clear()
+
+    def _checkpoint(self, category, next_page=None):
+        """Save the cursor; without ``next_page`` the category is done"""
+        self.checkpoint.commit(
+            self.sink, self.seen_products, self.history, self.product_count, category, next_page
+        )
 
 if __name__ == "__main__":
-    scraper = ZaraScraper()
-    scraper.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Zara categories")
+    parser.add_argument("--sequential", action="store_true", help="fetch one page at a time")
+    parser.add_argument("--no-cache", action="store_true", help="skip the on-disk response cache")
+    parser.add_argument("--ndjson", action="store_true", help="stream products to NDJSON as pages are parsed")
+    parser.add_argument("--legacy-json", action="store_true", help="with --ndjson, also write the zara_products JSON file")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--parse-processes", type=int, default=0, help="parse pages in this many worker processes")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and tracemalloc")
+    args = parser.parse_args()
+
+    scraper = ZaraScraper(ndjson=args.ndjson, legacy_json=args.legacy_json, resume=args.resume)
+    run = lambda: scraper.run(
+        concurrent=not args.sequential, use_cache=not args.no_cache, parse_processes=args.parse_processes
+    )
+    if args.profile:
+        profile_run(run, "zara")
+    else:
+        run()
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""Near-duplicate detection: time, comparisons and recall on planted duplicates.
+
+Run from the Scrapers directory: python -m benchmarks.dedup_bench [--products 50000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from shared.dedup import NearDuplicateIndex
+
+WORDS = [f"{a}{b}" for a in ("vel", "cor", "mar", "lin", "sab", "tor", "kal", "ren", "dun", "pal")
+         for b in ("ox", "ia", "en", "us", "et", "ar", "om", "il", "ud", "ek", "an", "or", "is", "ut", "el")]
+ITEMS = ["T-Shirt", "Polo", "Shirt", "Hoodie", "Sweatshirt", "Jeans", "Cargo Pants", "Jacket", "Skirt", "Dress"]
+RETAILERS = ["bonkers", "capsul", "snitch", "zara"]
+
+
+def product(rng, n):
+    title = f"{' '.join(rng.sample(WORDS, 3)).title()} {rng.choice(ITEMS)} {4000000 + n}"
+    image = f"https://cdn.shopify.com/s/files/1/0420/files/{rng.getrandbits(48):012x}.jpg?v={rng.getrandbits(20)}"
+    return title, image
+
+
+def duplicate(rng, title, image):
+    """The same product as another retailer lists it: new code, case, size suffix and query"""
+    words = title.split()[:-1]
+    if rng.random() < 0.5:
+        words.append(rng.choice(["-", "New", "Unisex"]))
+    stem, ext = image.split("?")[0].rsplit(".", 1)
+    return f"{' '.join(words).upper()} {rng.randrange(10 ** 6)}", f"{stem}_1024x1024.{ext}?ts={rng.getrandbits(30)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=50000, help="distinct products")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of products relisted elsewhere")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    items = []
+    planted = set()
+    for n in range(args.products):
+        title, image = product(rng, n)
+        key = f"{rng.choice(RETAILERS)}:{n}"
+        items.append((key, title, image))
+        if rng.random() < args.duplicates:
+            dup_key = f"{rng.choice(RETAILERS)}:d{n}"
+            items.append((dup_key, *duplicate(rng, title, image)))
+            planted.add(tuple(sorted((key, dup_key))))
+    rng.shuffle(items)
+
+    index = NearDuplicateIndex(os.path.join(tempfile.mkdtemp(prefix="dedup_bench_"), "near_dupes.sqlite3"))
+    start = time.perf_counter()
+    for key, title, image in items:
+        index.add(key, title, "", [image])
+    index.commit()
+    elapsed = time.perf_counter() - start
+
+    found = {tuple(pair) for pair in index.conn.execute("SELECT a, b FROM pairs")}
+    pairwise = len(items) * (len(items) - 1) // 2
+    print(f"Products: {len(items)} | planted duplicate pairs: {len(planted)}")
+    print(f"Indexed in {elapsed:.1f}s ({len(items) / elapsed:.0f} products/s)")
+    print(f"Signature comparisons: {index.comparisons} (all pairs would be {pairwise})")
+    print(f"Recall: {len(found & planted) / len(planted):.1%} | false pairs: {len(found - planted)}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Per-page parse time and peak memory: BeautifulSoup vs the byte-level extractor.
+
+Run from the Scrapers directory: python -m benchmarks.extract_bench
+"""
+import argparse
+import re
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from benchmarks.fixtures import bonkers_collection_html, capsul_collection_html
+from shared.extract import script_by_id, scripts_by_type
+
+PIXELS_PATTERN = r'webPixelsManagerAPI\.publish\("collection_viewed",\s*({.*?})\);'
+
+
+def bonkers_soup(html):
+    script = BeautifulSoup(html, 'html.parser').find('script', id='web-pixels-manager-setup').string
+    return re.search(PIXELS_PATTERN, script, re.DOTALL).group(1)
+
+
+def bonkers_fast(html):
+    script = script_by_id(html, 'web-pixels-manager-setup')
+    return re.search(PIXELS_PATTERN, script, re.DOTALL).group(1)
+
+
+def capsul_soup(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [s.string for s in soup.find_all('script', type='application/ld+json', attrs={'tt-ninja': True})]
+
+
+def capsul_fast(html):
+    return scripts_by_type(html, 'application/ld+json', required_attr='tt-ninja')
+
+
+def measure(func, html, iterations):
+    """Mean milliseconds per call and peak traced memory of a single call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    elapsed = (time.perf_counter() - start) / iterations * 1000
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    cases = [
+        ("bonkers", bonkers_collection_html(1).encode(), bonkers_soup, bonkers_fast),
+        ("capsul", capsul_collection_html("streetwear-women").encode(), capsul_soup, capsul_fast),
+    ]
+    print(f"{'page':<10}{'size KB':>10}{'soup ms':>10}{'fast ms':>10}{'soup peak KB':>14}{'fast peak KB':>14}")
+    for name, html, soup_func, fast_func in cases:
+        assert soup_func(html) == fast_func(html), f"{name}: extractors disagree"
+        soup_ms, soup_peak = measure(soup_func, html, args.iterations)
+        fast_ms, fast_peak = measure(fast_func, html, args.iterations)
+        print(
+            f"{name:<10}{len(html) / 1024:>10.1f}{soup_ms:>10.2f}{fast_ms:>10.3f}"
+            f"{soup_peak / 1024:>14.1f}{fast_peak / 1024:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
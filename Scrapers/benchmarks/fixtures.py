@@ -0,0 +1,202 @@
+import json
+
+# Filler markup so pages are roughly the size of a real Shopify collection page
+_FILLER = "".join(
+    f'<div class="grid__item"><a href="/products/item-{i}"><img src="/cdn/shop/files/{i}.jpg" alt="Item {i}"></a>'
+    f'<span class="price">Rs. {499 + i}.00</span></div>\n'
+    for i in range(400)
+)
+
+
+def bonkers_collection_html(page, per_page=24, pages=5, offset=0):
+    """Collection page carrying the web-pixels collection_viewed payload"""
+    variants = []
+    if page <= pages:
+        for i in range(per_page):
+            product_id = str(1000000 + offset + (page - 1) * per_page + i)
+            for size in ("S", "M", "L"):
+                variants.append({
+                    "id": f"{product_id}{size}",
+                    "title": size,
+                    "sku": f"BC-{product_id}-{size}",
+                    "price": {"amount": 799.0, "currencyCode": "INR"},
+                    "image": {"src": f"//www.bonkerscorner.com/cdn/shop/files/{product_id}.jpg?v=1741417461"},
+                    "product": {
+                        "id": product_id,
+                        "title": f"Oversized T-shirt {product_id}",
+                        "url": f"/products/oversized-t-shirt-{product_id}",
+                        "vendor": "Bonkers Corner",
+                    },
+                })
+    payload = json.dumps({"collection": {"id": "1", "title": "Collection", "productVariants": variants}})
+    return (
+        "<!doctype html><html><head><title>Collection</title>"
+        '<script src="/cdn/shop/t/1/assets/theme.js" defer></script>'
+        '<script id="web-pixels-manager-setup">(function(){var webPixelsManagerAPI = {};'
+        f'webPixelsManagerAPI.publish("collection_viewed", {payload});'
+        "})();</script></head><body>"
+        f"{_FILLER}</body></html>"
+    )
+
+
+def capsul_collection_html(handle, per_page=24):
+    """Collection page carrying an ld+json ItemList block"""
+    items = [
+        {
+            "@type": "ListItem",
+            "position": i + 1,
+            "url": f"/products/{handle}-{i}",
+            "name": f"Capsul Piece {i} &amp; Co",
+            "description": f"100% Cotton, piece {i}",
+            "image": f"//www.shopcapsul.com/cdn/shop/files/{handle}-{i}.jpg",
+        }
+        for i in range(per_page)
+    ]
+    itemlist = json.dumps({"@context": "https://schema.org", "@type": "ItemList", "itemListElement": items})
+    organization = json.dumps({"@context": "https://schema.org", "@type": "Organization", "name": "Capsul"})
+    return (
+        "<!doctype html><html><head><title>Collection</title>"
+        f'<script type="application/ld+json">{organization}</script>'
+        f'<script type="application/ld+json" tt-ninja>{itemlist}</script>'
+        f"</head><body>{_FILLER}</body></html>"
+    )
+
+
+def _shopify_product(product_id, handle, title, vendor, body_html, image, price, variant_ids):
+    """products.json entry with the fields a real storefront sends alongside the ones we read"""
+    return {
+        "id": product_id,
+        "title": title,
+        "handle": handle,
+        "body_html": body_html,
+        "published_at": "2025-03-08T18:02:27+05:30",
+        "created_at": "2025-03-08T18:02:25+05:30",
+        "updated_at": "2025-04-19T16:13:18+05:30",
+        "vendor": vendor,
+        "product_type": "T-Shirts",
+        "tags": ["Cotton", "Oversized", "Summer"],
+        "variants": [
+            {
+                "id": variant_id,
+                "title": size,
+                "option1": size,
+                "option2": None,
+                "option3": None,
+                "sku": sku,
+                "requires_shipping": True,
+                "taxable": True,
+                "featured_image": None,
+                "available": True,
+                "price": price,
+                "grams": 250,
+                "compare_at_price": None,
+                "position": n + 1,
+                "product_id": product_id,
+                "created_at": "2025-03-08T18:02:25+05:30",
+                "updated_at": "2025-04-19T16:13:18+05:30",
+            }
+            for n, (variant_id, size, sku) in enumerate(variant_ids)
+        ],
+        "images": [{
+            "id": 1,
+            "created_at": "2025-03-08T18:02:25+05:30",
+            "position": 1,
+            "updated_at": "2025-04-19T16:13:18+05:30",
+            "product_id": product_id,
+            "variant_ids": [],
+            "src": image,
+            "width": 1080,
+            "height": 1440,
+        }],
+        "options": [{"name": "Size", "position": 1, "values": [size for _, size, _ in variant_ids]}],
+    }
+
+
+def bonkers_shopify_products(per_page=24, pages=5, offset=0):
+    """The products ``bonkers_collection_html`` spreads over ``pages`` pages, as products.json entries"""
+    products = []
+    for n in range(per_page * pages):
+        product_id = str(1000000 + offset + n)
+        products.append(_shopify_product(
+            product_id,
+            f"oversized-t-shirt-{product_id}",
+            f"Oversized T-shirt {product_id}",
+            "Bonkers Corner",
+            "<p>Relaxed fit, 100% cotton.</p>",
+            f"//www.bonkerscorner.com/cdn/shop/files/{product_id}.jpg?v=1741417461",
+            "799.00",
+            [(f"{product_id}{size}", size, f"BC-{product_id}-{size}") for size in ("S", "M", "L")],
+        ))
+    return products
+
+
+def capsul_shopify_products(handle, count=120):
+    """A whole Capsul collection; the HTML page only shows the first 24 of these"""
+    return [
+        _shopify_product(
+            7000000 + i,
+            f"{handle}-{i}",
+            f"Capsul Piece {i} & Co",
+            "Capsul",
+            f"<p>100% Cotton, piece {i}</p>",
+            f"//www.shopcapsul.com/cdn/shop/files/{handle}-{i}.jpg",
+            "1499.00",
+            [(7100000 + i * 10 + n, size, f"CP-{i}-{size}") for n, size in enumerate(("S", "M", "L"))],
+        )
+        for i in range(count)
+    ]
+
+
+def shopify_products_json(products, page, limit=30):
+    """One page of ``/collections/<handle>/products.json``; Shopify caps ``limit`` at 250"""
+    limit = min(limit, 250)
+    start = (page - 1) * limit
+    return json.dumps({"products": products[start:start + limit]})
+
+
+def snitch_page_json(page, limit=50, pages=5):
+    """One page of the new-and-popular/v2 API"""
+    total_count = pages * limit
+    products = [
+        {
+            "shopify_product_id": 8596268000000 + n,
+            "title": f"Slim Fit Polo {n}",
+            "handle": f"slim-fit-polo-{n}",
+            "selling_price": 1099.0,
+            "short_description": "Slim fit cotton blend T-shirt with a zip collar.",
+            "color": "['Beige']",
+            "colors": ["White", "Lavender"],
+            "occassion": "Casual Wear,College Wear",
+            "model_info": "Model is wearing size M",
+            "preview_image": f"https://cdn.shopify.com/s/files/1/0420/7073/7058/files/{n}_1.jpg?v=1739973487",
+            "shopify_product_type": "T-Shirts",
+        }
+        for n in range((page - 1) * limit, min(page * limit, total_count))
+    ]
+    return json.dumps({"data": {"products": products, "total_count": total_count}})
+
+
+def zara_category_json(page, per_page=30, pages=5, offset=0):
+    """One ajax=true category page; past the last page the groups are empty"""
+    elements = []
+    if page <= pages:
+        for i in range(per_page):
+            product_id = 419570000 + offset + (page - 1) * per_page + i
+            elements.append({"commercialComponents": [{
+                "type": "Product",
+                "id": product_id,
+                "name": f"BASIC RIB T-SHIRT {product_id}",
+                "price": 195000,
+                "seo": {"keyword": f"basic-rib-t-shirt-{product_id}", "seoProductId": f"0{product_id}"},
+                "detail": {"colors": [{"xmedia": [
+                    {"url": f"https://static.zara.net/assets/public/4388/72f3/{product_id}-e{n}/{product_id}-e{n}.jpg?ts=1737452354752&w={{width}}"}
+                    for n in range(1, 4)
+                ]}]},
+            }]})
+    return json.dumps({"productGroups": [{"elements": elements}] if elements else []})
+
+
+def image_bytes(name, size=20000):
+    """Fake JPEG whose bytes depend only on the file name, not the directory"""
+    seed = name.encode()
+    return b"\xff\xd8\xff\xe0" + (seed * (size // len(seed) + 1))[:size]
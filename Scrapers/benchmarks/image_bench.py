@@ -0,0 +1,55 @@
+"""Image download stage against the stand-in server: throughput, dedup and resume.
+
+Run from the Scrapers directory: python -m benchmarks.image_bench [--products 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.server import StandInServer
+from shared.images import ImageDownloader, ImageStore
+
+
+def image_urls(base_url, products):
+    """Three images per product under two categories, each URL seen twice with different ts= values"""
+    urls = []
+    for crawl in range(2):
+        for category in ("man-shirts", "man-new-in"):
+            for product in range(products):
+                for n in range(1, 4):
+                    urls.append(f"{base_url}/images/{category}/{product}-e{n}.jpg?ts={time.time_ns()}&w=1024")
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the server waits per response")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server = StandInServer(latency=args.latency).start()
+    root = tempfile.mkdtemp(prefix="bench_images_")
+    try:
+        urls = image_urls(server.base_url, args.products)
+        for attempt in ("first run", "resumed run"):
+            store = ImageStore(root)
+            before = server.requests.get("images", 0)
+            start = time.perf_counter()
+            counts = ImageDownloader(store, max_concurrency=args.concurrency, per_host=args.concurrency).download(urls)
+            wall = time.perf_counter() - start
+            store.close()
+            requests = server.requests.get("images", 0) - before
+            print(
+                f"{attempt:<12} {requests:>5} requests in {wall:6.2f}s | downloaded {counts['downloaded']} | "
+                f"same bytes as stored {counts['deduplicated']} | skipped {counts['skipped']} | failed {counts['failed']}"
+            )
+        objects = sum(len(files) for _, _, files in os.walk(os.path.join(root, "objects")))
+        print(f"{len(urls)} listed URLs -> {objects} stored objects in {root}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
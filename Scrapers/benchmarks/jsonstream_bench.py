@@ -0,0 +1,110 @@
+"""Zara page parsing: full json.loads versus the streaming component parser.
+
+Run from the Scrapers directory: python -m benchmarks.jsonstream_bench [--products 400]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from shared.jsonstream import ArrayStream, iter_chunks, project
+from shared.orchestrator import load_scraper_module
+
+
+def heavy_page(products):
+    """A category page with the bulk real responses carry beyond the fields we read"""
+    elements = []
+    for n in range(products):
+        product_id = 419570000 + n
+        colors = [{
+            "id": f"{c:03d}",
+            "name": f"COLOR {c}",
+            "productId": product_id,
+            "price": 195000,
+            "availability": "in_stock",
+            "sizes": [{"id": s, "name": size, "availability": "in_stock", "sku": product_id * 10 + s,
+                       "price": 195000} for s, size in enumerate(["XS", "S", "M", "L", "XL", "XXL"])],
+            "xmedia": [{
+                "datatype": "xmedia", "set": 0, "type": "image", "kind": "full", "order": m,
+                "path": f"/4388/72f3/{product_id}-e{m}", "name": f"{product_id}-e{m}", "width": 1920,
+                "height": 2880, "timestamp": "1737452354752", "allowedScreens": ["grid", "detail"],
+                "url": f"https://static.zara.net/assets/public/4388/72f3/{product_id}-e{m}/{product_id}-e{m}.jpg?ts=1737452354752&w={{width}}",
+                "extraInfo": {"originalName": f"e{m}", "assetId": f"{product_id}-{m}", "deliveryUrl": "https://static.zara.net/assets/public/"},
+            } for m in range(1, 7)],
+        } for c in range(3)]
+        elements.append({
+            "id": f"element-{n}",
+            "layout": "product-grid",
+            "commercialComponents": [{
+                "type": "Product",
+                "kind": "Wear",
+                "id": product_id,
+                "reference": f"0{product_id}-800",
+                "name": f"BASIC RIB T-SHIRT {product_id}",
+                "description": "Fitted T-shirt with a round neck and short sleeves. " * 4,
+                "price": 195000,
+                "brand": {"brandId": 1, "brandGroupId": 1, "brandGroupCode": "zara"},
+                "seo": {"keyword": f"basic-rib-t-shirt-{product_id}", "seoProductId": f"0{product_id}",
+                        "discernProductId": product_id},
+                "availability": "in_stock",
+                "tagTypes": [],
+                "detail": {"reference": f"0{product_id}", "displayReference": f"{product_id}/800", "colors": colors},
+                "gridPosition": n,
+            }],
+        })
+    return json.dumps({"productGroups": [{"type": "main", "elements": elements}], "productsCount": products}).encode()
+
+
+def measure(parse, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, result = parse(body, start)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=400, help="products on the synthetic page")
+    args = parser.parse_args()
+
+    module = load_scraper_module("Zara")
+    scraper = object.__new__(module.ZaraScraper)
+    scraper.base_url = "https://www.zara.com"
+    scraper.run_timestamp = "2025-03-08T18:02:27"
+    body = heavy_page(args.products)
+
+    def full(body, start):
+        data = json.loads(body)
+        first = time.perf_counter() - start
+        scraper.seen_products = set()
+        scraper._validate_response(data)
+        return first, scraper._extract_products(data, "bench")
+
+    def streaming(body, start):
+        first = None
+        components = []
+        stream = ArrayStream("commercialComponents", require="productGroups")
+        for component in stream.items(iter_chunks(body)):
+            if first is None:
+                first = time.perf_counter() - start
+            if isinstance(component, dict) and component.get("type") == "Product":
+                components.append(project(component, module.PRODUCT_FIELDS))
+        scraper.seen_products = set()
+        page = {"productGroups": [{"elements": [{"commercialComponents": components}]}]}
+        return first, scraper._extract_products(page, "bench")
+
+    print(f"Page: {args.products} products, {len(body) / 1024:.0f} KB")
+    print(f"{'parser':<12}{'first ms':>10}{'total ms':>10}{'peak MB':>10}")
+    results = {}
+    for name, parse in (("json.loads", full), ("streaming", streaming)):
+        first, elapsed, peak, products = measure(parse, body)
+        results[name] = [p.to_dict() for p in products]
+        print(f"{name:<12}{first * 1000:>10.1f}{elapsed * 1000:>10.1f}{peak / 1024 / 1024:>10.1f}")
+    print(f"Same products: {results['json.loads'] == results['streaming']}")
+
+
+if __name__ == "__main__":
+    main()
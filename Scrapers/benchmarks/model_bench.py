@@ -0,0 +1,144 @@
+"""Memory per product: plain dicts vs the slotted product models.
+
+Run from the Scrapers directory: python -m benchmarks.model_bench [--pages 100]
+"""
+import argparse
+import json
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urljoin
+
+from benchmarks.extract_bench import bonkers_fast
+from benchmarks.fixtures import bonkers_collection_html, zara_category_json
+from shared.models import BonkersProduct, ImageList, Variant, ZaraProduct
+
+BASE_URL = "https://www.bonkerscorner.com"
+
+
+def bonkers_variants(pages):
+    for page in range(1, pages + 1):
+        payload = bonkers_fast(bonkers_collection_html(page, per_page=100, pages=pages))
+        yield json.loads(payload)["collection"]["productVariants"]
+
+
+def zara_components(pages):
+    for page in range(1, pages + 1):
+        data = json.loads(zara_category_json(page, per_page=100, pages=pages))
+        yield [c for group in data["productGroups"] for e in group["elements"] for c in e["commercialComponents"]]
+
+
+def bonkers_dicts(variants, category):
+    """The dict-of-dicts shape the scraper built before the models"""
+    product_map = {}
+    for variant in variants:
+        product_id = variant['product']['id']
+        if product_id not in product_map:
+            product_map[product_id] = {
+                "id": product_id,
+                "title": variant['product']['title'],
+                "url": urljoin(BASE_URL, variant['product']['url']),
+                "category": category,
+                "vendor": variant['product']['vendor'],
+                "variants": [],
+                "images": set(),
+            }
+        product_map[product_id]['variants'].append({
+            "variant_id": variant['id'],
+            "price": variant['price']['amount'],
+            "size": variant['title'],
+            "sku": variant['sku'],
+        })
+        product_map[product_id]['images'].add(urljoin(BASE_URL, variant['image']['src']))
+    for product in product_map.values():
+        product['images'] = list(product['images'])
+    return list(product_map.values())
+
+
+def bonkers_models(variants, category):
+    product_map = {}
+    for variant in variants:
+        product_id = variant['product']['id']
+        if product_id not in product_map:
+            product_map[product_id] = (variant['product'], [], [])
+        _, product_variants, images = product_map[product_id]
+        product_variants.append(Variant(variant['id'], variant['price']['amount'], variant['title'], variant['sku']))
+        images.append(urljoin(BASE_URL, variant['image']['src']))
+    return [
+        BonkersProduct(pid, p['title'], urljoin(BASE_URL, p['url']), category, p['vendor'], tuple(v), ImageList(i))
+        for pid, (p, v, i) in product_map.items()
+    ]
+
+
+def zara_images(component):
+    return [m['url'].replace("{width}", "1024") for c in component["detail"]["colors"] for m in c["xmedia"]]
+
+
+def zara_dicts(components, category):
+    return [{
+        "id": str(c["id"]),
+        "name": c["name"],
+        "price": c["price"] / 100,
+        "category": category,
+        "url": urljoin("https://www.zara.com", f"/in/en/{c['seo']['keyword']}-p{c['seo']['seoProductId']}.html"),
+        "images": list(set(zara_images(c))),
+        "timestamp": datetime.now().isoformat(),
+    } for c in components]
+
+
+def zara_models(components, category):
+    run_timestamp = datetime.now().isoformat()
+    return [ZaraProduct(
+        str(c["id"]),
+        c["name"],
+        c["price"] / 100,
+        category,
+        urljoin("https://www.zara.com", f"/in/en/{c['seo']['keyword']}-p{c['seo']['seoProductId']}.html"),
+        ImageList(zara_images(c)),
+        run_timestamp,
+    ) for c in components]
+
+
+def retained(build, inputs):
+    """Bytes still allocated once ``build`` has produced every product"""
+    tracemalloc.start()
+    products = []
+    for chunk in inputs:
+        # Categories arrive as fresh strings per page, as they do from the URL dicts
+        products.extend(build(chunk, "".join(["mens_", "new_arrivals"])))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return products, current
+
+
+def _normalized(record):
+    record = dict(record)
+    record.pop("timestamp", None)
+    record["images"] = sorted(record["images"])
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100, help="fixture pages of 100 products each")
+    args = parser.parse_args()
+
+    bonkers_pages = list(bonkers_variants(args.pages))
+    zara_pages = list(zara_components(args.pages))
+    cases = [
+        ("bonkers", bonkers_pages, bonkers_dicts, bonkers_models),
+        ("zara", zara_pages, zara_dicts, zara_models),
+    ]
+    print(f"{'retailer':<10}{'products':>10}{'dict B/prod':>13}{'model B/prod':>14}{'saved':>8}")
+    for name, pages, build_dicts, build_models in cases:
+        dicts, dict_bytes = retained(build_dicts, pages)
+        models, model_bytes = retained(build_models, pages)
+        assert [_normalized(d) for d in dicts] == [_normalized(m.to_dict()) for m in models], f"{name}: shapes differ"
+        count = len(models)
+        print(
+            f"{name:<10}{count:>10}{dict_bytes / count:>13.0f}{model_bytes / count:>14.0f}"
+            f"{1 - model_bytes / dict_bytes:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Pipelined crawl throughput: Zara pages parsed inline versus in a parse pool.
+
+Fetches are simulated with a fixed latency so only parsing competes for CPU.
+Run from the Scrapers directory: python -m benchmarks.parsepool_bench [--processes 0 1 2 4]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.jsonstream_bench import heavy_page
+from shared.orchestrator import load_scraper_module
+from shared.parsepool import ParsePool
+
+
+async def crawl(scraper, parsers, body, pages, latency, concurrency):
+    """Fetch-then-parse jobs at bounded concurrency; results merged in page order"""
+    fetch_slots = asyncio.Semaphore(concurrency)
+
+    async def job(page):
+        async with fetch_slots:
+            await asyncio.sleep(latency)
+        if parsers is None:
+            return scraper._parse_body(body)
+        return await parsers.parse("_parse_body", body)
+
+    tasks = [asyncio.ensure_future(job(page)) for page in range(pages)]
+    products = 0
+    for task in tasks:
+        data = await task
+        scraper.seen_products = set()
+        products += len(scraper._extract_products(data, "bench"))
+    return products
+
+
+async def warm_up(parsers, body):
+    await asyncio.gather(*(parsers.parse("_parse_body", body) for _ in range(parsers.processes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, nargs="+", default=[0, 1, 2, 4], help="0 parses inline")
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--products", type=int, default=200, help="products per page")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per fetch")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    module = load_scraper_module("Zara")
+    scraper = object.__new__(module.ZaraScraper)
+    scraper.base_url = "https://www.zara.com"
+    scraper.run_timestamp = "2025-03-08T18:02:27"
+    body = heavy_page(args.products)
+    print(f"{args.pages} pages of {len(body) / 1024:.0f} KB on {os.cpu_count()} CPUs")
+    print(f"{'processes':>10}{'wall s':>9}{'pages/s':>9}{'products':>10}")
+    for processes in args.processes:
+        parsers = ParsePool("zara", processes) if processes else None
+        if parsers is not None:
+            # Start the workers outside the timed run
+            asyncio.run(warm_up(parsers, body))
+        start = time.perf_counter()
+        products = asyncio.run(crawl(scraper, parsers, body, args.pages, args.latency, args.concurrency))
+        wall = time.perf_counter() - start
+        if parsers is not None:
+            parsers.close()
+        print(f"{processes:>10}{wall:>9.2f}{args.pages / wall:>9.1f}{products:>10}")
+
+
+if __name__ == "__main__":
+    main()
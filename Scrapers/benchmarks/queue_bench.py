@@ -0,0 +1,78 @@
+"""Crawl queue throughput with 1..N worker processes against the stand-in server.
+
+Run from the Scrapers directory: python -m benchmarks.queue_bench [--workers 1 2 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.server import StandInServer
+from shared.archive import category_urls
+from shared.workqueue import ALL_RETAILERS, CrawlQueue, merge, work
+
+
+def seed_stand_in(queue, run_id, base_url, retailers):
+    """Same tasks ``workqueue.seed`` would enqueue, pointed at the stand-in server"""
+    for retailer in retailers:
+        for seq, category in enumerate(category_urls(retailer)):
+            handle = category.replace("_", "-")
+            if retailer == "zara":
+                url = f"{base_url}/zara/{handle}.html"
+            elif retailer == "snitch":
+                url = f"{base_url}/snitch/products"
+            else:
+                url = f"{base_url}/{retailer}/collections/{handle}"
+            queue.enqueue(run_id, retailer, category, 1, url, seq)
+
+
+def _worker(path, run_id, retailers, worker):
+    from shared.ratelimit import HostBucket
+    HostBucket.reserve = lambda self: 0.0
+    # The stand-in server is local, so skip the shared per-host pacing too
+    CrawlQueue.reserve_host = lambda self, url, rate: 0.0
+    work(path, run_id, retailers, worker, idle_wait=0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--retailers", nargs="+", default=ALL_RETAILERS, choices=ALL_RETAILERS)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in response delay in seconds")
+    parser.add_argument("--pages", type=int, default=5, help="pages per category")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="queue_bench_")
+    os.environ["SCRAPER_STATE_DIR"] = workdir
+    server = StandInServer(latency=args.latency, pages=args.pages).start()
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'workers':>8}{'tasks':>8}{'wall s':>9}{'tasks/s':>9}{'products':>10}")
+    try:
+        for count in args.workers:
+            path = os.path.join(workdir, f"queue_{count}.sqlite3")
+            queue = CrawlQueue(path)
+            seed_stand_in(queue, "bench", server.base_url, args.retailers)
+            start = time.perf_counter()
+            processes = [
+                ctx.Process(target=_worker, args=(path, "bench", args.retailers, f"bench:{n}"))
+                for n in range(count)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            wall = time.perf_counter() - start
+            done = sum(counts.get("done", 0) for counts in queue.status("bench").values())
+            products = sum(
+                merge(queue, "bench", retailer, os.path.join(workdir, f"{retailer}_{count}"))
+                for retailer in queue.status("bench")
+            )
+            queue.close()
+            print(f"{count:>8}{done:>8}{wall:>9.2f}{done / wall:>9.1f}{products:>10}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
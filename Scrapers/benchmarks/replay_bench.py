@@ -0,0 +1,67 @@
+"""Archive size and offline replay speed over a month of synthetic daily runs.
+
+Run from the Scrapers directory: python -m benchmarks.replay_bench [--runs 30] [--processes 1 4]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fixtures import bonkers_collection_html, zara_category_json
+from shared.archive import RawArchive, category_urls, replay
+
+
+def build_archive(root, runs, pages):
+    """Daily Bonkers and Zara runs in which a few categories change each day"""
+    day = datetime(2025, 3, 1)
+    for n in range(runs):
+        run_id = (day + timedelta(days=n)).isoformat()
+        for retailer, render in (("bonkers", bonkers_collection_html), ("zara", zara_category_json)):
+            archive = RawArchive(retailer, run_id, root)
+            for seq, (category, url) in enumerate(category_urls(retailer).items()):
+                # About a fifth of the categories gain new products on any given day
+                offset = seq * 10 + (n if (seq + n) % 5 == 0 else 0) * 3
+                for page in range(1, pages + 2):
+                    body = render(page, pages=pages, offset=offset)
+                    archive.store(category, f"{url}?page={page}", body.encode() if isinstance(body, str) else body)
+            archive.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30, help="daily runs per retailer")
+    parser.add_argument("--pages", type=int, default=5, help="pages per category")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="replay_bench_")
+    root = os.path.join(workdir, "archive")
+    start = time.perf_counter()
+    build_archive(root, args.runs, args.pages)
+    archive = RawArchive(root=root)
+    raw = sum(size for _, _, _, size in archive.runs())
+    pages = sum(count for _, _, count, _ in archive.runs())
+    stored = sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(archive.objects) for name in names
+    )
+    print(f"Archived {pages} pages in {time.perf_counter() - start:.1f}s: "
+          f"{raw / 1024 / 1024:.1f} MB raw -> {stored / 1024 / 1024:.1f} MB stored")
+
+    print(f"\n{'processes':>10}{'runs':>6}{'pages':>8}{'wall s':>9}{'pages/s':>10}{'products':>10}")
+    for processes in args.processes:
+        start = time.perf_counter()
+        products = 0
+        for retailer in ("bonkers", "zara"):
+            run_ids = [run_id for _, run_id, _, _ in archive.runs(retailer)]
+            out_dir = tempfile.mkdtemp(dir=workdir)
+            history = os.path.join(out_dir, "history.sqlite3")
+            products += sum(count for _, count, _, _ in replay(archive, retailer, run_ids, out_dir, processes, history))
+        wall = time.perf_counter() - start
+        print(f"{processes:>10}{args.runs * 2:>6}{pages:>8}{wall:>9.1f}{pages / wall:>10.0f}{products:>10}")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
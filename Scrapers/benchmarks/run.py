@@ -0,0 +1,221 @@
+"""Replay benchmark: run every scraper against the local stand-in server.
+
+Run from the Scrapers directory: python -m benchmarks.run [--compare results/<file>.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+from benchmarks.server import StandInServer
+
+# Nothing from shared/ is imported at module level: shared.paths fixes STATE_DIR
+# on import, and each child must see its own SCRAPER_STATE_DIR first
+
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(SCRAPERS_DIR, "benchmarks", "results")
+
+# retailer -> (directory, scraper class, URL dict in constants, parse methods to time)
+RETAILERS = {
+    "bonkers": ("Bonkers", "BonkersCornerScraper", "BONKERS_URLS",
+                ["_extract_collection", "_process_collection", "_process_shopify_products"]),
+    "capsul": ("Capsul", "CapsulScraper", "URLS", ["_extract_itemlists", "_process_itemlist", "_process_shopify_products"]),
+    "snitch": ("Snitch", "SnitchScraper", None, ["_process_products"]),
+    "zara": ("Zara", "ZaraScraper", "ZARA_URLS", ["_decode_page", "_validate_response", "_extract_products"]),
+}
+
+
+def _timed(method, totals):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            totals["parse"] += time.perf_counter() - start
+    return wrapper
+
+
+def _stub_green_cargos():
+    """Stand in for the private green_cargos package Capsul and Snitch import for a user agent"""
+    try:
+        import green_cargos.services.shared.utils  # noqa: F401
+        return
+    except ImportError:
+        pass
+    names = ["green_cargos", "green_cargos.services", "green_cargos.services.shared", "green_cargos.services.shared.utils"]
+    for name in names:
+        sys.modules[name] = types.ModuleType(name)
+    for parent, child in zip(names, names[1:]):
+        setattr(sys.modules[parent], child.rsplit(".", 1)[1], sys.modules[child])
+    sys.modules[names[-1]].random_useragent = lambda: "Mozilla/5.0 (benchmark)"
+
+
+def _run_one(retailer, base_url, run_kwargs, keep_delays, queue):
+    """Child process body: run one scraper in a scratch directory and report"""
+    workdir = tempfile.mkdtemp(prefix=f"bench_{retailer}_")
+    os.environ["SCRAPER_STATE_DIR"] = workdir
+    os.chdir(workdir)
+    directory, class_name, urls_name, parse_methods = RETAILERS[retailer]
+    from shared.orchestrator import load_scraper_module
+
+    # Every scraper runs against the stand-in server, installed or not
+    _stub_green_cargos()
+
+    try:
+        module = load_scraper_module(directory)
+    except ImportError as e:
+        queue.put({"retailer": retailer, "skipped": str(e)})
+        return
+
+    if not keep_delays:
+        from shared.ratelimit import HostBucket
+        HostBucket.reserve = lambda self: 0.0
+
+    if urls_name:
+        urls = getattr(module, urls_name)
+        for category in urls:
+            handle = category.replace("_", "-")
+            if retailer == "zara":
+                urls[category] = f"{base_url}/zara/{handle}.html"
+            else:
+                urls[category] = f"{base_url}/{retailer}/collections/{handle}"
+
+    scraper = getattr(module, class_name)()
+    if retailer == "snitch":
+        scraper.api_endpoint = f"{base_url}/snitch/products"
+
+    totals = {"parse": 0.0}
+    for name in parse_methods:
+        setattr(scraper, name, _timed(getattr(scraper, name), totals))
+
+    start = time.perf_counter()
+    scraper.run(**run_kwargs)
+    wall = time.perf_counter() - start
+
+    products = getattr(scraper, "product_count", None)
+    if products is None:
+        products = scraper.fetched_products
+    queue.put({
+        "retailer": retailer,
+        "wall_s": wall,
+        "parse_s": totals["parse"],
+        "products": products,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def run_benchmarks(retailers, latency, pages, run_kwargs, keep_delays, bulk=False, parse_processes=0):
+    from shared.orchestrator import PARSE_POOL_RETAILERS, SHOPIFY_RETAILERS
+
+    server = StandInServer(latency=latency, pages=pages).start()
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    try:
+        for retailer in retailers:
+            queue = ctx.Queue()
+            before = server.requests.get(retailer, 0)
+            bytes_before = server.bytes_sent.get(retailer, 0)
+            kwargs = {**run_kwargs, "bulk": True} if bulk and retailer in SHOPIFY_RETAILERS else dict(run_kwargs)
+            if parse_processes and retailer in PARSE_POOL_RETAILERS:
+                kwargs["parse_processes"] = parse_processes
+            process = ctx.Process(
+                target=_run_one, args=(retailer, server.base_url, kwargs, keep_delays, queue)
+            )
+            process.start()
+            result = queue.get()
+            process.join()
+            if "skipped" not in result:
+                requests_served = server.requests.get(retailer, 0) - before
+                result["pages"] = requests_served
+                result["pages_per_s"] = requests_served / result["wall_s"] if result["wall_s"] else 0
+                result["parse_ms_per_page"] = result["parse_s"] * 1000 / requests_served if requests_served else 0
+                bytes_served = server.bytes_sent.get(retailer, 0) - bytes_before
+                result["kb_per_product"] = bytes_served / 1024 / result["products"] if result["products"] else 0
+            results[retailer] = result
+    finally:
+        server.stop()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SCRAPERS_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_table(results, previous=None):
+    print(f"\n{'retailer':<10}{'pages':>7}{'pages/s':>10}{'parse ms/pg':>13}{'peak RSS MB':>13}{'wall s':>9}{'KB/prod':>9}")
+    for retailer, result in results.items():
+        if "skipped" in result:
+            print(f"{retailer:<10} skipped: {result['skipped']}")
+            continue
+        print(
+            f"{retailer:<10}{result['pages']:>7}{result['pages_per_s']:>10.1f}"
+            f"{result['parse_ms_per_page']:>13.2f}{result['peak_rss_mb']:>13.1f}{result['wall_s']:>9.2f}"
+            f"{result.get('kb_per_product', 0):>9.2f}"
+        )
+        old = (previous or {}).get(retailer)
+        if old and "skipped" not in old:
+            print(
+                f"{'  vs prev':<10}{'':>7}{result['pages_per_s'] - old['pages_per_s']:>+10.1f}"
+                f"{result['parse_ms_per_page'] - old['parse_ms_per_page']:>+13.2f}"
+                f"{result['peak_rss_mb'] - old['peak_rss_mb']:>+13.1f}{result['wall_s'] - old['wall_s']:>+9.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retailers", nargs="+", default=list(RETAILERS), choices=list(RETAILERS))
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the server waits per response")
+    parser.add_argument("--pages", type=int, default=5, help="pages per paginated listing")
+    parser.add_argument("--sequential", action="store_true", help="benchmark the blocking one-page-at-a-time path")
+    parser.add_argument("--bulk", action="store_true", help="use products.json enumeration for the Shopify stores")
+    parser.add_argument("--parse-processes", type=int, default=0, help="parse pages in this many worker processes")
+    parser.add_argument("--keep-delays", action="store_true", help="keep the rate limiter's politeness waits")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    run_kwargs = {"concurrent": not args.sequential, "use_cache": False}
+    results = run_benchmarks(
+        args.retailers, args.latency, args.pages, run_kwargs, args.keep_delays, args.bulk, args.parse_processes
+    )
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)["results"]
+    print_table(results, previous)
+
+    commit = _git_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "settings": {
+                "latency": args.latency,
+                "pages": args.pages,
+                "sequential": args.sequential,
+                "bulk": args.bulk,
+                "parse_processes": args.parse_processes,
+                "keep_delays": args.keep_delays,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Freshness and request volume: one crawl per category per day versus the learned crawl plan.
+
+Run from the Scrapers directory: python -m benchmarks.scheduler_bench [--days 21] [--budget 0.6]
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from shared.archive import category_urls
+from shared.scheduler import PAGE_SIZES, ChangeModel, due, plan
+
+RETAILERS = ("bonkers", "capsul", "zara")
+
+
+def true_rate(category, rng):
+    """Changes per product-day: new-in listings churn, sale listings reprice, basics sit still"""
+    if "new" in category:
+        return 0.6
+    if "event" in category:
+        return 0.3
+    return rng.uniform(0.005, 0.03)
+
+
+class Catalog:
+    """Categories whose products change price or are replaced as Poisson processes"""
+
+    def __init__(self, rng, products):
+        self.rng = rng
+        self.next_id = 0
+        self.categories = {}
+        for retailer in RETAILERS:
+            for category in category_urls(retailer):
+                items = {self._new_id(): 1000.0 for _ in range(products)}
+                self.categories[(retailer, category)] = {"rate": true_rate(category, rng), "items": items}
+
+    def _new_id(self):
+        self.next_id += 1
+        return str(self.next_id)
+
+    def step(self, hours):
+        for unit in self.categories.values():
+            p = 1 - math.exp(-unit["rate"] * hours / 24)
+            items = unit["items"]
+            for product_id in list(items):
+                if self.rng.random() < p:
+                    if self.rng.random() < 0.5:
+                        items[product_id] = round(items[product_id] * self.rng.uniform(0.6, 0.95))
+                    else:
+                        del items[product_id]
+                        items[self._new_id()] = 1000.0
+
+    def pages(self, key):
+        size = PAGE_SIZES.get(key[0])
+        return math.ceil(len(self.categories[key]["items"]) / size) + 1 if size else 1
+
+
+def simulate(policy, args, volatile_floor):
+    rng = random.Random(args.seed)
+    catalog = Catalog(rng, args.products)
+    model = ChangeModel(os.path.join(tempfile.mkdtemp(prefix="scheduler_bench_"), "schedule.sqlite3"))
+    no_archive = tempfile.mkdtemp()
+    keys = list(catalog.categories)
+    crawled = {key: {} for key in keys}
+    start = datetime(2025, 3, 1)
+    requests = 0
+    fresh = {"all": [0, 0], "volatile": [0, 0]}
+    crawl_plan = None
+    for hour in range(args.days * 24):
+        now = start + timedelta(hours=hour)
+        catalog.step(1)
+        warm = hour < args.warmup * 24
+        if policy == "baseline" or warm:
+            todo = [key for n, key in enumerate(keys) if n % 24 == hour % 24]
+        else:
+            if hour % 24 == 0:
+                crawl_plan = plan(model, args.budget * baseline_requests(catalog), now=now, archive_root=no_archive)
+            todo = [(r, c) for r, categories in due(crawl_plan, now).items() for c in categories]
+        by_retailer = {}
+        for key in todo:
+            crawled[key] = dict(catalog.categories[key]["items"])
+            by_retailer.setdefault(key[0], []).extend(
+                (product_id, price, key[1]) for product_id, price in crawled[key].items()
+            )
+            if not warm:
+                requests += catalog.pages(key)
+        for retailer, rows in by_retailer.items():
+            model.add_run(retailer, now.isoformat(), rows)
+        if warm:
+            continue
+        for key, unit in catalog.categories.items():
+            live = unit["items"]
+            current = sum(1 for product_id, price in live.items() if crawled[key].get(product_id) == price)
+            for group in ("all", "volatile") if unit["rate"] >= volatile_floor else ("all",):
+                fresh[group][0] += current
+                fresh[group][1] += len(live)
+    model.close()
+    days = args.days - args.warmup
+    return requests / days, fresh["all"][0] / fresh["all"][1], fresh["volatile"][0] / fresh["volatile"][1]
+
+
+def baseline_requests(catalog):
+    return sum(catalog.pages(key) for key in catalog.categories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=21, help="simulated days, warm-up included")
+    parser.add_argument("--warmup", type=int, default=7, help="days of daily crawls the model learns from")
+    parser.add_argument("--products", type=int, default=60, help="products per category")
+    parser.add_argument("--budget", type=float, default=0.6, help="plan budget as a share of the daily crawl")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'policy':<10}{'requests/day':>14}{'fresh all':>11}{'fresh volatile':>16}")
+    for policy in ("baseline", "plan"):
+        per_day, everything, volatile = simulate(policy, args, volatile_floor=0.3)
+        print(f"{policy:<10}{per_day:>14.1f}{everything:>11.1%}{volatile:>16.1%}")
+
+
+if __name__ == "__main__":
+    main()
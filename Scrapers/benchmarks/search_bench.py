@@ -0,0 +1,88 @@
+"""Search index build time and query latency on a large synthetic catalog.
+
+Run from the Scrapers directory: python -m benchmarks.search_bench [--products 300000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from shared.search import SearchIndex
+
+COLORS = ["Black", "White", "Beige", "Olive", "Navy", "Lavender", "Grey", "Maroon", "Brown", "Sky Blue"]
+FITS = ["Oversized", "Slim Fit", "Relaxed", "Regular Fit", "Boxy", "Cropped"]
+ITEMS = ["T-Shirt", "Tee", "Polo", "Shirt", "Hoodie", "Sweatshirt", "Jeans", "Cargo Pants", "Jacket", "Skirt"]
+DETAILS = ["Graphic", "Textured", "Striped", "Washed", "Printed", "Ribbed", "Zipper", "Pocket", "Denim", "Linen"]
+CATEGORIES = ["mens_new_arrivals", "mens_oversized_tees", "mens_jeans", "womens_dress", "T-Shirts", "Shirts", "pants"]
+
+QUERIES = [
+    {"text": "black oversized tee", "max_price": 1500},
+    {"text": "zipper polo"},
+    {"text": "washed denim jacket", "min_price": 2000},
+    {"category": "mens_*", "max_price": 999},
+    {"text": "linen shirt", "retailer": "snitch"},
+]
+
+
+def synthetic_snapshot(path, count, seed=0, first_id=8000000000000):
+    """Snitch-shaped NDJSON records with varied titles, colors and prices"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for n in range(count):
+            color = rng.choice(COLORS)
+            title = f"{color} {rng.choice(DETAILS)} {rng.choice(FITS)} {rng.choice(ITEMS)}"
+            f.write(json.dumps({
+                "id": first_id + n,
+                "title": title,
+                "selling_price": float(rng.randrange(399, 4999, 50)),
+                "short_description": f"{rng.choice(FITS)} {rng.choice(ITEMS).lower()} in soft cotton, {rng.choice(DETAILS).lower()} finish.",
+                "color": [color],
+                "colors": rng.sample(COLORS, 2),
+                "url": f"https://www.snitch.com/products/p-{n}",
+                "main_image": f"https://cdn.shopify.com/s/files/1/0420/7073/7058/files/{n}_1.jpg",
+                "category": rng.choice(CATEGORIES),
+                "scraped_at": "2025-03-08T18:02:27",
+            }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=300000, help="synthetic catalog size")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="search_bench_")
+    stem = os.path.join(workdir, "snitch_processed")
+    synthetic_snapshot(f"{stem}-0001.ndjson", args.products)
+    index = SearchIndex(os.path.join(workdir, "search.sqlite3"))
+
+    start = time.perf_counter()
+    added, _, _ = index.add_snapshot("snitch", stem)
+    print(f"Full build: {added} products in {time.perf_counter() - start:.1f}s")
+
+    # Next run: a new snapshot with 1% new products; the first snapshot is skipped as unchanged
+    new_stem = os.path.join(workdir, "snitch_processed_next")
+    synthetic_snapshot(f"{new_stem}-0001.ndjson", args.products // 100, seed=1, first_id=9000000000000)
+    start = time.perf_counter()
+    skipped = index.add_snapshot("snitch", stem) is None
+    added, _, _ = index.add_snapshot("snitch", new_stem)
+    print(f"Incremental run (+{added} products, old snapshot skipped: {skipped}): {time.perf_counter() - start:.2f}s")
+
+    print(f"\n{'query':<60}{'hits':>6}{'p50 ms':>9}{'p95 ms':>9}")
+    for query in QUERIES:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = index.search(**query)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        label = ", ".join(f"{k}={v}" for k, v in query.items())
+        print(f"{label:<60}{len(results):>6}{statistics.median(times):>9.2f}{times[int(len(times) * 0.95) - 1]:>9.2f}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fixtures import (
+    bonkers_collection_html,
+    bonkers_shopify_products,
+    capsul_collection_html,
+    capsul_shopify_products,
+    image_bytes,
+    shopify_products_json,
+    snitch_page_json,
+    zara_category_json,
+)
+
+
+class StandInServer:
+    """Local HTTP server that answers like the four retailers.
+
+    Routes are ``/bonkers/collections/<handle>?page=N``,
+    ``/capsul/collections/<handle>``, ``/<bonkers|capsul>/collections/<handle>/products.json?page=N&limit=M``,
+    ``/snitch/products?page=N&limit=M``,
+    ``/zara/<category>.html?page=N`` and ``/images/.../<name>``. Every
+    response waits ``latency`` seconds first; ``pages`` sets how deep each
+    paginated listing goes.
+    """
+
+    def __init__(self, latency=0.05, pages=5):
+        self.latency = latency
+        self.pages = pages
+        self.requests = {}
+        self.bytes_sent = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _record(self, retailer, size):
+        with self._lock:
+            self.requests[retailer] = self.requests.get(retailer, 0) + 1
+            self.bytes_sent[retailer] = self.bytes_sent.get(retailer, 0) + size
+
+    def render(self, path, query):
+        """Return ``(status, content_type, body)`` for a request path"""
+        parts = path.strip("/").split("/")
+        retailer = parts[0]
+        page = int(query.get("page", ["1"])[0])
+        handle = parts[-2] if parts[-1] == "products.json" else parts[-1]
+        # Distinct handles get distinct product IDs, with some overlap between neighbours
+        offset = (sum(map(ord, handle)) % 7) * 10
+
+        if parts[-1] == "products.json":
+            limit = int(query.get("limit", ["30"])[0])
+            if retailer == "bonkers":
+                products = bonkers_shopify_products(pages=self.pages, offset=offset)
+            else:
+                products = capsul_shopify_products(handle, count=self.pages * 24)
+            return 200, "application/json", shopify_products_json(products, page, limit)
+        if retailer == "bonkers":
+            return 200, "text/html", bonkers_collection_html(page, pages=self.pages, offset=offset)
+        if retailer == "capsul":
+            return 200, "text/html", capsul_collection_html(handle)
+        if retailer == "snitch":
+            limit = int(query.get("limit", ["50"])[0])
+            return 200, "application/json", snitch_page_json(page, limit=limit, pages=self.pages)
+        if retailer == "zara":
+            return 200, "application/json", zara_category_json(page, pages=self.pages, offset=offset)
+        if retailer == "images":
+            return 200, "image/jpeg", image_bytes(parts[-1])
+        return 404, "text/plain", "not found"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                time.sleep(server.latency)
+                status, content_type, body = server.render(url.path, parse_qs(url.query))
+                if isinstance(body, str):
+                    body = body.encode()
+                server._record(url.path.strip("/").split("/")[0], len(body))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
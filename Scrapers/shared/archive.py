@@ -0,0 +1,434 @@
+"""Archive every fetched payload and re-parse archived runs offline.
+
+Run from the Scrapers directory:
+    python -m shared.archive runs [zara]
+    python -m shared.archive replay zara --all --processes 8 --history /tmp/history.sqlite3
+"""
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+from shared.paths import STATE_DIR
+
+ARCHIVE_DIR = os.path.join(STATE_DIR, "archive")
+
+# Retailers whose crawl ends a category at the first listing page with nothing new
+STOP_ON_STALE_PAGE = ("bonkers", "snitch", "zara")
+# retailer -> name of its category URL dict in constants.py
+URL_DICTS = {"bonkers": "BONKERS_URLS", "capsul": "URLS", "zara": "ZARA_URLS"}
+# Snitch pages one API feed instead (its constants.URLS is unused)
+SNITCH_FEEDS = {"new_and_popular": "https://mxemjhp3rt.ap-south-1.awsapprunner.com/products/new-and-popular/v2"}
+# Storefront each scraper sets as its base_url
+BASE_URLS = {
+    "bonkers": "https://www.bonkerscorner.com",
+    "capsul": "https://www.shopcapsul.com",
+    "snitch": "https://www.snitch.com",
+    "zara": "https://www.zara.com",
+}
+
+
+class RawArchive:
+    """Response bodies stored once per SHA-256, gzipped, indexed by run/category/page.
+
+    Objects live at ``objects/<sha[:2]>/<sha>.gz``, the layout the image
+    store uses. An unchanged page costs one index row per run, not another
+    copy of the body. ``retailer`` and ``run_id`` label what ``store``
+    writes; reading needs neither.
+    """
+
+    def __init__(self, retailer=None, run_id=None, root=ARCHIVE_DIR):
+        self.retailer = retailer
+        self.run_id = run_id
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                retailer TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                PRIMARY KEY (retailer, run_id, category, page, url)
+            )"""
+        )
+        self.conn.commit()
+
+    def path(self, sha):
+        return os.path.join(self.objects, sha[:2], f"{sha}.gz")
+
+    def writer(self):
+        """An ``ArchiveWriter`` for a body that arrives in chunks"""
+        return ArchiveWriter(self)
+
+    def store(self, category, url, body):
+        """Archive one whole body; returns its SHA-256"""
+        with self.writer() as writer:
+            writer.write(body)
+            return writer.commit(category, url)
+
+    def record(self, category, url, sha, size):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.retailer, self.run_id, category, page_number(url), url, sha, size, datetime.now().isoformat()),
+        )
+        self.conn.commit()
+
+    def read(self, sha):
+        with gzip.open(self.path(sha), "rb") as f:
+            return f.read()
+
+    def runs(self, retailer=None):
+        """``(retailer, run_id, pages, bytes)`` per archived run, oldest first"""
+        where, args = ("WHERE retailer = ?", (retailer,)) if retailer else ("", ())
+        return self.conn.execute(
+            f"""SELECT retailer, run_id, COUNT(*), SUM(size) FROM pages {where}
+                GROUP BY retailer, run_id ORDER BY run_id""",
+            args,
+        ).fetchall()
+
+    def pages(self, retailer, run_id):
+        """``(category, page, url, sha)`` of one run in crawl order: category, then page"""
+        rows = self.conn.execute(
+            "SELECT category, page, url, sha256 FROM pages WHERE retailer = ? AND run_id = ? ORDER BY page, url",
+            (retailer, run_id),
+        ).fetchall()
+        order = {category: n for n, category in enumerate(category_urls(retailer))}
+        return sorted(rows, key=lambda row: (order.get(row[0], len(order)), row[0]))
+
+    def page_counts(self, retailer, last=5):
+        """Average pages per run of each category over its ``last`` archived runs"""
+        rows = self.conn.execute(
+            """SELECT category, COUNT(*) FROM pages WHERE retailer = ?
+               GROUP BY category, run_id ORDER BY category, run_id DESC""",
+            (retailer,),
+        ).fetchall()
+        counts = {}
+        for category, pages in rows:
+            counts.setdefault(category, []).append(pages)
+        return {category: math.ceil(sum(runs[:last]) / len(runs[:last])) for category, runs in counts.items()}
+
+    def bodies(self, retailer=None, run_id=None):
+        """Bodies of one run in crawl order, by default the run being written"""
+        for _, _, _, sha in self.pages(retailer or self.retailer, run_id or self.run_id):
+            yield self.read(sha)
+
+    def close(self):
+        self.conn.close()
+
+
+class ArchiveWriter:
+    """Compress and hash a body as it is written, then file it under its hash.
+
+    Leaving the ``with`` block without ``commit`` discards the partial object.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.hash = hashlib.sha256()
+        self.size = 0
+        fd, self.tmp = tempfile.mkstemp(dir=archive.objects, suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+        # mtime=0 keeps the compressed bytes a function of the body alone
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode="wb", mtime=0)
+
+    def write(self, chunk):
+        self.hash.update(chunk)
+        self.gzip.write(chunk)
+        self.size += len(chunk)
+
+    def tee(self, chunks):
+        """Pass chunks through while archiving them"""
+        for chunk in chunks:
+            self.write(chunk)
+            yield chunk
+
+    def commit(self, category, url):
+        self.gzip.close()
+        self.file.close()
+        sha = self.hash.hexdigest()
+        path = self.archive.path(sha)
+        if os.path.exists(path):
+            os.remove(self.tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.tmp, path)
+        self.tmp = None
+        self.archive.record(category, url, sha, self.size)
+        return sha
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.tmp is not None:
+            self.gzip.close()
+            self.file.close()
+            os.remove(self.tmp)
+
+
+def page_number(url):
+    return int(parse_qs(urlparse(url).query).get("page", ["1"])[0])
+
+
+def _query_int(url, name, default):
+    return int(parse_qs(urlparse(url).query).get(name, [default])[0])
+
+
+def _is_products_json(url):
+    return urlparse(url).path.endswith("/products.json")
+
+
+def load_constants(retailer):
+    """A retailer's constants.py, loaded without its scraper's dependencies"""
+    from shared.orchestrator import RETAILERS, SCRAPERS_DIR
+
+    path = os.path.join(SCRAPERS_DIR, RETAILERS[retailer][0], "constants.py")
+    spec = importlib.util.spec_from_file_location(f"{retailer}_constants", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def category_urls(retailer):
+    """``{category: url}`` in the order the scraper crawls them"""
+    if retailer == "snitch":
+        return SNITCH_FEEDS
+    return getattr(load_constants(retailer), URL_DICTS[retailer])
+
+
+def load_retailer(retailer):
+    """Import one retailer's main.py; each has its own ``constants`` module"""
+    from shared.orchestrator import RETAILERS, load_scraper_module
+
+    sys.modules.pop("constants", None)
+    return load_scraper_module(RETAILERS[retailer][0])
+
+
+class _Collect:
+    """Stand-in sink/emit target that keeps one page's records"""
+
+    def __init__(self):
+        self.records = []
+
+    def write_many(self, records):
+        self.records.extend(records)
+
+
+def _records(items):
+    return [item.to_dict() if hasattr(item, "to_dict") else item for item in items]
+
+
+class PageParser:
+    """Turn one fetched page body into records with the scrapers' own parse methods.
+
+    ``parse`` returns ``(records, more)``; ``more`` is False once the
+    category has no further page. Each call gets a scraper instance built
+    without ``__init__`` (which opens the seen index, checkpoints and
+    output files) and with empty dedup sets, so deduplication across
+    pages is up to the caller. Retailers whose scraper cannot be imported
+    are listed in ``skipped``.
+    """
+
+    def __init__(self, retailers):
+        from shared.orchestrator import RETAILERS
+
+        self.classes = {}
+        self.skipped = {}
+        for retailer in retailers:
+            try:
+                self.classes[retailer] = getattr(load_retailer(retailer), RETAILERS[retailer][1])
+            except ImportError as e:
+                self.skipped[retailer] = str(e)
+        self.run_timestamp = datetime.now().isoformat()
+
+    def _scraper(self, retailer, **attrs):
+        scraper = object.__new__(self.classes[retailer])
+        scraper.__dict__.update(attrs)
+        return scraper
+
+    def headers(self, retailer):
+        """The request headers the retailer's scraper sends"""
+        return self._scraper(retailer, base_url=BASE_URLS[retailer])._request_headers()
+
+    def parse(self, retailer, category, url, body):
+        return getattr(self, f"_{retailer}")(category, url, body)
+
+    def _bonkers(self, category, url, body):
+        scraper = self._scraper("bonkers", base_url=BASE_URLS["bonkers"], seen_products=set())
+        if _is_products_json(url):
+            items = json.loads(body).get("products") or []
+            products = scraper._process_shopify_products(items, category)
+            return _records(products), len(items) == _query_int(url, "limit", "30")
+        collection = scraper._extract_collection(body)
+        if not collection:
+            return [], False
+        return _records(scraper._process_collection(collection, category)), True
+
+    def _capsul(self, category, url, body):
+        out = _Collect()
+        scraper = self._scraper("capsul", base_url=BASE_URLS["capsul"], seen_ids=set(),
+                                _emit=out.write_many)
+        if _is_products_json(url):
+            items = json.loads(body).get("products") or []
+            limit = _query_int(url, "limit", "30")
+            scraper._process_shopify_products(items, category, first_position=(page_number(url) - 1) * limit + 1)
+            return out.records, len(items) == limit
+        for items in scraper._extract_itemlists(body):
+            scraper._process_itemlist(items, category)
+        # The ld+json item list covers the whole collection page the scraper reads
+        return out.records, False
+
+    def _snitch(self, category, url, body):
+        from shared.metrics import Metrics
+
+        out = _Collect()
+        scraper = self._scraper(
+            "snitch", base_url=BASE_URLS["snitch"], seen_ids=set(), sink=out, fetched_products=0,
+            scraped_at=self.run_timestamp, feed=category, metrics=Metrics("snitch"),
+        )
+        data = json.loads(body).get("data", {})
+        if not data.get("products"):
+            return [], False
+        scraper._build_records(data["products"])
+        return out.records, page_number(url) * _query_int(url, "limit", "50") < data.get("total_count", 0)
+
+    def _zara(self, category, url, body):
+        from shared.jsonstream import iter_chunks
+
+        scraper = self._scraper("zara", base_url=BASE_URLS["zara"], seen_products=set(),
+                                run_timestamp=self.run_timestamp)
+        data = scraper._parse_page(scraper._page_stream(), iter_chunks(body))
+        if not scraper._validate_response(data):
+            return [], False
+        products = scraper._extract_products(data, category)
+        return _records(products), bool(products)
+
+
+_worker = {}
+
+
+def _init_replay(retailer, root):
+    _worker["parser"] = PageParser([retailer])
+    _worker["archive"] = RawArchive(root=root)
+    _worker["retailer"] = retailer
+
+
+def _replay_page(job):
+    run_id, category, url, sha = job
+    parser = _worker["parser"]
+    # Records carry the run's own timestamp, as they did when it was crawled
+    parser.run_timestamp = run_id
+    records, _ = parser.parse(_worker["retailer"], category, url, _worker["archive"].read(sha))
+    return records
+
+
+def replay_pool(archive, retailer, processes=None):
+    """Process pool whose workers hold a parser for ``retailer``"""
+    ctx = multiprocessing.get_context("spawn")
+    return ctx.Pool(processes, initializer=_init_replay, initargs=(retailer, archive.root))
+
+
+def replay_run(archive, retailer, run_id, pool):
+    """Re-parse one archived run on ``pool``; returns its records in crawl order, deduplicated.
+
+    Pages are parsed in parallel, then merged the way the scraper merges
+    them: first occurrence of each product ID wins, and for listing
+    crawls the first page with nothing new ends its category.
+    """
+    pages = archive.pages(retailer, run_id)
+    jobs = [(run_id, category, url, sha) for category, _, url, sha in pages]
+    parsed = pool.map(_replay_page, jobs, chunksize=8)
+
+    seen = set()
+    records = []
+    stopped = set()
+    for (category, _, url, _), page_records in zip(pages, parsed):
+        if category in stopped:
+            continue
+        new = []
+        for record in page_records:
+            if record["id"] in seen:
+                continue
+            seen.add(record["id"])
+            new.append(record)
+        if not new and retailer in STOP_ON_STALE_PAGE and not _is_products_json(url):
+            stopped.add(category)
+        records.extend(new)
+    return records
+
+
+def replay(archive, retailer, run_ids, out_dir=".", processes=None, history=None):
+    """Replay runs oldest first into NDJSON snapshots and, optionally, a history store"""
+    from shared.catalog import MAPPERS
+    from shared.history import HistoryStore
+    from shared.output import NdjsonWriter
+
+    store = HistoryStore(history) if history else None
+    pool = replay_pool(archive, retailer, processes)
+    totals = []
+    for run_id in sorted(run_ids):
+        start = time.perf_counter()
+        records = replay_run(archive, retailer, run_id, pool)
+        stem = os.path.join(out_dir, f"{retailer}_replay_{run_id.replace(':', '').replace('-', '')[:15]}")
+        writer = NdjsonWriter(stem, ensure_ascii=False)
+        writer.write_many(records)
+        writer.close()
+        if store is not None:
+            run = store.begin(retailer, run_id)
+            run.observe([(row[0], row[2]) for row in map(MAPPERS[retailer], records)])
+            run.finish()
+        totals.append((run_id, len(records), time.perf_counter() - start, stem))
+    pool.close()
+    pool.join()
+    if store is not None:
+        store.close()
+    return totals
+
+
+if __name__ == "__main__":
+    from shared.orchestrator import RETAILERS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=ARCHIVE_DIR, help="archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    runs_cmd = sub.add_parser("runs", help="list archived runs")
+    runs_cmd.add_argument("retailer", nargs="?", choices=list(RETAILERS))
+    replay_cmd = sub.add_parser("replay", help="re-parse archived runs without the network")
+    replay_cmd.add_argument("retailer", choices=list(RETAILERS))
+    replay_cmd.add_argument("--run", action="append", default=[], help="run ID (repeatable)")
+    replay_cmd.add_argument("--all", action="store_true", help="every archived run of the retailer")
+    replay_cmd.add_argument("--processes", type=int, help="parser processes (default: CPU count)")
+    replay_cmd.add_argument("--out-dir", default=".", help="where replayed NDJSON snapshots go")
+    replay_cmd.add_argument("--history", help="history database to rebuild from the replayed runs")
+    args = parser.parse_args()
+
+    archive = RawArchive(root=args.root)
+    if args.command == "runs":
+        for retailer, run_id, pages, size in archive.runs(args.retailer):
+            print(f"{retailer:<8} {run_id:<28} {pages:>6} pages {size / 1024 / 1024:>9.1f} MB")
+    else:
+        run_ids = [run_id for _, run_id, _, _ in archive.runs(args.retailer)] if args.all else args.run
+        if not run_ids:
+            parser.error("replay needs --run or --all")
+        for run_id, products, elapsed, stem in replay(
+            archive, args.retailer, run_ids, args.out_dir, args.processes, args.history
+        ):
+            print(f"{run_id:<28} {products:>7} products in {elapsed:.1f}s -> {stem}-*.ndjson")
+    archive.close()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlencode, urlparse, parse_qsl, urlunparse
+
+from shared.paths import STATE_DIR
+
+CACHE_ROOT = os.path.join(STATE_DIR, ".http_cache")
+
+
+class ResponseCache:
+    """Persistent HTTP response cache with conditional revalidation.
+
+    Bodies live as files under ``directory``; an ``index.json`` keeps
+    validators (ETag/Last-Modified), sizes and last access times, and the
+    least recently used entries are evicted once the cache grows past
+    ``max_bytes``. Parse results are not cached: a revalidated body is
+    parsed again, so a parser change applies to unchanged pages too.
+    """
+
+    def __init__(self, retailer, directory=None, max_bytes=512 * 1024 * 1024, busting_params=()):
+        self.directory = directory or os.path.join(CACHE_ROOT, retailer)
+        self.max_bytes = max_bytes
+        self.busting_params = set(busting_params)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def strip_params(self, params):
+        """Drop the retailer's cache-busting params from a request"""
+        if not params:
+            return params
+        return {k: v for k, v in params.items() if k not in self.busting_params}
+
+    def key(self, url, params=None):
+        """Stable cache key for a URL plus params, ignoring cache-busting params"""
+        parts = urlparse(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k not in self.busting_params]
+        query += [(k, str(v)) for k, v in (params or {}).items() if k not in self.busting_params]
+        normalized = urlunparse(parts._replace(query=urlencode(sorted(query))))
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def conditional_headers(self, key):
+        """If-None-Match / If-Modified-Since headers for a cached entry"""
+        entry = self.index.get(key)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, key):
+        """Return the body of a revalidated entry, or None"""
+        entry = self.index.get(key)
+        if not entry:
+            return None
+        try:
+            with open(self._path(key, "body"), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.index.pop(key, None)
+            return None
+        entry["last_access"] = time.time()
+        self.hits += 1
+        return body
+
+    def put(self, key, response):
+        """Store a 200 response body with its validators; without any, nothing is cached"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        self.misses += 1
+        with open(self._path(key, "body"), "wb") as f:
+            f.write(response.content)
+        self.index[key] = {
+            "url": response.url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": len(response.content),
+            "last_access": time.time(),
+        }
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)["size"]
+            # parsed.json is left over from caches that also stored parse results
+            for suffix in ("body", "parsed.json"):
+                try:
+                    os.remove(self._path(key, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def flush(self):
+        """Evict down to ``max_bytes`` and persist the index"""
+        self._evict()
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,259 @@
+"""Normalize scraper output into one schema and export it as partitioned Parquet.
+
+Run from the Scrapers directory:
+    python -m shared.catalog zara Zara/zara_products_20250419_161318.json
+    python -m shared.catalog bonkers Bonkers/bonkers_products_20250420_060000 --date 2025-04-20
+
+Needs pyarrow (pip install pyarrow); the scrapers themselves do not.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+from datetime import date, datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # only the export needs it
+    pa = None
+
+from shared.output import iter_records, segment_paths
+from shared.paths import STATE_DIR
+
+CATALOG_DIR = os.path.join(STATE_DIR, "catalog")
+
+# retailer -> (site host, currency its prices are in)
+RETAILERS = {
+    "bonkers": ("www.bonkerscorner.com", "INR"),
+    "capsul": ("www.shopcapsul.com", "INR"),
+    "snitch": ("www.snitch.com", "INR"),
+    "zara": ("www.zara.com", "INR"),
+}
+
+COLUMNS = ("product_id", "title", "price", "url", "category", "images", "scraped_at")
+
+# The run timestamp scrapers put in snapshot names, e.g. zara_products_20250419_161318
+_NAME_STAMP = re.compile(r"_(\d{4})(\d{2})(\d{2})_\d{6}")
+# The amount in a price, e.g. "1,299.00" in "Rs. 1,299.00"
+PRICE_PATTERN = r"\d[\d,]*(?:\.\d+)?"
+# What a lowercased category name collapses to "_": "polo t-shirts" -> "polo_t_shirts"
+CATEGORY_SEPARATORS = "[^a-z0-9]+"
+
+
+def _bonkers(r):
+    prices = [v["price"] for v in r.get("variants", []) if v.get("price") is not None]
+    price = min(prices, key=float) if prices else None
+    return r["id"], r["title"], price, r["url"], r.get("category"), r.get("images") or [], None
+
+
+def _capsul(r):
+    images = [r["image"]] if r.get("image") else []
+    return r["id"], r["name"], r.get("price"), r["url"], r.get("category"), images, None
+
+
+def _snitch(r):
+    images = [r["main_image"]] if r.get("main_image") else []
+    return r["id"], r["title"], r.get("selling_price"), r["url"], r.get("category"), images, r.get("scraped_at")
+
+
+def _zara(r):
+    return r["id"], r["name"], r.get("price"), r["url"], r.get("category"), r.get("images") or [], r.get("timestamp")
+
+
+# Each mapper only picks fields out of one record; all cleanup happens per batch
+MAPPERS = {"bonkers": _bonkers, "capsul": _capsul, "snitch": _snitch, "zara": _zara}
+
+
+def schema():
+    return pa.schema([
+        ("product_id", pa.string()),
+        ("title", pa.string()),
+        ("price", pa.float64()),
+        ("currency", pa.string()),
+        ("url", pa.string()),
+        ("category", pa.string()),
+        ("image", pa.string()),
+        ("images", pa.list_(pa.string())),
+        ("scraped_at", pa.timestamp("us")),
+        ("retailer", pa.string()),
+        ("date", pa.string()),
+    ])
+
+
+def _normalize_urls(urls, host):
+    # Protocol-relative links, and Capsul's "https://host/host/..." doubling
+    urls = pc.replace_substring_regex(urls, pattern="^//", replacement="https://")
+    return pc.replace_substring(urls, pattern=f"{host}/{host}/", replacement=f"{host}/")
+
+
+def normalize_price(value):
+    """One price as ``normalize_batch`` reads it: 1299, "1299.00" and "Rs. 1,299.00" -> 1299.0"""
+    if value is None:
+        return None
+    match = re.search(PRICE_PATTERN, str(value))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def normalize_category(value):
+    """One category as ``normalize_batch`` writes it: "Polo T-Shirts" -> "polo_t_shirts" """
+    if not value:
+        return None
+    return re.sub(CATEGORY_SEPARATORS, "_", value.lower()).strip("_")
+
+
+def normalize_url(url, host):
+    """One URL or image link as ``normalize_batch`` writes it"""
+    if url and url.startswith("//"):
+        url = f"https:{url}"
+    return url and url.replace(f"{host}/{host}/", f"{host}/")
+
+
+def normalize_batch(retailer, columns, run_date):
+    """Turn one batch of mapped columns into a table in the catalog schema.
+
+    Every cleanup step is an Arrow compute kernel over the whole column.
+    """
+    host, currency = RETAILERS[retailer]
+    size = len(columns["product_id"])
+
+    price = pa.array([None if p is None else str(p) for p in columns["price"]], pa.string())
+    # "Rs. 1,299.00" and 1299.0 both become 1299.0; anything without a number becomes null
+    price = pc.struct_field(pc.extract_regex(price, pattern=f"(?P<amount>{PRICE_PATTERN})"), [0])
+    price = pc.cast(pc.replace_substring(price, pattern=",", replacement=""), pa.float64())
+
+    url = _normalize_urls(pa.array(columns["url"], pa.string()), host)
+
+    images = pa.array(columns["images"], pa.list_(pa.string()))
+    flat = _normalize_urls(pc.list_flatten(images), host)
+    images = pa.ListArray.from_arrays(images.offsets, flat)
+    # First image, or null when the list is empty
+    padded = pc.if_else(pc.greater(pc.list_value_length(images), 0), images, pa.scalar([None], images.type))
+    image = pc.list_element(padded, 0)
+
+    # "mens_new_arrivals", "Polo T-Shirts" -> "mens_new_arrivals", "polo_t_shirts"
+    category = pc.utf8_lower(pa.array(columns["category"], pa.string()))
+    category = pc.replace_substring_regex(category, pattern=CATEGORY_SEPARATORS, replacement="_")
+    category = pc.utf8_trim(category, characters="_")
+
+    scraped_at = pc.cast(pa.array(columns["scraped_at"], pa.string()), pa.timestamp("us"))
+    scraped_at = pc.fill_null(scraped_at, pa.scalar(datetime.fromisoformat(run_date), pa.timestamp("us")))
+
+    return pa.Table.from_arrays([
+        pa.array([str(product_id) for product_id in columns["product_id"]], pa.string()),
+        pa.array(columns["title"], pa.string()),
+        price,
+        pa.array([currency] * size, pa.string()),
+        url,
+        category,
+        image,
+        images,
+        scraped_at,
+        pa.array([retailer] * size, pa.string()),
+        pa.array([run_date] * size, pa.string()),
+    ], schema=schema())
+
+
+class CatalogWriter:
+    """Buffers mapped records and writes them to ``catalog/retailer=<r>/date=<d>/``.
+
+    Records are normalized ``batch_size`` at a time, so memory is bounded
+    by the batch rather than the snapshot. Each run's files are named
+    after ``run_id``, so several runs on one day sit side by side in the
+    partition; opening a writer only replaces an earlier export of the
+    same run.
+    """
+
+    def __init__(self, retailer, run_date=None, root=CATALOG_DIR, batch_size=50000, run_id=None):
+        if pa is None:
+            raise RuntimeError("The catalog export needs pyarrow: pip install pyarrow")
+        self.retailer = retailer
+        self.run_date = run_date or date.today().isoformat()
+        self.root = root
+        self.batch_size = batch_size
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.map = MAPPERS[retailer]
+        self.count = 0
+        self.batches = 0
+        self._columns = {name: [] for name in COLUMNS}
+        for old in glob.glob(os.path.join(glob.escape(self.partition_path()), f"part-{glob.escape(self.run_id)}-*")):
+            os.remove(old)
+
+    def partition_path(self):
+        return os.path.join(self.root, f"retailer={self.retailer}", f"date={self.run_date}")
+
+    def add(self, record):
+        for name, value in zip(COLUMNS, self.map(record)):
+            self._columns[name].append(value)
+        if len(self._columns["product_id"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._columns["product_id"]:
+            return
+        table = normalize_batch(self.retailer, self._columns, self.run_date)
+        pq.write_to_dataset(
+            table,
+            self.root,
+            partition_cols=["retailer", "date"],
+            basename_template=f"part-{self.run_id}-{self.batches:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        self.count += table.num_rows
+        self.batches += 1
+        self._columns = {name: [] for name in COLUMNS}
+
+    def close(self):
+        self.flush()
+        return self.count
+
+
+def iter_snapshot(path):
+    """Records from a legacy ``.json`` snapshot or from an NDJSON segment stem"""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+    else:
+        yield from iter_records(path)
+
+
+def export(retailer, paths, run_date=None, root=CATALOG_DIR, batch_size=50000):
+    """Export snapshots of one retailer and run date; returns the row count"""
+    run_id = os.path.basename(paths[0])
+    if run_id.endswith(".json"):
+        run_id = run_id[:-len(".json")]
+    writer = CatalogWriter(retailer, run_date, root, batch_size, run_id)
+    for path in paths:
+        for record in iter_snapshot(path):
+            writer.add(record)
+    return writer.close()
+
+
+def _snapshot_date(retailer, path):
+    """Date a snapshot was scraped: its records' timestamp, else the one in its name, else its mtime"""
+    for record in iter_snapshot(path):
+        scraped_at = MAPPERS[retailer](record)[6]
+        if scraped_at:
+            return datetime.fromisoformat(scraped_at).date().isoformat()
+        break
+    stamp = _NAME_STAMP.search(os.path.basename(path))
+    if stamp:
+        return "-".join(stamp.groups())
+    files = [path] if os.path.exists(path) else segment_paths(path)
+    return datetime.fromtimestamp(max(os.path.getmtime(f) for f in files)).date().isoformat()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("retailer", choices=list(RETAILERS))
+    parser.add_argument("paths", nargs="+", help="legacy .json snapshots or NDJSON segment stems")
+    parser.add_argument("--date", help="partition date (default: when the snapshot was scraped)")
+    parser.add_argument("--root", default=CATALOG_DIR, help="dataset root directory")
+    parser.add_argument("--batch-size", type=int, default=50000, help="records normalized per batch")
+    args = parser.parse_args()
+
+    run_date = args.date or _snapshot_date(args.retailer, args.paths[0])
+    total = export(args.retailer, args.paths, run_date, args.root, args.batch_size)
+    print(f"Wrote {total} {args.retailer} products to {os.path.join(args.root, f'retailer={args.retailer}', f'date={run_date}')}")
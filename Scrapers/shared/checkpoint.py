@@ -0,0 +1,86 @@
+import os
+
+from shared.output import NdjsonWriter, remove_segments
+from shared.paths import STATE_DIR
+
+CHECKPOINT_DIR = os.path.join(STATE_DIR, "checkpoints")
+
+
+class Checkpoint:
+    """Crawl cursor for one retailer, saved in the seen-index database.
+
+    The state holds the run's start time, the NDJSON stem products are
+    written to and how far it was fsynced, the categories already finished
+    and the next page of each category in progress. Each ``commit`` stores
+    the cursor and the seen IDs it covers in one transaction; on resume the
+    output is truncated back to the saved position, so pages fetched after
+    the last checkpoint are fetched again rather than written twice.
+    """
+
+    def __init__(self, index, retailer):
+        self.index = index
+        self.retailer = retailer
+        self.state = None
+
+    def journal_stem(self, timestamp):
+        """Stem for runs that only want the legacy JSON file at the end"""
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        return os.path.join(CHECKPOINT_DIR, f"{self.retailer}_{timestamp}")
+
+    def begin(self, resume, run_at, stem, journal=False):
+        """Load the saved state when resuming, otherwise start a fresh one"""
+        state = self.index.load_checkpoint(self.retailer)
+        if resume and state is not None:
+            print(f"Resuming {self.retailer} crawl started {state['run_at']} "
+                  f"({state['products']} products, {len(state['completed'])} categories done)")
+            self.state = state
+            return state
+        if resume:
+            print(f"No {self.retailer} checkpoint found, starting a fresh crawl")
+        if state is not None and state["journal"]:
+            # An abandoned run's journal is never converted, so drop it now
+            remove_segments(state["stem"])
+        self.state = {
+            "run_at": run_at,
+            "stem": stem,
+            "journal": journal,
+            "position": [0, None],
+            "products": 0,
+            "completed": [],
+            "cursor": {},
+        }
+        # Saved right away so a crash before the first page still leaves a journal to resume
+        self.index.save_checkpoint(self.retailer, self.state)
+        self.index.commit()
+        return self.state
+
+    def open_sink(self, **kwargs):
+        return NdjsonWriter.resume(self.state["stem"], self.state["position"], **kwargs)
+
+    def is_complete(self, category):
+        return category in self.state["completed"]
+
+    def next_page(self, category, default=1):
+        return self.state["cursor"].get(category, default)
+
+    def commit(self, sink, seen_ids, history, products, category=None, next_page=None):
+        """Persist everything up to now; ``next_page=None`` marks ``category`` finished"""
+        self.state["position"] = sink.position()
+        self.state["products"] = products
+        if category is not None:
+            if next_page is None:
+                self.state["cursor"].pop(category, None)
+                if category not in self.state["completed"]:
+                    self.state["completed"].append(category)
+            else:
+                self.state["cursor"][category] = next_page
+        history.commit()
+        seen_ids.flush(commit=False)
+        self.index.save_checkpoint(self.retailer, self.state)
+        self.index.commit()
+
+    def clear(self, keep_journal=False):
+        """Forget the cursor once the run's output is saved"""
+        self.index.clear_checkpoint(self.retailer)
+        if self.state["journal"] and not keep_journal:
+            remove_segments(self.state["stem"])
@@ -0,0 +1,269 @@
+"""Find near-duplicate products across categories and retailers.
+
+Run from the Scrapers directory:
+    python -m shared.dedup index --all
+    python -m shared.dedup clusters --min-size 2
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import sqlite3
+from array import array
+from urllib.parse import urlparse
+
+from shared.catalog import MAPPERS, iter_snapshot
+from shared.output import segment_paths
+from shared.paths import STATE_DIR
+
+DEDUP_PATH = os.path.join(STATE_DIR, "near_dupes.sqlite3")
+
+_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"[a-z0-9]+")
+# Size/crop suffixes CDNs add to the same asset: _1024x1024, -e1, @2x
+_IMAGE_SUFFIX = re.compile(r"(?:[_-]\d+x\d*|@\dx|[_-]e\d+)$")
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+def normalize_title(title):
+    """Lowercased words, without long digit runs (product codes and IDs)"""
+    words = _WORD.findall((title or "").lower())
+    return " ".join(w for w in words if not (w.isdigit() and len(w) >= 4))
+
+
+def image_key(url):
+    """File name of an image without query, extension or size suffix"""
+    name = os.path.basename(urlparse(url).path).rsplit(".", 1)[0].lower()
+    return _IMAGE_SUFFIX.sub("", name)
+
+
+def features(title, images, shingle=4):
+    """Character shingles of the normalized title plus one token per image"""
+    text = normalize_title(title)
+    tokens = {text[i:i + shingle] for i in range(max(len(text) - shingle + 1, 1))} if text else set()
+    tokens.update(f"img:{image_key(url)}" for url in images if url)
+    return tokens
+
+
+class MinHasher:
+    """MinHash signatures from ``size`` universal hashes of one 64-bit token hash.
+
+    Each token is hashed once; hash ``i`` maps it to ``(a_i * h + b_i) mod p``
+    with the Mersenne prime p = 2**61 - 1, and the signature keeps the
+    minimum per hash. The fraction of equal positions between two
+    signatures estimates the Jaccard similarity of their token sets.
+    """
+
+    def __init__(self, size=128, seed=1):
+        self.size = size
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(size)]
+
+    def signature(self, tokens):
+        hashes = [_hash(token) for token in tokens] or [0]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self.permutations]
+
+
+def similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """Signatures, LSH buckets and confirmed duplicate pairs in SQLite.
+
+    A signature is cut into ``bands`` bands; products sharing any band
+    bucket are candidates, and candidates whose signatures agree on at
+    least ``threshold`` of their bins are recorded as a pair. Each new
+    product costs one bucket lookup, so indexing stays incremental and
+    sub-quadratic. Products are keyed ``<retailer>:<product_id>``.
+    """
+
+    def __init__(self, path=DEDUP_PATH, size=128, bands=16, threshold=0.7):
+        if size % bands:
+            raise ValueError("size must be a multiple of bands")
+        self.hasher = MinHasher(size)
+        self.bands = bands
+        self.rows = size // bands
+        self.threshold = threshold
+        self.comparisons = 0
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS signatures (
+                key TEXT PRIMARY KEY,
+                title TEXT,
+                url TEXT,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                key TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_by_band ON buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS buckets_by_key ON buckets (key);
+            CREATE TABLE IF NOT EXISTS pairs (
+                a TEXT NOT NULL,
+                b TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                PRIMARY KEY (a, b)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            );"""
+        )
+        self.conn.commit()
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        keys = []
+        for band in range(self.bands):
+            chunk = array("Q", signature[band * rows:(band + 1) * rows]).tobytes()
+            keys.append((band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True)))
+        return keys
+
+    def add(self, key, title, url, images):
+        """Index one product and return the keys it was found to duplicate"""
+        signature = self.hasher.signature(features(title, images))
+        blob = array("Q", signature).tobytes()
+        row = self.conn.execute("SELECT signature FROM signatures WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            if row[0] == blob:
+                return []
+            # Changed since it was indexed: drop its old buckets and pairs
+            self.conn.execute("DELETE FROM buckets WHERE key = ?", (key,))
+            self.conn.execute("DELETE FROM pairs WHERE a = ? OR b = ?", (key, key))
+
+        band_keys = self._band_keys(signature)
+        clause = " OR ".join(["(band = ? AND bucket = ?)"] * len(band_keys))
+        candidates = {
+            other for other, in self.conn.execute(
+                f"SELECT DISTINCT key FROM buckets WHERE {clause}", [v for bk in band_keys for v in bk]
+            )
+        }
+        candidates.discard(key)
+
+        matches = []
+        self.comparisons += len(candidates)
+        for other in candidates:
+            other_blob = self.conn.execute("SELECT signature FROM signatures WHERE key = ?", (other,)).fetchone()[0]
+            score = similarity(signature, array("Q", other_blob))
+            if score >= self.threshold:
+                a, b = sorted((key, other))
+                self.conn.execute("INSERT OR REPLACE INTO pairs VALUES (?, ?, ?)", (a, b, score))
+                matches.append(other)
+
+        self.conn.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?)", (key, title, url, blob))
+        self.conn.executemany(
+            "INSERT INTO buckets VALUES (?, ?, ?)", [(band, bucket, key) for band, bucket in band_keys]
+        )
+        return matches
+
+    def add_snapshot(self, retailer, path):
+        """Index a snapshot unless it is unchanged; returns ``(products, new pairs)`` or None"""
+        files = [path] if os.path.exists(path) else segment_paths(path)
+        if not files:
+            raise FileNotFoundError(path)
+        mtime = max(os.path.getmtime(f) for f in files)
+        size = sum(os.path.getsize(f) for f in files)
+        source = os.path.abspath(path)
+        if self.conn.execute(
+            "SELECT 1 FROM sources WHERE path = ? AND mtime = ? AND size = ?", (source, mtime, size)
+        ).fetchone():
+            return None
+        products = pairs = 0
+        for record in iter_snapshot(path):
+            product_id, title, _, url, _, images, _ = MAPPERS[retailer](record)
+            pairs += len(self.add(f"{retailer}:{product_id}", title, url, images))
+            products += 1
+        self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (source, mtime, size))
+        self.conn.commit()
+        return products, pairs
+
+    def clusters(self, min_size=2):
+        """Connected groups of duplicate pairs, largest first"""
+        parent = {}
+
+        def find(x):
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b in self.conn.execute("SELECT a, b FROM pairs"):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_a] = root_b
+        groups = {}
+        for key in parent:
+            groups.setdefault(find(key), []).append(key)
+        return sorted((sorted(g) for g in groups.values() if len(g) >= min_size), key=len, reverse=True)
+
+    def describe(self, key):
+        return self.conn.execute("SELECT title, url FROM signatures WHERE key = ?", (key,)).fetchone()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def update(index, snapshots):
+    """Index ``{retailer: [paths]}``; returns ``{retailer: (products, new pairs, skipped)}``"""
+    totals = {}
+    for retailer, paths in snapshots.items():
+        products = pairs = skipped = 0
+        for path in paths:
+            result = index.add_snapshot(retailer, path)
+            if result is None:
+                skipped += 1
+                continue
+            products += result[0]
+            pairs += result[1]
+        totals[retailer] = (products, pairs, skipped)
+    return totals
+
+
+if __name__ == "__main__":
+    from shared.search import SNAPSHOTS, discover_snapshots
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DEDUP_PATH, help="near-duplicate index path")
+    parser.add_argument("--threshold", type=float, default=0.7, help="estimated Jaccard needed to call a pair")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_cmd = sub.add_parser("index", help="add snapshots to the index")
+    index_cmd.add_argument("retailer", nargs="?", choices=list(SNAPSHOTS))
+    index_cmd.add_argument("paths", nargs="*", help="legacy .json snapshots or NDJSON segment stems")
+    index_cmd.add_argument("--all", action="store_true", help="every snapshot in the scraper directories")
+    clusters_cmd = sub.add_parser("clusters", help="print groups of near-duplicate products")
+    clusters_cmd.add_argument("--min-size", type=int, default=2)
+    clusters_cmd.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    index = NearDuplicateIndex(args.db, threshold=args.threshold)
+    if args.command == "index":
+        if args.all:
+            snapshots = discover_snapshots()
+        elif args.retailer and args.paths:
+            snapshots = {args.retailer: args.paths}
+        else:
+            parser.error("index needs --all or a retailer and snapshot paths")
+        for retailer, (products, pairs, skipped) in update(index, snapshots).items():
+            print(f"{retailer:<8} {products} products | {pairs} new duplicate pairs | {skipped} unchanged snapshots skipped")
+    else:
+        clusters = index.clusters(args.min_size)
+        for cluster in clusters[:args.limit]:
+            print(f"\n{len(cluster)} products:")
+            for key in cluster:
+                title, url = index.describe(key)
+                print(f"   {key:<32} {title[:50]:<50} {url}")
+        print(f"\n{len(clusters)} clusters")
+    index.close()
@@ -0,0 +1,51 @@
+import re
+from functools import lru_cache
+
+_SCRIPT_TAG = r"<script\b([^>]*)>(.*?)</script\s*>"
+
+
+@lru_cache(maxsize=64)
+def _compile(source, as_bytes):
+    flags = re.DOTALL | re.IGNORECASE
+    return re.compile(source.encode() if as_bytes else source, flags)
+
+
+def _pattern(source, html):
+    """Compiled pattern matching the type (bytes or str) of ``html``"""
+    return _compile(source, isinstance(html, bytes))
+
+
+def _decode(body):
+    return body.decode("utf-8", errors="replace") if isinstance(body, bytes) else body
+
+
+def script_by_id(html, script_id):
+    """Return the body of ``<script id=...>`` without building a DOM, or None.
+
+    ``html`` may be the raw response bytes or decoded text.
+    """
+    source = r"<script\b[^>]*\bid=[\"']" + re.escape(script_id) + r"[\"'][^>]*>(.*?)</script\s*>"
+    match = _pattern(source, html).search(html)
+    if not match:
+        return None
+    return _decode(match.group(1))
+
+
+def scripts_by_type(html, script_type, required_attr=None):
+    """Return the bodies of every ``<script type=...>`` block, in page order.
+
+    With ``required_attr`` only tags carrying that attribute are kept, like
+    BeautifulSoup's ``attrs={name: True}``.
+    """
+    type_attr = _pattern(r"\btype=[\"']" + re.escape(script_type) + r"[\"']", html)
+    extra_attr = _pattern(r"(?:^|\s)" + re.escape(required_attr) + r"(?:[\s=/]|$)", html) if required_attr else None
+
+    bodies = []
+    for match in _pattern(_SCRIPT_TAG, html).finditer(html):
+        attrs = match.group(1)
+        if not type_attr.search(attrs):
+            continue
+        if extra_attr is not None and not extra_attr.search(attrs):
+            continue
+        bodies.append(_decode(match.group(2)))
+    return bodies
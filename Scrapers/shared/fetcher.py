@@ -0,0 +1,245 @@
+import asyncio
+import time
+from contextlib import nullcontext
+from urllib.parse import urlparse
+
+import requests
+
+
+class PageFailed(Exception):
+    """A listing page failed for good: no response, or an HTTP error other than 404.
+
+    Paginated crawls raise it instead of stopping there, so a category cut
+    short by errors is never mistaken for one that reached its last page.
+    """
+
+    def __init__(self, url, response):
+        status = "no response" if response is None else f"HTTP {response.status_code}"
+        super().__init__(f"{status} from {url}")
+
+
+def check_page(url, response):
+    """Raise ``PageFailed`` unless ``response`` is a page or a 404 past the last page"""
+    if response is None or (not response.ok and response.status_code != 404):
+        raise PageFailed(url, response)
+
+
+class FetchEngine:
+    """Bounded-concurrency asyncio fetcher shared by all scrapers.
+
+    Requests are issued through a pooled ``requests.Session`` on worker
+    threads, limited by a global semaphore and one semaphore per host. With
+    a ``ResponseCache`` attached, pages are revalidated with conditional
+    requests and unchanged pages reuse their cached parse result. With a
+    ``RateLimiter`` attached, every attempt waits for its host's token and
+    reports back so the host's rate adapts. With a ``RawArchive`` attached,
+    every page handed to a parser is archived under its ``label``. With a
+    ``ParsePool`` attached, successful bodies go to its worker processes
+    for jobs that name a ``remote`` parse method.
+    """
+
+    def __init__(self, headers=None, max_concurrency=8, per_host=4, timeout=30, cache=None, metrics=None,
+                 limiter=None, archive=None, parsers=None):
+        self.headers = headers or {}
+        self.cache = cache
+        self.archive = archive
+        self.parsers = parsers
+        self.metrics = metrics
+        self.limiter = limiter
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=max_concurrency, pool_maxsize=max_concurrency
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._global = None
+        self._hosts = {}
+
+        # Run metrics
+        self.total_requests = 0
+        self.failed_requests = 0
+        self.job_times = {}
+        self.busy_time = 0.0
+        self.wall_time = 0.0
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    def _stage(self, name, label):
+        return self.metrics.stage(name, label) if self.metrics else nullcontext()
+
+    async def fetch(self, url, params=None, headers=None, retries=0, backoff=2, label=None):
+        """Fetch a URL, retrying 429/5xx and network errors.
+
+        Returns the last ``requests.Response`` (which may be non-2xx) or
+        ``None`` if every attempt failed at the network level. ``label``
+        (usually the category) keys the request in the run metrics. Without
+        a limiter, retries back off by ``backoff ** attempt`` seconds.
+        """
+        response = None
+        for attempt in range(retries + 1):
+            if self.limiter is not None:
+                self.busy_time += await self.limiter.acquire_async(url)
+            async with self._global, self._host_semaphore(url):
+                self.total_requests += 1
+                started = time.perf_counter()
+                try:
+                    with self._stage("fetch", label):
+                        response = await asyncio.to_thread(
+                            self.session.get,
+                            url,
+                            params=params,
+                            headers=headers or self.headers,
+                            timeout=self.timeout,
+                        )
+                except requests.exceptions.RequestException as e:
+                    self.failed_requests += 1
+                    print(f"\n   ⚠️ Request failed ({url}): {str(e)}")
+                    response = None
+                elapsed = time.perf_counter() - started
+                self.busy_time += elapsed
+            if self.limiter is not None:
+                self.limiter.feedback(url, response, elapsed)
+            if response is not None and response.status_code < 500 and response.status_code != 429:
+                self._record(label, response, attempt)
+                return response
+            if response is not None:
+                self.failed_requests += 1
+            if attempt < retries and self.limiter is None:
+                await asyncio.sleep(backoff ** attempt)
+        self._record(label, response, retries)
+        return response
+
+    def _record(self, label, response, retries):
+        if self.metrics is None:
+            return
+        if response is None:
+            self.metrics.record_response(label, "error", 0, retries)
+        else:
+            self.metrics.record_response(label, response.status_code, len(response.content), retries)
+
+    async def fetch_parsed(self, url, parse, params=None, retries=0, label=None, remote=None):
+        """Fetch a URL and return ``(response, parse(response))``.
+
+        On a 304 the cached body is put back on the response and parsed like
+        a fresh one, so the result always comes from the current parser.
+        With a parse pool attached, a 200 body is parsed by the pool's
+        ``remote`` method instead, which must give the same result ``parse``
+        would.
+        """
+        if self.cache is None:
+            response = await self.fetch(url, params=params, retries=retries, label=label)
+            self._archive(label, response)
+            return response, await self._parse(parse, remote, response, label)
+
+        key = self.cache.key(url, params)
+        params = self.cache.strip_params(params)
+        headers = {**self.headers, **self.cache.conditional_headers(key)}
+        response = await self.fetch(url, params=params, headers=headers, retries=retries, label=label)
+
+        revalidated = False
+        if response is not None and response.status_code == 304:
+            body = self.cache.get(key)
+            if body is not None:
+                response._content = body
+                response.status_code = 200
+                revalidated = True
+            else:
+                # Body went missing from the cache, so ask again unconditionally
+                response = await self.fetch(url, params=params, retries=retries, label=label)
+
+        self._archive(label, response)
+        parsed = await self._parse(parse, remote, response, label)
+        if not revalidated and response is not None and response.status_code == 200:
+            self.cache.put(key, response)
+        return response, parsed
+
+    async def _parse(self, parse, remote, response, label):
+        with self._stage("parse", label):
+            offload = self.parsers is not None and remote is not None
+            if offload and response is not None and response.status_code == 200:
+                return await self.parsers.parse(remote, response.content)
+            return parse(response)
+
+    def _archive(self, label, response):
+        if self.archive is not None and response is not None and response.status_code == 200:
+            self.archive.store(label, response.url, response.content)
+
+    async def paginate(self, build_request, parse, start=1, retries=0, label=None, remote=None):
+        """Walk numbered pages until ``parse`` returns nothing.
+
+        ``build_request(page)`` returns ``(url, params)`` and
+        ``parse(response, page)`` returns the page's items, or a falsy value
+        to stop. The per-page results are returned in page order. A page
+        that fails raises ``PageFailed`` rather than ending the walk.
+        """
+        pages = []
+        page = start
+        while True:
+            url, params = build_request(page)
+            response, items = await self.fetch_parsed(
+                url, lambda r: parse(r, page), params=params, retries=retries, label=label, remote=remote
+            )
+            check_page(url, response)
+            if not items:
+                break
+            pages.append(items)
+            page += 1
+        return pages
+
+    async def _timed(self, key, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.job_times[key] = time.perf_counter() - start
+
+    async def _gather(self, jobs, on_result=None):
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._hosts = {}
+        tasks = [asyncio.ensure_future(self._timed(key, coro)) for key, coro in jobs.items()]
+        results = {}
+        # Awaiting in key order hands each result over as soon as every earlier job is done
+        for key, task in zip(jobs, tasks):
+            try:
+                results[key] = await task
+            except Exception as e:
+                results[key] = e
+            if on_result is not None:
+                on_result(key, results[key])
+        return results
+
+    def run(self, jobs, on_result=None):
+        """Run a ``{key: coroutine}`` mapping concurrently.
+
+        Results come back as a dict in the same key order as ``jobs``; a job
+        that raised maps to its exception instead of a result. ``on_result``
+        is called with each key and result in that order while later jobs
+        are still running, so merging can overlap with fetching.
+        """
+        start = time.perf_counter()
+        results = asyncio.run(self._gather(jobs, on_result))
+        self.wall_time = time.perf_counter() - start
+        if self.cache is not None:
+            self.cache.flush()
+        if self.limiter is not None:
+            self.limiter.save()
+        return results
+
+    def report(self):
+        """Print wall time against the time the same requests take back to back"""
+        sequential = self.busy_time
+        speedup = sequential / self.wall_time if self.wall_time else 0
+        print(f"\n⏱️ Concurrent fetch: {len(self.job_times)} jobs, {self.total_requests} requests")
+        print(f"   Wall time: {self.wall_time:.2f}s | Sequential estimate: {sequential:.2f}s | Speedup: {speedup:.1f}x")
+        if self.cache is not None:
+            print(f"   Cache: {self.cache.hits} not modified | {self.cache.misses} downloaded")
+        if self.parsers is not None:
+            print(f"   Parse pool: {self.parsers.jobs} pages in {self.parsers.processes} processes")
@@ -0,0 +1,201 @@
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+
+from shared.paths import STATE_DIR
+
+HISTORY_PATH = os.path.join(STATE_DIR, "history.sqlite3")
+
+
+class HistoryStore:
+    """Per-product price and availability history, stored as deltas.
+
+    ``current`` holds the latest known state of each product; ``changes``
+    only gets a row when a product appears, disappears or changes price, so
+    storage grows with churn rather than with catalog size.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS current (
+                retailer TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                price REAL,
+                active INTEGER NOT NULL,
+                PRIMARY KEY (retailer, product_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS changes (
+                retailer TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                run_at TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                old_price REAL,
+                new_price REAL
+            );
+            CREATE INDEX IF NOT EXISTS changes_by_product ON changes (retailer, product_id, run_at);
+            CREATE INDEX IF NOT EXISTS changes_by_time ON changes (run_at);
+            CREATE TABLE IF NOT EXISTS observed (
+                retailer TEXT NOT NULL,
+                run_at TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                price REAL,
+                PRIMARY KEY (retailer, run_at, product_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS runs (
+                retailer TEXT NOT NULL,
+                run_at TEXT NOT NULL,
+                observed INTEGER NOT NULL,
+                new INTEGER NOT NULL,
+                removed INTEGER NOT NULL,
+                price_changed INTEGER NOT NULL,
+                PRIMARY KEY (retailer, run_at)
+            );"""
+        )
+        self.conn.commit()
+
+    def begin(self, retailer, run_at=None):
+        """Start recording one crawl of ``retailer``"""
+        return HistoryRun(self, retailer, run_at or datetime.now().isoformat())
+
+    def price_history(self, retailer, product_id):
+        """Every recorded change for one product, oldest first"""
+        return self.conn.execute(
+            """SELECT run_at, kind, old_price, new_price FROM changes
+               WHERE retailer = ? AND product_id = ? ORDER BY run_at""",
+            (retailer, str(product_id)),
+        ).fetchall()
+
+    def runs(self, retailer, after=None):
+        """``(run_at, observed, new, removed, price_changed)`` per finished run after ``after``, oldest first"""
+        return self.conn.execute(
+            """SELECT run_at, observed, new, removed, price_changed FROM runs
+               WHERE retailer = ? AND run_at > ? ORDER BY run_at""",
+            (retailer, after or ""),
+        ).fetchall()
+
+    def changes_since(self, since, retailer=None):
+        """All changes recorded at or after ``since`` (ISO timestamp)"""
+        query = "SELECT retailer, product_id, run_at, kind, old_price, new_price FROM changes WHERE run_at >= ?"
+        params = [since]
+        if retailer:
+            query += " AND retailer = ?"
+            params.append(retailer)
+        return self.conn.execute(query + " ORDER BY run_at", params).fetchall()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class HistoryRun:
+    """Collects one run's observations and turns them into deltas on finish.
+
+    Observations are staged in the ``observed`` table page by page, so
+    memory does not grow with the catalog. Staged rows survive a crash;
+    beginning the same ``run_at`` again picks them back up, and beginning
+    a new run discards what an abandoned run left behind.
+    """
+
+    def __init__(self, store, retailer, run_at):
+        self.store = store
+        self.conn = store.conn
+        self.retailer = retailer
+        self.run_at = run_at
+        self.conn.execute("DELETE FROM observed WHERE retailer = ? AND run_at != ?", (retailer, run_at))
+        self.conn.commit()
+
+    def observe(self, items):
+        """Stage ``(product_id, price)`` pairs seen on a page"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO observed (retailer, run_at, product_id, price) VALUES (?, ?, ?, ?)",
+            [(self.retailer, self.run_at, str(product_id), price) for product_id, price in items],
+        )
+
+    def commit(self):
+        """Make staged observations durable, e.g. before a checkpoint"""
+        self.conn.commit()
+
+    def finish(self, detect_removed=True):
+        """Write this run's deltas and return their counts.
+
+        Pass ``detect_removed=False`` for partial crawls, where a product
+        missing from the run says nothing about the catalog.
+        """
+        conn, retailer, run_at = self.conn, self.retailer, self.run_at
+        run = (retailer, run_at)
+        observed = conn.execute(
+            "SELECT COUNT(*) FROM observed WHERE retailer = ? AND run_at = ?", run
+        ).fetchone()[0]
+
+        new = conn.execute(
+            """INSERT INTO changes (retailer, product_id, run_at, kind, old_price, new_price)
+               SELECT o.retailer, o.product_id, o.run_at, 'new', c.price, o.price FROM observed o
+               LEFT JOIN current c ON c.retailer = o.retailer AND c.product_id = o.product_id
+               WHERE o.retailer = ? AND o.run_at = ? AND (c.product_id IS NULL OR c.active = 0)""",
+            run,
+        ).rowcount
+        price_changed = conn.execute(
+            """INSERT INTO changes (retailer, product_id, run_at, kind, old_price, new_price)
+               SELECT o.retailer, o.product_id, o.run_at, 'price_changed', c.price, o.price FROM observed o
+               JOIN current c ON c.retailer = o.retailer AND c.product_id = o.product_id
+               WHERE o.retailer = ? AND o.run_at = ? AND c.active = 1 AND c.price IS NOT o.price""",
+            run,
+        ).rowcount
+
+        removed = 0
+        if detect_removed:
+            seen = "SELECT product_id FROM observed WHERE retailer = ? AND run_at = ?"
+            removed = conn.execute(
+                f"""INSERT INTO changes (retailer, product_id, run_at, kind, old_price, new_price)
+                   SELECT ?, c.product_id, ?, 'removed', c.price, NULL FROM current c
+                   WHERE c.retailer = ? AND c.active = 1 AND c.product_id NOT IN ({seen})""",
+                (retailer, run_at, retailer, *run),
+            ).rowcount
+            conn.execute(
+                f"""UPDATE current SET active = 0 WHERE retailer = ? AND active = 1
+                   AND product_id NOT IN ({seen})""",
+                (retailer, *run),
+            )
+
+        # Only rows that changed are rewritten
+        conn.execute(
+            """INSERT INTO current (retailer, product_id, price, active)
+               SELECT ?, product_id, new_price, 1 FROM changes
+               WHERE retailer = ? AND run_at = ? AND kind IN ('new', 'price_changed')
+               ON CONFLICT (retailer, product_id) DO UPDATE SET price = excluded.price, active = 1""",
+            (retailer, retailer, run_at),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+            (retailer, run_at, observed, new, removed, price_changed),
+        )
+        conn.execute("DELETE FROM observed WHERE retailer = ? AND run_at = ?", run)
+        conn.commit()
+        return {"observed": observed, "new": new, "removed": removed, "price_changed": price_changed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the price/stock history store")
+    parser.add_argument("--db", default=HISTORY_PATH, help="history database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    price = sub.add_parser("price", help="price history for one product")
+    price.add_argument("retailer")
+    price.add_argument("product_id")
+    since = sub.add_parser("changes", help="all changes since a timestamp")
+    since.add_argument("since", help="ISO timestamp, e.g. 2025-04-01 or 2025-04-01T06:00:00")
+    since.add_argument("--retailer")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.command == "price":
+        for run_at, kind, old_price, new_price in store.price_history(args.retailer, args.product_id):
+            print(f"{run_at}  {kind:<14} {old_price} -> {new_price}")
+    else:
+        for row in store.changes_since(args.since, args.retailer):
+            retailer, product_id, run_at, kind, old_price, new_price = row
+            print(f"{run_at}  {retailer:<8} {product_id:<16} {kind:<14} {old_price} -> {new_price}")
+    store.close()
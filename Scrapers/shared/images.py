@@ -0,0 +1,193 @@
+"""Download product images into a content-addressed store.
+
+Run from the Scrapers directory:
+    python -m shared.images zara Zara/zara_products_20250419_161318.json
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from shared.catalog import MAPPERS, iter_snapshot
+from shared.fetcher import FetchEngine
+from shared.paths import STATE_DIR
+from shared.ratelimit import shared_limiter
+
+IMAGES_DIR = os.path.join(STATE_DIR, "images")
+
+# Query params that change between crawls without changing the image (Zara's ts=)
+VOLATILE_PARAMS = {"ts"}
+
+
+def normalize_image_url(url, volatile=VOLATILE_PARAMS):
+    """Absolute URL with volatile query params dropped, used as the manifest key"""
+    if url.startswith("//"):
+        url = f"https:{url}"
+    parts = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in volatile]
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+def collect_urls(retailer, paths):
+    """Normalized image URLs from snapshots, deduplicated, in first-seen order"""
+    urls = {}
+    for path in paths:
+        for record in iter_snapshot(path):
+            for url in MAPPERS[retailer](record)[5]:
+                urls.setdefault(normalize_image_url(url), None)
+    return list(urls)
+
+
+class ImageStore:
+    """Image bytes stored once per SHA-256, plus a manifest of URL -> hash.
+
+    Objects live at ``objects/<sha[:2]>/<sha>``. The manifest is what makes
+    downloads resumable: a URL with a recorded hash is never fetched again,
+    and an asset shared by many URLs is only written once.
+    """
+
+    def __init__(self, root=IMAGES_DIR):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "manifest.sqlite3"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT,
+                size INTEGER,
+                content_type TEXT,
+                fetched_at TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            )"""
+        )
+        self.conn.commit()
+
+    def pending(self, urls):
+        """URLs from ``urls`` that have no stored object yet"""
+        done = set()
+        urls = list(urls)
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT url FROM images WHERE sha256 IS NOT NULL AND url IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            done.update(url for url, in rows)
+        return [url for url in urls if url not in done]
+
+    def object_path(self, sha):
+        return os.path.join(self.objects, sha[:2], sha)
+
+    def write_object(self, body):
+        """Store ``body`` under its hash; returns ``(sha, written)``"""
+        sha = hashlib.sha256(body).hexdigest()
+        path = self.object_path(sha)
+        if os.path.exists(path):
+            return sha, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        return sha, True
+
+    def record(self, url, sha, size, content_type):
+        self.conn.execute(
+            """INSERT INTO images (url, sha256, size, content_type, fetched_at, attempts, error)
+               VALUES (?, ?, ?, ?, ?, 1, NULL)
+               ON CONFLICT (url) DO UPDATE SET sha256 = excluded.sha256, size = excluded.size,
+                   content_type = excluded.content_type, fetched_at = excluded.fetched_at,
+                   attempts = attempts + 1, error = NULL""",
+            (url, sha, size, content_type, datetime.now().isoformat()),
+        )
+
+    def record_failure(self, url, error):
+        self.conn.execute(
+            """INSERT INTO images (url, attempts, error) VALUES (?, 1, ?)
+               ON CONFLICT (url) DO UPDATE SET attempts = attempts + 1, error = excluded.error""",
+            (url, error),
+        )
+
+    def lookup(self, url):
+        """Local path of the object for ``url``, or None if it was never downloaded"""
+        row = self.conn.execute(
+            "SELECT sha256 FROM images WHERE url = ? AND sha256 IS NOT NULL", (normalize_image_url(url),)
+        ).fetchone()
+        return self.object_path(row[0]) if row else None
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class ImageDownloader:
+    """Fetches pending images through a ``FetchEngine`` into an ``ImageStore``"""
+
+    def __init__(self, store, max_concurrency=16, per_host=8, limiter=None, headers=None, commit_every=100):
+        self.store = store
+        self.engine = FetchEngine(
+            headers=headers, max_concurrency=max_concurrency, per_host=per_host, limiter=limiter
+        )
+        self.commit_every = commit_every
+        self.counts = {"downloaded": 0, "deduplicated": 0, "skipped": 0, "failed": 0}
+
+    async def _download(self, url):
+        response = await self.engine.fetch(url, retries=2)
+        if response is None or response.status_code != 200:
+            status = "network error" if response is None else f"HTTP {response.status_code}"
+            self.store.record_failure(url, status)
+            self.counts["failed"] += 1
+            return
+        # Hashing and writing stay off the event loop; the manifest stays on it
+        sha, written = await asyncio.to_thread(self.store.write_object, response.content)
+        self.store.record(url, sha, len(response.content), response.headers.get("Content-Type"))
+        self.counts["downloaded" if written else "deduplicated"] += 1
+        if (self.counts["downloaded"] + self.counts["deduplicated"]) % self.commit_every == 0:
+            self.store.commit()
+
+    def download(self, urls):
+        """Download every URL not already in the manifest and return the counts"""
+        urls = list(dict.fromkeys(normalize_image_url(url) for url in urls))
+        pending = self.store.pending(urls)
+        self.counts["skipped"] += len(urls) - len(pending)
+        try:
+            results = self.engine.run({url: self._download(url) for url in pending})
+            for url, result in results.items():
+                if isinstance(result, Exception):
+                    self.store.record_failure(url, f"{type(result).__name__}: {result}")
+                    self.counts["failed"] += 1
+        finally:
+            self.store.commit()
+        return self.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("retailer", choices=list(MAPPERS))
+    parser.add_argument("paths", nargs="+", help="legacy .json snapshots or NDJSON segment stems")
+    parser.add_argument("--root", default=IMAGES_DIR, help="image store directory")
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel downloads")
+    parser.add_argument("--rate", type=float, default=5.0, help="starting requests/s per image host")
+    args = parser.parse_args()
+
+    store = ImageStore(args.root)
+    urls = collect_urls(args.retailer, args.paths)
+    print(f"Found {len(urls)} unique image URLs")
+    limiter = shared_limiter()
+    for host in {urlparse(url).netloc for url in urls}:
+        limiter.configure(f"https://{host}", args.rate, max_rate=max(args.rate, 10.0))
+    counts = ImageDownloader(store, max_concurrency=args.concurrency, limiter=limiter).download(urls)
+    print(
+        f"Downloaded {counts['downloaded']} | already stored {counts['deduplicated']} | "
+        f"skipped {counts['skipped']} | failed {counts['failed']}"
+    )
+    store.close()
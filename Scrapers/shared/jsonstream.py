@@ -0,0 +1,121 @@
+import codecs
+import json
+import re
+
+_DECODER = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,]*")
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ArrayStream:
+    """Decode the items of every ``"<key>": [...]`` array in a JSON byte stream.
+
+    Text outside those arrays is only searched, never decoded, and each
+    item is decoded on its own once it has fully arrived, so memory holds
+    one item plus the unread tail of the input instead of the whole
+    document tree. ``valid`` is true once at least one array was found and
+    ``require`` (a key name) appeared before the first of them.
+    """
+
+    def __init__(self, key, require=None):
+        self.opener = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.require = f'"{require}"' if require else None
+        self.arrays = 0
+        self.bytes_read = 0
+        self._required_seen = require is None
+        self._required_first = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._head = ""
+        self._in_array = False
+        # Tail kept between chunks so a key split across them is still found
+        self._keep = len(key) + 64
+
+    @property
+    def valid(self):
+        return self.arrays > 0 and self._required_first
+
+    def feed(self, chunk):
+        """Add bytes and return the items they completed"""
+        self.bytes_read += len(chunk)
+        self._buffer += self._decoder.decode(chunk)
+        if not self._head:
+            self._head = self._buffer.lstrip()[:1]
+        return self._drain(final=False)
+
+    def close(self):
+        """Return any remaining items; raises ValueError if the document is truncated"""
+        self._buffer += self._decoder.decode(b"", final=True)
+        items = self._drain(final=True)
+        tail = self._buffer.rstrip()
+        if self._in_array or self._head not in ("{", "[") or not tail.endswith(("}", "]")):
+            raise ValueError("Truncated or malformed JSON document")
+        return items
+
+    def items(self, chunks):
+        """Yield items as the chunks that complete them arrive"""
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.close()
+
+    def _drain(self, final):
+        buf = self._buffer
+        pos = 0
+        items = []
+        while True:
+            if not self._in_array:
+                match = self.opener.search(buf, pos)
+                if not self._required_seen:
+                    end = match.start() if match else len(buf)
+                    self._required_seen = buf.find(self.require, pos, end) != -1
+                if match is None:
+                    pos = max(pos, len(buf) - self._keep)
+                    break
+                if not self.arrays:
+                    self._required_first = self._required_seen
+                self.arrays += 1
+                self._in_array = True
+                pos = match.end()
+
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if buf[pos] == "]":
+                self._in_array = False
+                pos += 1
+                continue
+            try:
+                item, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                # The item has not fully arrived yet
+                break
+            if end == len(buf) and not final and not isinstance(item, (dict, list, str)):
+                # A bare number or literal may continue in the next chunk
+                break
+            items.append(item)
+            pos = end
+        self._buffer = buf[pos:]
+        return items
+
+
+def project(value, spec):
+    """Copy only the fields named in ``spec``.
+
+    ``spec`` maps field names to a nested spec, or to None to keep the
+    value as is; lists are projected item by item.
+    """
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if spec is None or not isinstance(value, dict):
+        return value
+    return {name: project(value[name], sub) for name, sub in spec.items() if name in value}
+
+
+def iter_chunks(body, size=CHUNK_SIZE):
+    """Slices of an in-memory body, for feeding an ``ArrayStream``"""
+    view = memoryview(body)
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
@@ -0,0 +1,169 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from shared.paths import STATE_DIR
+
+METRICS_DIR = os.path.join(STATE_DIR, "metrics")
+PROFILES_DIR = os.path.join(STATE_DIR, "profiles")
+
+STAGES = ("fetch", "parse", "transform", "save")
+
+
+class Metrics:
+    """Per-stage timings and HTTP counters for one scraper run.
+
+    Everything is keyed by category (``"-"`` when a call has none) so the
+    export shows where wall time goes both per stage and per category.
+    """
+
+    def __init__(self, retailer):
+        self.retailer = retailer
+        self.started = time.time()
+        self.stage_seconds = defaultdict(float)   # (stage, category) -> seconds
+        self.stage_calls = defaultdict(int)       # (stage, category) -> calls
+        self.responses = defaultdict(int)         # (category, status) -> count
+        self.bytes = defaultdict(int)             # category -> bytes downloaded
+        self.retries = defaultdict(int)           # category -> retried attempts
+        self.pages = defaultdict(int)             # category -> pages that yielded products
+        self.products = defaultdict(int)          # category -> products kept
+
+    @contextmanager
+    def stage(self, name, category=None):
+        """Time a block as one call of ``name`` for ``category``"""
+        key = (name, category or "-")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[key] += time.perf_counter() - start
+            self.stage_calls[key] += 1
+
+    def record_response(self, category, status, size, retries=0):
+        """Count one HTTP exchange; ``status`` is ``"error"`` when no response came back"""
+        category = category or "-"
+        self.responses[(category, str(status))] += 1
+        self.bytes[category] += size
+        self.retries[category] += retries
+
+    def record_page(self, category, products):
+        """Count a page that produced ``products`` kept products"""
+        category = category or "-"
+        self.pages[category] += 1
+        self.products[category] += products
+
+    def summary(self):
+        """JSON-ready summary of the run"""
+        stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+        categories = defaultdict(lambda: {"stages": {}, "bytes": 0, "retries": 0, "pages": 0, "products": 0})
+        for (stage, category), seconds in self.stage_seconds.items():
+            stages[stage]["seconds"] += seconds
+            stages[stage]["calls"] += self.stage_calls[(stage, category)]
+            categories[category]["stages"][stage] = {
+                "seconds": round(seconds, 4),
+                "calls": self.stage_calls[(stage, category)],
+            }
+        statuses = defaultdict(int)
+        for (category, status), count in self.responses.items():
+            statuses[status] += count
+            categories[category].setdefault("statuses", {})[status] = count
+        for category in set(self.bytes) | set(self.pages):
+            categories[category]["bytes"] = self.bytes[category]
+            categories[category]["retries"] = self.retries[category]
+            categories[category]["pages"] = self.pages[category]
+            categories[category]["products"] = self.products[category]
+            pages = self.pages[category]
+            categories[category]["products_per_page"] = round(self.products[category] / pages, 2) if pages else 0
+        return {
+            "retailer": self.retailer,
+            "started": datetime.fromtimestamp(self.started).isoformat(),
+            "wall_seconds": round(time.time() - self.started, 3),
+            "stages": {stage: {"seconds": round(v["seconds"], 4), "calls": v["calls"]} for stage, v in stages.items()},
+            "statuses": dict(statuses),
+            "bytes": sum(self.bytes.values()),
+            "retries": sum(self.retries.values()),
+            "pages": sum(self.pages.values()),
+            "products": sum(self.products.values()),
+            "categories": dict(categories),
+        }
+
+    def prometheus(self):
+        """Render the run in Prometheus text exposition format"""
+        r = self.retailer
+        lines = [
+            "# HELP scraper_stage_seconds_total Time spent per scraper stage.",
+            "# TYPE scraper_stage_seconds_total counter",
+        ]
+        for (stage, category), seconds in sorted(self.stage_seconds.items()):
+            lines.append(f'scraper_stage_seconds_total{{retailer="{r}",stage="{stage}",category="{category}"}} {seconds:.6f}')
+        lines += ["# HELP scraper_stage_calls_total Calls per scraper stage.", "# TYPE scraper_stage_calls_total counter"]
+        for (stage, category), calls in sorted(self.stage_calls.items()):
+            lines.append(f'scraper_stage_calls_total{{retailer="{r}",stage="{stage}",category="{category}"}} {calls}')
+        lines += ["# HELP scraper_http_responses_total HTTP responses by status.", "# TYPE scraper_http_responses_total counter"]
+        for (category, status), count in sorted(self.responses.items()):
+            lines.append(f'scraper_http_responses_total{{retailer="{r}",category="{category}",status="{status}"}} {count}')
+        for name, values, help_text in (
+            ("scraper_http_bytes_total", self.bytes, "Response bytes downloaded."),
+            ("scraper_http_retries_total", self.retries, "Retried request attempts."),
+            ("scraper_pages_total", self.pages, "Pages that yielded products."),
+            ("scraper_products_total", self.products, "Products kept after dedup."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for category, value in sorted(values.items()):
+                lines.append(f'{name}{{retailer="{r}",category="{category}"}} {value}')
+        lines += [
+            "# HELP scraper_run_seconds Wall time of the last run.",
+            "# TYPE scraper_run_seconds gauge",
+            f'scraper_run_seconds{{retailer="{r}"}} {time.time() - self.started:.3f}',
+            "# HELP scraper_last_run_timestamp_seconds Unix time the last run finished.",
+            "# TYPE scraper_last_run_timestamp_seconds gauge",
+            f'scraper_last_run_timestamp_seconds{{retailer="{r}"}} {time.time():.0f}',
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=None):
+        """Write ``<retailer>.prom`` (textfile collector) and a timestamped JSON summary"""
+        directory = directory or METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        # The textfile collector may read at any moment, so swap the file in atomically
+        prom_path = os.path.join(directory, f"{self.retailer}.prom")
+        with open(f"{prom_path}.tmp", "w") as f:
+            f.write(self.prometheus())
+        os.replace(f"{prom_path}.tmp", prom_path)
+
+        json_path = os.path.join(directory, f"{self.retailer}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(json_path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return prom_path, json_path
+
+
+def profile_run(func, retailer, top=20):
+    """Run ``func`` under cProfile and tracemalloc and write a report"""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    stem = os.path.join(PROFILES_DIR, f"{retailer}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        return profiler.runcall(func)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        profiler.dump_stats(f"{stem}.prof")
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+        report.write(f"\nPeak traced memory: {peak / 1024 / 1024:.1f} MB\nTop allocations:\n")
+        for stat in snapshot.statistics("lineno")[:top]:
+            report.write(f"  {stat}\n")
+        with open(f"{stem}.txt", "w") as f:
+            f.write(report.getvalue())
+        print(f"\n🧪 Profile written to {stem}.prof / {stem}.txt")
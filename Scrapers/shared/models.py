@@ -0,0 +1,125 @@
+import sys
+
+
+class PrefixTable:
+    """Interns the leading part of URLs so each record keeps only the tail.
+
+    A URL is split after ``depth`` path segments (or before its last
+    segment, if shorter); the prefix is stored once and records refer to
+    it by index.
+    """
+
+    def __init__(self, depth=3):
+        self.depth = depth
+        self.prefixes = []
+        self.ids = {}
+
+    def split(self, url):
+        scheme_end = url.find("//")
+        start = scheme_end + 2 if scheme_end != -1 else 0
+        cut = url.find("/", start)
+        for _ in range(self.depth):
+            if cut == -1:
+                break
+            next_cut = url.find("/", cut + 1)
+            if next_cut == -1:
+                break
+            cut = next_cut
+        if cut == -1:
+            return self._id(""), url
+        return self._id(url[:cut + 1]), url[cut + 1:]
+
+    def _id(self, prefix):
+        prefix_id = self.ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = self.ids[prefix] = len(self.prefixes)
+            self.prefixes.append(prefix)
+        return prefix_id
+
+    def join(self, prefix_id, tail):
+        return self.prefixes[prefix_id] + tail
+
+
+# One table per process; image hosts repeat across every retailer record
+PREFIXES = PrefixTable()
+
+
+class ImageList:
+    """Deduplicated image URLs stored as prefix ids plus tails, in first-seen order"""
+
+    __slots__ = ("prefix_ids", "tails")
+
+    def __init__(self, urls=()):
+        # Tuples, not arrays: with a handful of images per product they are smaller
+        prefix_ids = []
+        tails = []
+        seen = set()
+        for url in urls:
+            if url in seen:
+                continue
+            seen.add(url)
+            prefix_id, tail = PREFIXES.split(url)
+            prefix_ids.append(prefix_id)
+            tails.append(tail)
+        self.prefix_ids = tuple(prefix_ids)
+        self.tails = tuple(tails)
+
+    def __iter__(self):
+        for prefix_id, tail in zip(self.prefix_ids, self.tails):
+            yield PREFIXES.join(prefix_id, tail)
+
+    def __len__(self):
+        return len(self.tails)
+
+
+class Record:
+    """Slotted record that serializes to the dict the scrapers used to build.
+
+    Subclasses list their JSON keys in ``__slots__``, in output order.
+    Category/vendor style fields named in ``INTERNED`` share one string
+    object across every record.
+    """
+
+    __slots__ = ()
+    INTERNED = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+        for name in self.INTERNED:
+            value = getattr(self, name)
+            if isinstance(value, str):
+                setattr(self, name, sys.intern(value))
+
+    def to_dict(self):
+        return {name: _plain(getattr(self, name)) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def _plain(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, ImageList):
+        return list(value)
+    return value
+
+
+class Variant(Record):
+    __slots__ = ("variant_id", "price", "size", "sku")
+    INTERNED = ("size",)
+
+
+class BonkersProduct(Record):
+    __slots__ = ("id", "title", "url", "category", "vendor", "variants", "images")
+    INTERNED = ("category", "vendor")
+
+
+class ZaraProduct(Record):
+    __slots__ = ("id", "name", "price", "category", "url", "images", "timestamp")
+    INTERNED = ("category",)
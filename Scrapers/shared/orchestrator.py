@@ -0,0 +1,282 @@
+"""Run several retailer scrapers in parallel worker processes.
+
+Run from the Scrapers directory: python -m shared.orchestrator [--retailers bonkers zara]
+Only the categories a crawl plan has due this hour: python -m shared.orchestrator --plan crawl_plan.json
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+from multiprocessing.connection import wait
+
+from shared.archive import URL_DICTS
+from shared.paths import STATE_DIR
+
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGS_DIR = os.path.join(STATE_DIR, "logs")
+RUNS_DIR = os.path.join(STATE_DIR, "runs")
+
+# retailer -> (directory, scraper class, default timeout in seconds)
+RETAILERS = {
+    "bonkers": ("Bonkers", "BonkersCornerScraper", 3600),
+    "capsul": ("Capsul", "CapsulScraper", 1800),
+    "snitch": ("Snitch", "SnitchScraper", 3600),
+    "zara": ("Zara", "ZaraScraper", 3600),
+}
+
+# Retailers whose run() takes bulk=True (Shopify products.json enumeration)
+SHOPIFY_RETAILERS = ("bonkers", "capsul")
+# Retailers whose run() takes parse_processes (page parsing in a process pool)
+PARSE_POOL_RETAILERS = ("bonkers", "capsul", "zara")
+
+
+def load_scraper_module(directory):
+    """Import <directory>/main.py the way ``python main.py`` would see it.
+
+    Every retailer has its own ``constants`` module, so this only works
+    once per process; the orchestrator gives each retailer its own.
+    """
+    path = os.path.join(SCRAPERS_DIR, directory, "main.py")
+    sys.path.insert(0, os.path.join(SCRAPERS_DIR, directory))
+    sys.path.insert(1, SCRAPERS_DIR)
+    spec = importlib.util.spec_from_file_location(f"{directory.lower()}_main", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run_retailer(retailer, init_kwargs, run_kwargs, log_path, conn, categories=None):
+    """Worker body: run one scraper from its own directory and send back a result.
+
+    With ``categories``, only those entries of the retailer's URL dict are
+    crawled and the run is marked incomplete, so products in the skipped
+    categories are not recorded as removed.
+    """
+    directory, class_name, _ = RETAILERS[retailer]
+    log = open(log_path, "w", buffering=1)
+    sys.stdout = sys.stderr = log
+    os.chdir(os.path.join(SCRAPERS_DIR, directory))
+    try:
+        module = load_scraper_module(directory)
+        scraper = getattr(module, class_name)(**init_kwargs)
+        if categories is not None and retailer in URL_DICTS:
+            name = URL_DICTS[retailer]
+            setattr(module, name, {c: url for c, url in getattr(module, name).items() if c in categories})
+            scraper.incomplete = True
+        scraper.run(**run_kwargs)
+        products = getattr(scraper, "product_count", None)
+        if products is None:
+            products = scraper.fetched_products
+        conn.send({"status": "ok", "products": products})
+    except BaseException as e:
+        traceback.print_exc()
+        conn.send({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+    finally:
+        log.close()
+        conn.close()
+
+
+class Orchestrator:
+    """Runs retailers in at most ``workers`` processes at once.
+
+    Each retailer runs in a fresh spawned process with its output in
+    ``logs/``, so a crash, hang or import error only affects that retailer.
+    A worker past its timeout is terminated and reported as ``timeout``.
+    """
+
+    def __init__(self, retailers, workers=None, timeouts=None, init_kwargs=None, run_kwargs=None, categories=None):
+        self.retailers = list(retailers)
+        self.workers = workers or len(self.retailers)
+        self.timeouts = {r: RETAILERS[r][2] for r in self.retailers}
+        self.timeouts.update(timeouts or {})
+        self.init_kwargs = init_kwargs or {}
+        self.run_kwargs = run_kwargs or {}
+        # retailer -> categories to crawl; retailers not listed crawl everything
+        self.categories = categories or {}
+        self.stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.results = {}
+
+    def _start(self, ctx, retailer):
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        log_path = os.path.join(LOGS_DIR, f"{retailer}_{self.stamp}.log")
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(
+            target=_run_retailer,
+            args=(
+                retailer, self.init_kwargs, self.run_kwargs.get(retailer, {}), log_path, sender,
+                self.categories.get(retailer),
+            ),
+            name=f"scraper-{retailer}",
+        )
+        process.start()
+        sender.close()
+        print(f"▶️  {retailer} started (pid {process.pid}, log {log_path})")
+        return {"process": process, "conn": receiver, "started": time.monotonic(), "log": log_path}
+
+    def _finish(self, retailer, job, result):
+        job["process"].join()
+        job["conn"].close()
+        result["seconds"] = round(time.monotonic() - job["started"], 2)
+        result["log"] = job["log"]
+        self.results[retailer] = result
+        print(f"{'✅' if result['status'] == 'ok' else '❌'} {retailer} {result['status']} in {result['seconds']:.1f}s")
+
+    def run(self):
+        """Run every retailer and return ``{retailer: result}`` in registry order"""
+        ctx = multiprocessing.get_context("spawn")
+        pending = list(self.retailers)
+        running = {}
+        started = time.monotonic()
+
+        while pending or running:
+            while pending and len(running) < self.workers:
+                retailer = pending.pop(0)
+                running[retailer] = self._start(ctx, retailer)
+
+            # Wake up for whichever comes first: a result, a worker exiting, or the next deadline
+            now = time.monotonic()
+            deadline = min(job["started"] + self.timeouts[r] for r, job in running.items())
+            handles = [job["conn"] for job in running.values()] + [job["process"].sentinel for job in running.values()]
+            wait(handles, timeout=max(0.0, deadline - now))
+
+            for retailer, job in list(running.items()):
+                if job["conn"].poll():
+                    try:
+                        self._finish(retailer, job, job["conn"].recv())
+                        del running[retailer]
+                        continue
+                    except EOFError:
+                        # The worker closed its end without a result; wait for it to exit
+                        job["process"].join()
+                if not job["process"].is_alive():
+                    code = job["process"].exitcode
+                    self._finish(retailer, job, {"status": "failed", "error": f"worker exited with code {code}"})
+                    del running[retailer]
+                elif time.monotonic() - job["started"] > self.timeouts[retailer]:
+                    job["process"].terminate()
+                    self._finish(retailer, job, {
+                        "status": "timeout",
+                        "error": f"no result after {self.timeouts[retailer]}s",
+                    })
+                    del running[retailer]
+
+        self.wall_time = time.monotonic() - started
+        self.results = {r: self.results[r] for r in self.retailers}
+        return self.results
+
+    def summary(self):
+        return {
+            "started": self.stamp,
+            "wall_seconds": round(self.wall_time, 2),
+            # What running the retailers back to back would have taken
+            "sequential_seconds": round(sum(r["seconds"] for r in self.results.values()), 2),
+            "products": sum(r.get("products", 0) for r in self.results.values()),
+            "retailers": self.results,
+        }
+
+    def report(self):
+        """Print the consolidated summary and save it under ``runs/``"""
+        summary = self.summary()
+        print(f"\n{'retailer':<10}{'status':>9}{'products':>10}{'seconds':>10}  error")
+        for retailer, result in self.results.items():
+            print(
+                f"{retailer:<10}{result['status']:>9}{result.get('products', '-'):>10}"
+                f"{result['seconds']:>10.1f}  {result.get('error', '')}"
+            )
+        print(f"\n⏱️ Wall time: {summary['wall_seconds']:.1f}s | Back to back: {summary['sequential_seconds']:.1f}s")
+
+        os.makedirs(RUNS_DIR, exist_ok=True)
+        path = os.path.join(RUNS_DIR, f"run_{self.stamp}.json")
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Run summary saved to {path}")
+        return path
+
+
+def _parse_timeouts(values):
+    timeouts = {}
+    for value in values or []:
+        retailer, _, seconds = value.partition("=")
+        if retailer not in RETAILERS or not seconds:
+            raise argparse.ArgumentTypeError(f"expected <retailer>=<seconds>, got {value!r}")
+        timeouts[retailer] = float(seconds)
+    return timeouts
+
+
+def _retailer_kwargs(retailer, run_kwargs, args):
+    kwargs = dict(run_kwargs)
+    if args.bulk and retailer in SHOPIFY_RETAILERS:
+        kwargs["bulk"] = True
+    if args.parse_processes and retailer in PARSE_POOL_RETAILERS:
+        kwargs["parse_processes"] = args.parse_processes
+    return kwargs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retailers", nargs="+", default=list(RETAILERS), choices=list(RETAILERS))
+    parser.add_argument("--workers", type=int, help="retailers to run at once (default: all)")
+    parser.add_argument("--timeout", nargs="+", metavar="RETAILER=SECONDS", help="override per-retailer timeouts")
+    parser.add_argument("--sequential", action="store_true", help="use each scraper's blocking request path")
+    parser.add_argument("--no-cache", action="store_true", help="skip the on-disk response cache")
+    parser.add_argument("--ndjson", action="store_true", help="stream products to NDJSON as pages are parsed")
+    parser.add_argument("--legacy-json", action="store_true", help="with --ndjson, also write the legacy JSON files")
+    parser.add_argument("--bulk", action="store_true", help="enumerate the Shopify stores via products.json")
+    parser.add_argument("--parse-processes", type=int, default=0, help="parse pages in this many processes per retailer")
+    parser.add_argument("--search-index", action="store_true", help="add the new snapshots to the search index afterwards")
+    parser.add_argument("--near-dupes", action="store_true", help="add the new snapshots to the near-duplicate index afterwards")
+    parser.add_argument("--resume", action="store_true", help="continue each retailer from its last checkpoint")
+    parser.add_argument("--plan", metavar="PATH", help="only crawl the categories this crawl plan has due now")
+    parser.add_argument("--update-schedule", action="store_true", help="learn change rates from the new snapshots afterwards")
+    args = parser.parse_args()
+
+    categories = None
+    if args.plan:
+        from shared.scheduler import due
+        with open(args.plan) as f:
+            categories = due(json.load(f))
+        args.retailers = [r for r in args.retailers if r in categories]
+        if not args.retailers:
+            print("Nothing due in this slot of the crawl plan")
+            sys.exit(0)
+
+    run_kwargs = {"concurrent": not args.sequential, "use_cache": not args.no_cache}
+    orchestrator = Orchestrator(
+        args.retailers,
+        workers=args.workers,
+        timeouts=_parse_timeouts(args.timeout),
+        init_kwargs={"ndjson": args.ndjson, "legacy_json": args.legacy_json, "resume": args.resume},
+        run_kwargs={retailer: _retailer_kwargs(retailer, run_kwargs, args) for retailer in args.retailers},
+        categories=categories,
+    )
+    results = orchestrator.run()
+    orchestrator.report()
+    if args.search_index:
+        from shared.search import SearchIndex, discover_snapshots, update
+        index = SearchIndex()
+        for retailer, (added, updated, removed, _) in update(index, discover_snapshots()).items():
+            print(f"Search index: {retailer} +{added} new | {updated} updated | -{removed} delisted")
+        index.close()
+    if args.near_dupes:
+        from shared import dedup
+        from shared.search import discover_snapshots
+        index = dedup.NearDuplicateIndex()
+        for retailer, (products, pairs, _) in dedup.update(index, discover_snapshots()).items():
+            print(f"Near duplicates: {retailer} {products} products checked | {pairs} new pairs")
+        index.close()
+    if args.update_schedule:
+        from shared import scheduler
+        from shared.history import HistoryStore
+        from shared.search import discover_snapshots
+        model = scheduler.ChangeModel()
+        history = HistoryStore()
+        for retailer, (runs, changes, _) in scheduler.learn(model, discover_snapshots(), history).items():
+            print(f"Schedule: {retailer} {runs} new runs | {changes} changes")
+        history.close()
+        model.close()
+    sys.exit(0 if all(r["status"] == "ok" for r in results.values()) else 1)
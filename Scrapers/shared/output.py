@@ -0,0 +1,171 @@
+import argparse
+import glob
+import json
+import os
+
+
+class NdjsonWriter:
+    """Append-only NDJSON sink that writes products as soon as they are parsed.
+
+    Records go to ``<stem>-<n>.ndjson.part``; the segment is fsynced every
+    ``fsync_every`` records and atomically renamed to ``<stem>-<n>.ndjson``
+    when it passes ``rotate_bytes`` or the writer is closed, so a finished
+    segment is never half-written. After a crash the ``.part`` file still
+    holds every record up to the last fsync.
+    """
+
+    def __init__(self, stem, fsync_every=500, rotate_bytes=64 * 1024 * 1024, ensure_ascii=True):
+        self.stem = stem
+        self.fsync_every = fsync_every
+        self.rotate_bytes = rotate_bytes
+        self.ensure_ascii = ensure_ascii
+        self.segment = len(segment_paths(stem))
+        self.count = 0
+        self._unsynced = 0
+        self._file = None
+
+    def _segment_path(self):
+        return f"{self.stem}-{self.segment:04d}.ndjson"
+
+    def _open_segment(self):
+        self.segment += 1
+        self._file = open(f"{self._segment_path()}.part", "a", encoding="utf-8")
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _seal(self):
+        """fsync the active segment and atomically publish it"""
+        self._sync()
+        self._file.close()
+        self._file = None
+        os.replace(f"{self._segment_path()}.part", self._segment_path())
+
+    def write(self, record):
+        """Append one record; compact models are written as their ``to_dict()``"""
+        if hasattr(record, "to_dict"):
+            record = record.to_dict()
+        if self._file is None:
+            self._open_segment()
+        self._file.write(json.dumps(record, ensure_ascii=self.ensure_ascii) + "\n")
+        self.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+        if self._file.tell() >= self.rotate_bytes:
+            self._seal()
+
+    def write_many(self, records):
+        """Write one page worth of records and flush them to the OS"""
+        for record in records:
+            self.write(record)
+        if self._file is not None:
+            self._file.flush()
+
+    def position(self):
+        """fsync and return ``[segment, offset]`` of everything written so far.
+
+        ``offset`` is None when no segment is open, i.e. ``segment`` is sealed.
+        """
+        if self._file is None:
+            return [self.segment, None]
+        self._sync()
+        return [self.segment, self._file.tell()]
+
+    @classmethod
+    def resume(cls, stem, position, **kwargs):
+        """Reopen ``stem`` at a saved ``position``, dropping anything written after it"""
+        segment, offset = position
+        for path in segment_paths(stem):
+            if _segment_number(path) > segment:
+                os.remove(path)
+        writer = cls(stem, **kwargs)
+        writer.segment = segment
+        if offset is not None:
+            path = writer._segment_path()
+            if os.path.exists(path):
+                # Sealed by a rotation after the checkpoint; reopen it for appending
+                os.replace(path, f"{path}.part")
+            writer._file = open(f"{path}.part", "a", encoding="utf-8")
+            writer._file.truncate(offset)
+        return writer
+
+    def close(self):
+        if self._file is not None:
+            self._seal()
+
+
+def _segment_number(path):
+    return int(path.rsplit("-", 1)[1].split(".", 1)[0])
+
+
+def segment_paths(stem):
+    """Sealed and in-progress segments for ``stem`` in write order"""
+    paths = glob.glob(f"{glob.escape(stem)}-[0-9][0-9][0-9][0-9].ndjson")
+    paths += glob.glob(f"{glob.escape(stem)}-[0-9][0-9][0-9][0-9].ndjson.part")
+    return sorted(paths)
+
+
+def snapshot_mtime(path):
+    """When a legacy ``.json`` snapshot or an NDJSON stem was last written"""
+    files = [path] if os.path.exists(path) else segment_paths(path)
+    return max(os.path.getmtime(f) for f in files)
+
+
+def remove_segments(stem):
+    for path in segment_paths(stem):
+        os.remove(path)
+
+
+def iter_records(stem):
+    """Stream records back out of every segment of ``stem``"""
+    for path in segment_paths(stem):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from a crash before fsync
+                    continue
+
+
+def write_json_array(records, output_path, ensure_ascii=True):
+    """Write records as a ``json.dump(..., indent=2)`` list, one record at a time.
+
+    Only one record is turned into a dict at once; the bytes match what
+    dumping the whole list at once would produce.
+    """
+    tmp_path = f"{output_path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            if hasattr(record, "to_dict"):
+                record = record.to_dict()
+            body = json.dumps(record, indent=2, ensure_ascii=ensure_ascii)
+            f.write(",\n" if count else "[\n")
+            f.write("\n".join("  " + line for line in body.split("\n")))
+            count += 1
+        f.write("\n]" if count else "[]")
+    os.replace(tmp_path, output_path)
+    return count
+
+
+def convert_to_json(stem, output_path, ensure_ascii=True):
+    """Write the legacy JSON file from NDJSON segments with flat memory"""
+    return write_json_array(iter_records(stem), output_path, ensure_ascii)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert NDJSON segments into the legacy pretty JSON file")
+    parser.add_argument("stem", help="segment stem, e.g. bonkers_products")
+    parser.add_argument("output", help="JSON file to write")
+    parser.add_argument("--unicode", action="store_true", help="write non-ASCII characters as-is (Zara files)")
+    args = parser.parse_args()
+
+    total = convert_to_json(args.stem, args.output, ensure_ascii=not args.unicode)
+    print(f"Wrote {total} records to {args.output}")
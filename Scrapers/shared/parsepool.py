@@ -0,0 +1,61 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+_worker = {}
+
+
+def _init_parser(retailer):
+    from shared.archive import load_retailer
+    from shared.orchestrator import RETAILERS
+
+    cls = getattr(load_retailer(retailer), RETAILERS[retailer][1])
+    # Built without __init__, which opens the seen index, checkpoints and output files
+    _worker["scraper"] = object.__new__(cls)
+
+
+def _call(method, body):
+    return getattr(_worker["scraper"], method)(body)
+
+
+class ParsePool:
+    """Worker processes that turn raw page bodies into parse results.
+
+    Fetch coroutines hand a body to ``parse`` and await the result. Within
+    a category the next page is only requested once this one is parsed,
+    so the overlap is across categories: the event loop keeps fetching for
+    the others while pages are parsed on other cores. At most
+    ``max_pending`` bodies are queued or being parsed; past that, a
+    category with a fetched page waits for a free slot, so a slow parser
+    throttles the crawl instead of piling up bodies in memory. Each worker
+    imports the retailer's scraper once and calls the named method on a
+    bare instance; the method must take the body bytes and return
+    something picklable.
+    """
+
+    def __init__(self, retailer, processes=None, max_pending=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.processes
+        self.executor = ProcessPoolExecutor(
+            self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parser,
+            initargs=(retailer,),
+        )
+        self._slots = None
+        self._loop = None
+        self.jobs = 0
+
+    async def parse(self, method, body):
+        # asyncio.run makes a new loop per engine run; the semaphore must belong to it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            self.jobs += 1
+            return await loop.run_in_executor(self.executor, _call, method, body)
+
+    def close(self):
+        self.executor.shutdown()
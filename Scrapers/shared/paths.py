@@ -0,0 +1,4 @@
+import os
+
+# Where run state (seen index, history, HTTP cache) lives; SCRAPER_STATE_DIR overrides it
+STATE_DIR = os.environ.get("SCRAPER_STATE_DIR") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from shared.paths import STATE_DIR
+
+RATE_STATE_PATH = os.path.join(STATE_DIR, "rate_limits.json")
+
+
+def _retry_after_seconds(value):
+    """Parse a Retry-After header given as seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostBucket:
+    """Token bucket for one host whose rate follows AIMD feedback.
+
+    Successful, fast responses add ``increase`` requests/s; 429s, 5xx and
+    network errors multiply the rate by ``decrease``; responses much slower
+    than the best latency seen so far trim it gently. ``good_rate`` is the
+    rate last sustained for ``good_after`` successes in a row and is what
+    the next run starts from.
+    """
+
+    def __init__(self, rate, min_rate=0.1, max_rate=10.0, increase=0.05, decrease=0.5, good_after=20):
+        self.rate = rate
+        self.good_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.good_after = good_after
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.successes = 0
+        self.latency = None
+        self.best_latency = None
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before sending"""
+        with self.lock:
+            now = time.monotonic()
+            capacity = max(1.0, self.rate)
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def feedback(self, status, latency, retry_after=None):
+        """Adjust the rate from one response; ``status`` is None for network errors"""
+        with self.lock:
+            if status is None or status == 429 or status >= 500:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.successes = 0
+                if retry_after is not None:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                return
+
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+            if self.latency > 2 * self.best_latency:
+                # The host is queueing us; back off a little without resetting the streak
+                self.rate = max(self.min_rate, self.rate * 0.9)
+                return
+
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.successes += 1
+            if self.successes >= self.good_after:
+                self.good_rate = self.rate
+                self.successes = 0
+
+
+class RateLimiter:
+    """Per-host adaptive rate limiter shared by every scraper in a process.
+
+    Each host starts at the rate it last sustained (``rate_limits.json``),
+    or at the default its scraper configured when there is no history.
+    """
+
+    def __init__(self, state_path=RATE_STATE_PATH):
+        self.state_path = state_path
+        self.buckets = {}
+        self.defaults = {}
+        self.lock = threading.Lock()
+        self.saved_rates = self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def configure(self, url, rate, max_rate=10.0):
+        """Set the starting rate (requests/s) for a host with no saved state"""
+        self.defaults[urlparse(url).netloc or url] = (rate, max_rate)
+
+    def bucket(self, url):
+        host = urlparse(url).netloc or url
+        with self.lock:
+            if host not in self.buckets:
+                rate, max_rate = self.defaults.get(host, (1.0, 10.0))
+                saved = self.saved_rates.get(host)
+                if saved:
+                    rate = min(saved["rate"], max_rate)
+                self.buckets[host] = HostBucket(rate, max_rate=max_rate)
+            return self.buckets[host]
+
+    def acquire(self, url):
+        """Block until a request to ``url``'s host may be sent; returns the wait"""
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, url):
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def feedback(self, url, response, latency):
+        """Feed one ``requests.Response`` (or None on network error) back into the host's rate"""
+        if response is None:
+            self.bucket(url).feedback(None, latency)
+            return
+        retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+        self.bucket(url).feedback(response.status_code, latency, retry_after)
+
+    def save(self):
+        """Persist each host's last known-good rate, keeping other processes' hosts"""
+        state = self._load()
+        for host, bucket in self.buckets.items():
+            state[host] = {"rate": round(bucket.good_rate, 3), "updated": datetime.now().isoformat()}
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+_shared = None
+
+
+def shared_limiter():
+    """The process-wide limiter, so scrapers hitting the same host share a bucket"""
+    global _shared
+    if _shared is None:
+        _shared = RateLimiter()
+    return _shared
@@ -0,0 +1,512 @@
+"""Learn how often categories change and plan re-crawls within a request budget.
+
+Run from the Scrapers directory:
+    python -m shared.scheduler learn --all          # snapshots, plus history for Snitch
+    python -m shared.scheduler rates
+    python -m shared.scheduler plan --budget 400 --hours 24
+    python -m shared.orchestrator --plan crawl_plan.json     # hourly, from cron
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from shared.archive import ARCHIVE_DIR, RawArchive, category_urls
+from shared.catalog import MAPPERS, iter_snapshot
+from shared.history import HistoryStore
+from shared.output import segment_paths, snapshot_mtime
+from shared.paths import STATE_DIR
+
+SCHEDULE_PATH = os.path.join(STATE_DIR, "schedule.sqlite3")
+PLAN_PATH = os.path.join(STATE_DIR, "crawl_plan.json")
+
+# Crawls per day a category can be given; even the most stable one is re-checked weekly
+FREQUENCIES = (1 / 7, 1 / 3, 1 / 2, 1, 2, 3, 4, 6, 8, 12, 24)
+# Listing page sizes, for costing a category before any crawl of it is archived
+PAGE_SIZES = {"bonkers": 24, "snitch": 50, "zara": 30}
+# Weight of the newest run in a category's change rate
+ALPHA = 0.3
+# Rate assumed for a category that has not been seen twice yet (changes per product-day)
+DEFAULT_RATE = 0.1
+# Gamma prior for per-product rates: PRIOR_CHANGES changes over PRIOR_DAYS days
+PRIOR_CHANGES, PRIOR_DAYS = 0.1, 7.0
+# Snapshots of these only hold products never seen before, which would read as
+# near-total churn; their single crawl unit learns from the history store instead
+HISTORY_RETAILERS = ("snitch",)
+
+
+def freshness(rate, per_day):
+    """Expected share of the time an item changing ``rate`` times a day is up to date"""
+    x = rate / per_day
+    return 1.0 if x < 1e-9 else (1 - math.exp(-x)) / x
+
+
+def _price(value):
+    """Prices as floats, so "1299.00" from one snapshot equals 1299.0 read back from SQLite"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def crawl_unit(retailer, category, units):
+    """The crawl category a record belongs to; Snitch records carry a product type instead"""
+    if category in units or len(units) != 1:
+        return category
+    return next(iter(units))
+
+
+class ChangeModel:
+    """Per-product and per-category change rates learned from successive runs.
+
+    Each run is compared with the previous run of every category it
+    contains: products that appeared, disappeared or changed price are
+    changes. If a share ``p`` of a category's products changed over ``d``
+    days, that implies a Poisson rate of ``-ln(1 - p) / d`` changes per
+    product-day; categories keep an exponentially weighted average of it.
+    Products keep change counts, smoothed with a small gamma prior.
+    Products that only seem to move because a planned run skipped the
+    category they are recorded under are left out of the comparison.
+    Retailers whose snapshots are deduplicated across runs learn from the
+    per-run counts in the history store instead, with no per-product rates.
+    """
+
+    def __init__(self, path=SCHEDULE_PATH):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS products (
+                retailer TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                price REAL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                changes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (retailer, product_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS products_by_category ON products (retailer, category, last_seen);
+            CREATE TABLE IF NOT EXISTS categories (
+                retailer TEXT NOT NULL,
+                category TEXT NOT NULL,
+                runs INTEGER NOT NULL,
+                products INTEGER NOT NULL,
+                last_run TEXT NOT NULL,
+                rate REAL,
+                PRIMARY KEY (retailer, category)
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            );"""
+        )
+        self.conn.commit()
+        self._units = {}
+
+    def _unit(self, retailer, category):
+        if retailer not in self._units:
+            self._units[retailer] = category_urls(retailer)
+        return crawl_unit(retailer, category, self._units[retailer])
+
+    def add_run(self, retailer, run_at, rows):
+        """Learn from one run's ``(product_id, price, category)`` rows; returns changes per category"""
+        current = {}
+        for product_id, price, category in rows:
+            current.setdefault(self._unit(retailer, category), {})[str(product_id)] = _price(price)
+
+        # Runs dedup in category order, so a product listed in several categories is recorded
+        # under the first one crawled. A planned run that skips that category finds it under a
+        # later one instead; if the skipped category's last run still had it, it has not moved.
+        last_runs = dict(self.conn.execute(
+            "SELECT category, last_run FROM categories WHERE retailer = ?", (retailer,)
+        ))
+        homes = {
+            product_id: (category, last_seen)
+            for product_id, category, last_seen in self.conn.execute(
+                "SELECT product_id, category, last_seen FROM products WHERE retailer = ?", (retailer,)
+            )
+        }
+        for category, now in current.items():
+            for product_id in list(now):
+                home, last_seen = homes.get(product_id, (category, None))
+                if home != category and home not in current and last_seen == last_runs.get(home):
+                    del now[product_id]
+
+        when = datetime.fromisoformat(run_at)
+        found = {}
+        for category, now in current.items():
+            row = self.conn.execute(
+                "SELECT runs, last_run, rate FROM categories WHERE retailer = ? AND category = ?", (retailer, category)
+            ).fetchone()
+            if row and row[1] >= run_at:
+                # Already learned from this run or a later one
+                continue
+
+            changed = set()
+            rate = None
+            if row:
+                previous = dict(self.conn.execute(
+                    "SELECT product_id, price FROM products WHERE retailer = ? AND category = ? AND last_seen = ?",
+                    (retailer, category, row[1]),
+                ))
+                changed = {pid for pid, price in now.items() if pid not in previous or previous[pid] != price}
+                removed = len(previous.keys() - now.keys())
+                rate = _fold_rate(row, when, len(changed) + removed, len(previous))
+                found[category] = len(changed) + removed
+
+            self.conn.executemany(
+                """INSERT INTO products (retailer, product_id, category, price, first_seen, last_seen, changes)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (retailer, product_id) DO UPDATE SET category = excluded.category,
+                   price = excluded.price, last_seen = excluded.last_seen, changes = changes + excluded.changes""",
+                [(retailer, pid, category, price, run_at, run_at, int(pid in changed)) for pid, price in now.items()],
+            )
+            self.conn.execute(
+                """INSERT INTO categories VALUES (?, ?, 1, ?, ?, ?)
+                   ON CONFLICT (retailer, category) DO UPDATE SET runs = runs + 1,
+                   products = excluded.products, last_run = excluded.last_run, rate = excluded.rate""",
+                (retailer, category, len(now), run_at, rate),
+            )
+        self.conn.commit()
+        return found
+
+    def add_history(self, retailer, store):
+        """Learn from the runs ``store`` finished since the last one learned; returns ``(runs, changes)``"""
+        category = self._unit(retailer, None)
+        runs = found = 0
+        for run_at, observed, new, removed, price_changed in store.runs(retailer, self._last_run(retailer, category)):
+            if not observed:
+                # Nothing was fetched, so the run says nothing about churn
+                continue
+            row = self.conn.execute(
+                "SELECT runs, last_run, rate, products FROM categories WHERE retailer = ? AND category = ?",
+                (retailer, category),
+            ).fetchone()
+            rate = None
+            if row:
+                changes = new + removed + price_changed
+                rate = _fold_rate(row, datetime.fromisoformat(run_at), changes, row[3])
+                found += changes
+            runs += 1
+            self.conn.execute(
+                """INSERT INTO categories VALUES (?, ?, 1, ?, ?, ?)
+                   ON CONFLICT (retailer, category) DO UPDATE SET runs = runs + 1,
+                   products = excluded.products, last_run = excluded.last_run, rate = excluded.rate""",
+                (retailer, category, observed, run_at, rate),
+            )
+        self.conn.commit()
+        return runs, found
+
+    def _last_run(self, retailer, category):
+        row = self.conn.execute(
+            "SELECT last_run FROM categories WHERE retailer = ? AND category = ?", (retailer, category)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_snapshot(self, retailer, path):
+        """Learn from one snapshot unless it is unchanged; returns changes per category or None"""
+        files = [path] if os.path.exists(path) else segment_paths(path)
+        if not files:
+            raise FileNotFoundError(path)
+        mtime = max(os.path.getmtime(f) for f in files)
+        size = sum(os.path.getsize(f) for f in files)
+        source = os.path.abspath(path)
+        if self.conn.execute(
+            "SELECT 1 FROM sources WHERE path = ? AND mtime = ? AND size = ?", (source, mtime, size)
+        ).fetchone():
+            return None
+        rows = []
+        run_at = None
+        for record in iter_snapshot(path):
+            product_id, _, price, _, category, _, scraped_at = MAPPERS[retailer](record)
+            run_at = run_at or scraped_at
+            rows.append((product_id, price, category))
+        # Bonkers and Capsul records carry no timestamp; the file was written at the end of the run
+        found = self.add_run(retailer, run_at or datetime.fromtimestamp(mtime).isoformat(), rows)
+        self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (source, mtime, size))
+        self.conn.commit()
+        return found
+
+    def categories(self, retailer=None):
+        """``(retailer, category, products, rate, last_run)`` per category"""
+        where, args = ("WHERE retailer = ?", (retailer,)) if retailer else ("", ())
+        return self.conn.execute(
+            f"SELECT retailer, category, products, rate, last_run FROM categories {where} ORDER BY retailer, category",
+            args,
+        ).fetchall()
+
+    def hot_products(self, limit=20, retailer=None):
+        """``(retailer, product_id, category, changes, rate)`` of the fastest-changing products"""
+        where, args = ("WHERE retailer = ?", (retailer,)) if retailer else ("", ())
+        return self.conn.execute(
+            f"""SELECT retailer, product_id, category, changes,
+                   (changes + ?) / (julianday(last_seen) - julianday(first_seen) + ?) AS rate
+                FROM products {where} ORDER BY rate DESC LIMIT ?""",
+            (PRIOR_CHANGES, PRIOR_DAYS, *args, limit),
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def _fold_rate(row, when, changes, products):
+    """A category's rate after a run that found ``changes`` among its previous ``products``.
+
+    ``row`` starts with the category's ``(runs, last_run, rate)`` before the run.
+    """
+    days = max((when - datetime.fromisoformat(row[1])).total_seconds() / 86400, 1 / 24)
+    share = min(changes / max(products, 1), 0.95)
+    observed = -math.log(1 - share) / days
+    return observed if row[2] is None else ALPHA * observed + (1 - ALPHA) * row[2]
+
+
+def learn(model, snapshots, history=None):
+    """Learn from ``{retailer: [paths]}`` oldest first; returns ``{retailer: (runs, changes, skipped)}``.
+
+    ``HISTORY_RETAILERS`` skip their snapshots and learn from ``history``,
+    a ``HistoryStore``, when one is given.
+    """
+    totals = {}
+    for retailer, paths in snapshots.items():
+        if retailer in HISTORY_RETAILERS:
+            if history is not None:
+                runs, changes = model.add_history(retailer, history)
+                totals[retailer] = (runs, changes, len(paths))
+            continue
+        runs = changes = skipped = 0
+        for path in sorted(paths, key=snapshot_mtime):
+            found = model.add_snapshot(retailer, path)
+            if found is None:
+                skipped += 1
+                continue
+            runs += 1
+            changes += sum(found.values())
+        totals[retailer] = (runs, changes, skipped)
+    return totals
+
+
+def crawl_costs(retailer, products, archive_root=ARCHIVE_DIR):
+    """Requests one crawl of each category takes: archived page counts, else an estimate"""
+    costs = {}
+    if os.path.exists(os.path.join(archive_root, "index.sqlite3")):
+        archive = RawArchive(root=archive_root)
+        costs = archive.page_counts(retailer)
+        archive.close()
+    size = PAGE_SIZES.get(retailer)
+    for category, count in products.items():
+        if category not in costs:
+            # Listings end with one empty page; a Capsul collection is a single request
+            costs[category] = math.ceil(count / size) + 1 if size else 1
+    return costs
+
+
+def plan(model, budget, hours=24, slot_hours=1, baseline_per_day=1, now=None, archive_root=ARCHIVE_DIR):
+    """Crawls per category that fit ``budget`` requests a day, laid out over the next ``hours``.
+
+    Crawl frequencies are bought greedily: every category starts at the
+    lowest frequency, then the upgrade with the largest gain in
+    change-weighted freshness per extra request is taken until the budget
+    is spent. Stable categories add nothing to that objective, so they stay
+    at the floor and the requests go to the volatile ones. No category is
+    bought more than one crawl per slot.
+    """
+    now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    rows = {(r, c): (products, rate, last_run) for r, c, products, rate, last_run in model.categories()}
+    for retailer in {r for r, _ in rows}:
+        for category in category_urls(retailer):
+            rows.setdefault((retailer, category), (0, None, None))
+    known = [rate for _, rate, _ in rows.values() if rate is not None]
+    fallback = sorted(known)[len(known) // 2] if known else DEFAULT_RATE
+
+    units = {}
+    for retailer in {r for r, _ in rows}:
+        costs = crawl_costs(retailer, {c: p for (r, c), (p, _, _) in rows.items() if r == retailer}, archive_root)
+        for (r, category), (products, rate, last_run) in rows.items():
+            if r == retailer:
+                units[(r, category)] = {
+                    "retailer": r,
+                    "category": category,
+                    "products": products,
+                    "rate": fallback if rate is None else rate,
+                    "pages": costs[category],
+                    "last_run": last_run,
+                    "level": 0,
+                }
+
+    def weight(unit):
+        return max(unit["products"], 1) * unit["rate"]
+
+    def upgrade(key):
+        unit = units[key]
+        if unit["level"] + 1 >= len(FREQUENCIES) or FREQUENCIES[unit["level"] + 1] > 24 / slot_hours:
+            return None
+        low, high = FREQUENCIES[unit["level"]], FREQUENCIES[unit["level"] + 1]
+        gain = weight(unit) * (freshness(unit["rate"], high) - freshness(unit["rate"], low))
+        extra = unit["pages"] * (high - low)
+        return (-gain / extra, key, extra) if gain > 0 else None
+
+    spent = sum(unit["pages"] * FREQUENCIES[0] for unit in units.values())
+    heap = [step for step in map(upgrade, units) if step]
+    heapq.heapify(heap)
+    while heap:
+        _, key, extra = heapq.heappop(heap)
+        if spent + extra > budget:
+            continue
+        spent += extra
+        units[key]["level"] += 1
+        step = upgrade(key)
+        if step:
+            heapq.heappush(heap, step)
+
+    slots = _lay_out(units.values(), now, hours, slot_hours)
+    return _summary(units.values(), slots, budget, spent, hours, slot_hours, baseline_per_day, now)
+
+
+def _lay_out(units, now, hours, slot_hours):
+    """Place each category's crawls into time slots, spreading first crawls to even out the load"""
+    count = max(1, int(hours // slot_hours))
+    slots = [{"start": (now + timedelta(hours=n * slot_hours)).isoformat(timespec="seconds"), "requests": 0,
+              "crawls": []} for n in range(count)]
+    for unit in sorted(units, key=lambda u: -u["pages"]):
+        # plan() caps frequencies at one crawl per slot; the floor also covers slots over a day long
+        interval = max(1.0, 24 / FREQUENCIES[unit["level"]] / slot_hours)
+        if unit["last_run"]:
+            due = (datetime.fromisoformat(unit["last_run"]) + timedelta(hours=interval * slot_hours) - now)
+            first = max(0.0, due.total_seconds() / 3600 / slot_hours)
+        else:
+            first = 0.0
+        if first >= count:
+            continue
+        # An overdue or newly due category may start anywhere in its first interval
+        window = range(int(first), min(count, int(first + interval) if first == 0 else int(first) + 1))
+        start = min(window, key=lambda n: (slots[n]["requests"], n))
+        position = float(start)
+        while position < count:
+            slot = slots[int(position)]
+            slot["crawls"].append({"retailer": unit["retailer"], "category": unit["category"], "pages": unit["pages"]})
+            slot["requests"] += unit["pages"]
+            position += interval
+    return slots
+
+
+def _summary(units, slots, budget, spent, hours, slot_hours, baseline_per_day, now):
+    units = sorted(units, key=lambda u: (-FREQUENCIES[u["level"]], -u["rate"]))
+    rates = sorted(u["rate"] for u in units)
+    volatile_floor = rates[int(len(rates) * 0.75)] if rates else 0
+
+    def change_weighted(per_day):
+        total = sum(max(u["products"], 1) * u["rate"] for u in units) or 1
+        return sum(max(u["products"], 1) * u["rate"] * freshness(u["rate"], per_day(u)) for u in units) / total
+
+    def volatile(per_day):
+        hot = [u for u in units if u["rate"] >= volatile_floor] or units
+        total = sum(max(u["products"], 1) for u in hot) or 1
+        return sum(max(u["products"], 1) * freshness(u["rate"], per_day(u)) for u in hot) / total
+
+    planned = lambda u: FREQUENCIES[u["level"]]
+    baseline = lambda u: baseline_per_day
+    return {
+        "generated_at": now.isoformat(timespec="seconds"),
+        "window_hours": hours,
+        "slot_hours": slot_hours,
+        "budget_per_day": budget,
+        "requests_per_day": round(spent, 1),
+        "baseline_requests_per_day": round(sum(u["pages"] * baseline_per_day for u in units), 1),
+        "freshness": {
+            "plan": round(change_weighted(planned), 4),
+            "baseline": round(change_weighted(baseline), 4),
+            "volatile_plan": round(volatile(planned), 4),
+            "volatile_baseline": round(volatile(baseline), 4),
+        },
+        "categories": [
+            {
+                "priority": n,
+                "retailer": u["retailer"],
+                "category": u["category"],
+                "products": u["products"],
+                "rate": round(u["rate"], 4),
+                "pages": u["pages"],
+                "crawls_per_day": round(FREQUENCIES[u["level"]], 3),
+                "interval_hours": round(24 / FREQUENCIES[u["level"]], 1),
+            }
+            for n, u in enumerate(units, start=1)
+        ],
+        "slots": slots,
+    }
+
+
+def due(crawl_plan, now=None):
+    """``{retailer: [categories]}`` planned for the slot that contains ``now``"""
+    now = now or datetime.now()
+    current = None
+    for slot in crawl_plan["slots"]:
+        if datetime.fromisoformat(slot["start"]) <= now:
+            current = slot
+    if current is None or now >= datetime.fromisoformat(current["start"]) + timedelta(hours=crawl_plan["slot_hours"]):
+        return {}
+    categories = {}
+    for crawl in current["crawls"]:
+        categories.setdefault(crawl["retailer"], []).append(crawl["category"])
+    return categories
+
+
+if __name__ == "__main__":
+    from shared.search import SNAPSHOTS, discover_snapshots
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=SCHEDULE_PATH, help="change model path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    learn_cmd = sub.add_parser("learn", help="learn change rates from new snapshots")
+    learn_cmd.add_argument("retailer", nargs="?", choices=list(SNAPSHOTS))
+    learn_cmd.add_argument("paths", nargs="*", help="legacy .json snapshots or NDJSON segment stems")
+    learn_cmd.add_argument("--all", action="store_true", help="every snapshot in the scraper directories")
+    rates_cmd = sub.add_parser("rates", help="learned change rate per category")
+    rates_cmd.add_argument("--retailer", choices=list(SNAPSHOTS))
+    hot_cmd = sub.add_parser("hot", help="fastest-changing products")
+    hot_cmd.add_argument("--retailer", choices=list(SNAPSHOTS))
+    hot_cmd.add_argument("--limit", type=int, default=20)
+    plan_cmd = sub.add_parser("plan", help="write a crawl plan that fits a request budget")
+    plan_cmd.add_argument("--budget", type=float, required=True, help="requests per day")
+    plan_cmd.add_argument("--hours", type=float, default=24, help="how far ahead to plan")
+    plan_cmd.add_argument("--slot-hours", type=float, default=1, help="granularity of the plan")
+    plan_cmd.add_argument("--baseline-per-day", type=float, default=1, help="current crawls per category per day")
+    plan_cmd.add_argument("--out", default=PLAN_PATH)
+    args = parser.parse_args()
+
+    model = ChangeModel(args.db)
+    if args.command == "learn":
+        if args.all:
+            snapshots = discover_snapshots()
+        elif args.retailer and args.paths:
+            snapshots = {args.retailer: args.paths}
+        else:
+            parser.error("learn needs --all or a retailer and snapshot paths")
+        history = HistoryStore()
+        for retailer, (runs, changes, skipped) in learn(model, snapshots, history).items():
+            print(f"{retailer:<8} {runs} runs | {changes} changes | {skipped} snapshots skipped")
+        history.close()
+    elif args.command == "rates":
+        print(f"{'retailer':<9}{'category':<32}{'products':>9}{'changes/day':>13}  last run")
+        for retailer, category, products, rate, last_run in model.categories(args.retailer):
+            shown = "-" if rate is None else f"{rate:.4f}"
+            print(f"{retailer:<9}{category:<32}{products:>9}{shown:>13}  {last_run}")
+    elif args.command == "hot":
+        for retailer, product_id, category, changes, rate in model.hot_products(args.limit, args.retailer):
+            print(f"{retailer:<9}{product_id:<24}{category:<32}{changes:>4} changes {rate:.3f}/day")
+    else:
+        crawl_plan = plan(model, args.budget, args.hours, args.slot_hours, args.baseline_per_day)
+        with open(args.out, "w") as f:
+            json.dump(crawl_plan, f, indent=2)
+        fresh = crawl_plan["freshness"]
+        print(f"{crawl_plan['requests_per_day']} requests/day (baseline {crawl_plan['baseline_requests_per_day']})")
+        print(f"Change-weighted freshness {fresh['plan']:.1%} (baseline {fresh['baseline']:.1%}) | "
+              f"volatile categories {fresh['volatile_plan']:.1%} (baseline {fresh['volatile_baseline']:.1%})")
+        for unit in crawl_plan["categories"][:15]:
+            print(f"  {unit['priority']:>3}. {unit['retailer']:<8} {unit['category']:<32} every "
+                  f"{unit['interval_hours']:>6.1f}h  ({unit['rate']:.3f} changes/product-day, {unit['pages']} pages)")
+        print(f"Plan written to {args.out}")
+    model.close()
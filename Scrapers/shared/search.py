@@ -0,0 +1,317 @@
+"""Search scraped products by text, price and category.
+
+Run from the Scrapers directory:
+    python -m shared.search index --all
+    python -m shared.search index zara Zara/zara_products_20250419_161318.json
+    python -m shared.search query "black oversized tee" --max-price 1500
+"""
+import argparse
+import glob
+import html
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from shared.catalog import MAPPERS, RETAILERS, iter_snapshot, normalize_category, normalize_price, normalize_url
+from shared.output import segment_paths, snapshot_mtime
+from shared.paths import STATE_DIR
+
+SEARCH_PATH = os.path.join(STATE_DIR, "search.sqlite3")
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# retailer -> (directory, snapshot file prefix), for --all
+SNAPSHOTS = {
+    "bonkers": ("Bonkers", "bonkers_products"),
+    "capsul": ("Capsul", "capsul_products"),
+    "snitch": ("Snitch", "snitch_processed"),
+    "zara": ("Zara", "zara_products"),
+}
+
+# Free-text fields beyond the title, per retailer
+DESCRIPTION_FIELDS = {"capsul": "description", "snitch": "short_description"}
+COLOR_FIELDS = {"snitch": ("color", "colors")}
+
+_WORD = re.compile(r"\w+")
+_SEGMENT = re.compile(r"-\d{4}\.ndjson(?:\.part)?$")
+
+
+def _colors(retailer, record):
+    colors = []
+    for field in COLOR_FIELDS.get(retailer, ()):
+        value = record.get(field)
+        colors.extend(value if isinstance(value, list) else [value] if value else [])
+    return " ".join(dict.fromkeys(colors))
+
+
+def to_row(retailer, record):
+    """Index row for one scraper record"""
+    product_id, title, price, url, category, images, _ = MAPPERS[retailer](record)
+    host = RETAILERS[retailer][0]
+    description = record.get(DESCRIPTION_FIELDS.get(retailer, ""))
+    return (
+        retailer,
+        str(product_id),
+        html.unescape(title or ""),
+        html.unescape(description) if description else None,
+        _colors(retailer, record),
+        normalize_price(price),
+        normalize_category(category),
+        normalize_url(url, host),
+        normalize_url(images[0], host) if images else None,
+    )
+
+
+def match_expression(text):
+    """Free text to an FTS5 query: every word must match, after stemming"""
+    return " ".join(f'"{word}"' for word in _WORD.findall(text))
+
+
+class SearchIndex:
+    """Inverted index over product text, plus B-tree indexes on price and category.
+
+    Text lives in an FTS5 table (porter-stemmed, so "tees" finds "tee")
+    kept in sync with ``products`` by triggers. Snapshots are ingested
+    incrementally: a file whose size and mtime are unchanged is skipped,
+    and a product is only re-indexed when one of its fields changed.
+    Products a retailer's latest snapshot no longer lists are pruned, so
+    they drop out of the text index too.
+    """
+
+    def __init__(self, path=SEARCH_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS products (
+                rowid INTEGER PRIMARY KEY,
+                retailer TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                colors TEXT,
+                price REAL,
+                category TEXT,
+                url TEXT,
+                image TEXT,
+                indexed_at TEXT NOT NULL,
+                UNIQUE (retailer, product_id)
+            );
+            CREATE INDEX IF NOT EXISTS products_by_price ON products (price);
+            CREATE INDEX IF NOT EXISTS products_by_category ON products (category, price);
+            CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5 (
+                title, description, colors,
+                content='products', content_rowid='rowid',
+                tokenize='porter unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+                INSERT INTO terms (rowid, title, description, colors)
+                VALUES (new.rowid, new.title, new.description, new.colors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+                INSERT INTO terms (terms, rowid, title, description, colors)
+                VALUES ('delete', old.rowid, old.title, old.description, old.colors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE OF title, description, colors ON products BEGIN
+                INSERT INTO terms (terms, rowid, title, description, colors)
+                VALUES ('delete', old.rowid, old.title, old.description, old.colors);
+                INSERT INTO terms (rowid, title, description, colors)
+                VALUES (new.rowid, new.title, new.description, new.colors);
+            END;
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            );"""
+        )
+        # Title hits outweigh color hits, which outweigh description hits
+        self.conn.execute("INSERT INTO terms (terms, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')")
+        self.conn.commit()
+
+    def upsert(self, rows):
+        """Insert or refresh index rows; returns how many were inserted or changed"""
+        return self.conn.executemany(
+            """INSERT INTO products (retailer, product_id, title, description, colors, price, category, url, image,
+                                     indexed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (retailer, product_id) DO UPDATE SET
+                   title = excluded.title, description = excluded.description, colors = excluded.colors,
+                   price = excluded.price, category = excluded.category, url = excluded.url,
+                   image = excluded.image, indexed_at = excluded.indexed_at
+               WHERE title IS NOT excluded.title OR description IS NOT excluded.description
+                   OR colors IS NOT excluded.colors OR price IS NOT excluded.price
+                   OR category IS NOT excluded.category OR url IS NOT excluded.url
+                   OR image IS NOT excluded.image""",
+            [(*row, datetime.now().isoformat()) for row in rows],
+        ).rowcount
+
+    def prune(self, retailer, product_ids, categories):
+        """Delete the retailer's products in ``categories`` that are not in ``product_ids``; returns the count.
+
+        Only the categories a snapshot covered are pruned, so a run of a
+        few categories leaves the others alone.
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS listed (product_id TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM listed")
+        self.conn.executemany("INSERT OR IGNORE INTO listed VALUES (?)", ((pid,) for pid in product_ids))
+        return self.conn.executemany(
+            """DELETE FROM products WHERE retailer = ? AND category IS ?
+               AND product_id NOT IN (SELECT product_id FROM listed)""",
+            [(retailer, category) for category in categories],
+        ).rowcount
+
+    def add_snapshot(self, retailer, path, batch_size=5000, prune=False):
+        """Index one snapshot unless it is unchanged since it was last indexed.
+
+        With ``prune``, the snapshot is taken as the retailer's current
+        listing, and products it no longer has are deleted. Returns
+        ``(added, updated, removed)``, or None when the snapshot was skipped.
+        """
+        files = [path] if os.path.exists(path) else segment_paths(path)
+        if not files:
+            raise FileNotFoundError(path)
+        mtime = max(os.path.getmtime(f) for f in files)
+        size = sum(os.path.getsize(f) for f in files)
+        key = os.path.abspath(path)
+        if self.conn.execute(
+            "SELECT 1 FROM sources WHERE path = ? AND mtime = ? AND size = ?", (key, mtime, size)
+        ).fetchone():
+            return None
+
+        before = self.count()
+        written = 0
+        product_ids, categories = set(), set()
+        batch = []
+        for record in iter_snapshot(path):
+            row = to_row(retailer, record)
+            product_ids.add(row[1])
+            categories.add(row[6])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                written, batch = written + self.upsert(batch), []
+        written += self.upsert(batch)
+        added = self.count() - before
+        removed = self.prune(retailer, product_ids, categories) if prune else 0
+        self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (key, mtime, size))
+        self.conn.commit()
+        return added, written - added, removed
+
+    def search(self, text=None, min_price=None, max_price=None, category=None, retailer=None, limit=20):
+        """Products matching every filter given, best text match first (else cheapest first).
+
+        ``category`` is a normalized category name or a glob such as ``mens_*``.
+        """
+        where, params = [], []
+        if text:
+            where.append("terms MATCH ?")
+            params.append(match_expression(text))
+        if min_price is not None:
+            where.append("p.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("p.price <= ?")
+            params.append(max_price)
+        if category:
+            where.append("p.category GLOB ?" if any(c in category for c in "*?[") else "p.category = ?")
+            params.append(category)
+        if retailer:
+            where.append("p.retailer = ?")
+            params.append(retailer)
+
+        columns = "p.retailer, p.product_id, p.title, p.price, p.category, p.url, p.image"
+        if text:
+            query = (f"SELECT {columns} FROM terms JOIN products p ON p.rowid = terms.rowid "
+                     f"WHERE {' AND '.join(where)} ORDER BY terms.rank")
+        else:
+            query = f"SELECT {columns} FROM products p"
+            if where:
+                query += f" WHERE {' AND '.join(where)}"
+            # A price bound already excludes unpriced rows
+            bounded = min_price is not None or max_price is not None
+            query += " ORDER BY p.price" if bounded else " ORDER BY p.price IS NULL, p.price"
+        rows = self.conn.execute(f"{query} LIMIT ?", (*params, limit)).fetchall()
+        keys = ("retailer", "product_id", "title", "price", "category", "url", "image")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def discover_snapshots(root=SCRAPERS_DIR):
+    """``{retailer: [paths]}`` of every JSON snapshot and NDJSON stem under the scraper directories"""
+    found = {}
+    for retailer, (directory, prefix) in SNAPSHOTS.items():
+        base = os.path.join(root, directory, prefix)
+        paths = sorted(glob.glob(f"{glob.escape(base)}*.json"))
+        stems = {_SEGMENT.sub("", p) for p in glob.glob(f"{glob.escape(base)}*.ndjson*")}
+        found[retailer] = paths + sorted(stems)
+    return found
+
+
+def update(index, snapshots):
+    """Index ``{retailer: [paths]}`` oldest first; returns ``{retailer: (added, updated, removed, skipped)}``.
+
+    Each retailer's newest snapshot is indexed last and prunes the
+    products it no longer lists.
+    """
+    totals = {}
+    for retailer, paths in snapshots.items():
+        added = updated = removed = skipped = 0
+        paths = sorted(paths, key=snapshot_mtime)
+        for n, path in enumerate(paths, 1):
+            result = index.add_snapshot(retailer, path, prune=n == len(paths))
+            if result is None:
+                skipped += 1
+                continue
+            added += result[0]
+            updated += result[1]
+            removed += result[2]
+        totals[retailer] = (added, updated, removed, skipped)
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=SEARCH_PATH, help="search index path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_cmd = sub.add_parser("index", help="add snapshots to the index")
+    index_cmd.add_argument("retailer", nargs="?", choices=list(SNAPSHOTS))
+    index_cmd.add_argument("paths", nargs="*", help="legacy .json snapshots or NDJSON segment stems")
+    index_cmd.add_argument("--all", action="store_true", help="every snapshot in the scraper directories")
+    query_cmd = sub.add_parser("query", help="search the index")
+    query_cmd.add_argument("text", nargs="?", help='words that must all match, e.g. "black oversized tee"')
+    query_cmd.add_argument("--min-price", type=float)
+    query_cmd.add_argument("--max-price", type=float)
+    query_cmd.add_argument("--category", help="normalized category or glob, e.g. mens_*")
+    query_cmd.add_argument("--retailer", choices=list(SNAPSHOTS))
+    query_cmd.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = SearchIndex(args.db)
+    if args.command == "index":
+        if args.all:
+            snapshots = discover_snapshots()
+        elif args.retailer and args.paths:
+            snapshots = {args.retailer: args.paths}
+        else:
+            parser.error("index needs --all or a retailer and snapshot paths")
+        for retailer, (added, updated, removed, skipped) in update(index, snapshots).items():
+            print(f"{retailer:<8} +{added} new | {updated} updated | -{removed} delisted"
+                  f" | {skipped} unchanged snapshots skipped")
+        print(f"{index.count()} products indexed")
+    else:
+        started = time.perf_counter()
+        results = index.search(
+            args.text, args.min_price, args.max_price, args.category, args.retailer, args.limit
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        for r in results:
+            price = "-" if r["price"] is None else f"₹{r['price']:,.0f}"
+            print(f"{r['retailer']:<8} {price:>8}  {r['title'][:60]:<60}  {r['url']}")
+        print(f"{len(results)} results in {elapsed:.1f} ms")
+    index.close()
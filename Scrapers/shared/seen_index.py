@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from shared.paths import STATE_DIR
+
+INDEX_PATH = os.path.join(STATE_DIR, "seen_index.sqlite3")
+
+
+class SeenIndex:
+    """SQLite index of every product ID each retailer has produced.
+
+    Rows are keyed by ``(retailer, product_id)`` and carry first-seen and
+    last-seen timestamps, so dedup is a primary-key lookup and startup does
+    not depend on how much history exists. Crawl checkpoints live in the
+    same database so a cursor and the IDs it covers commit together.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS seen (
+                retailer TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                PRIMARY KEY (retailer, product_id)
+            ) WITHOUT ROWID"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                retailer TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def last_seen(self, retailer, product_id):
+        row = self.conn.execute(
+            "SELECT last_seen FROM seen WHERE retailer = ? AND product_id = ?",
+            (retailer, str(product_id)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def mark(self, retailer, product_ids, seen_at):
+        """Record product IDs as seen at ``seen_at``; keeps the original first_seen"""
+        self.conn.executemany(
+            """INSERT INTO seen (retailer, product_id, first_seen, last_seen) VALUES (?, ?, ?, ?)
+               ON CONFLICT (retailer, product_id) DO UPDATE SET
+                   first_seen = MIN(first_seen, excluded.first_seen),
+                   last_seen = MAX(last_seen, excluded.last_seen)""",
+            [(retailer, str(pid), seen_at, seen_at) for pid in product_ids],
+        )
+
+    def load_checkpoint(self, retailer):
+        row = self.conn.execute("SELECT state FROM checkpoints WHERE retailer = ?", (retailer,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_checkpoint(self, retailer, state):
+        """Stage a checkpoint; it becomes durable with the next ``commit``"""
+        self.conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?)", (retailer, json.dumps(state)))
+
+    def clear_checkpoint(self, retailer):
+        self.conn.execute("DELETE FROM checkpoints WHERE retailer = ?", (retailer,))
+        self.conn.commit()
+
+    def count(self, retailer):
+        return self.conn.execute("SELECT COUNT(*) FROM seen WHERE retailer = ?", (retailer,)).fetchone()[0]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def import_snapshots(self, retailer, paths, id_field="id"):
+        """One-time import of legacy JSON/NDJSON snapshots.
+
+        The file's modification time stands in for when its products were
+        seen. Returns the number of records read.
+        """
+        total = 0
+        for path in paths:
+            seen_at = datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            with open(path, "r") as f:
+                if path.endswith(".json"):
+                    records = json.load(f)
+                else:
+                    records = [json.loads(line) for line in f if line.strip()]
+            self.mark(retailer, [r[id_field] for r in records if id_field in r], seen_at)
+            total += len(records)
+        self.commit()
+        return total
+
+
+class SeenIds:
+    """Set-like view of one retailer's rows in a ``SeenIndex``.
+
+    With ``since`` only products seen at or after that timestamp count as
+    seen, which gives per-run dedup (Bonkers, Zara) while still recording
+    history; without it every product ever seen counts (Snitch, Capsul).
+    With ``commit_every=None`` IDs are only written by explicit flushes,
+    which is what checkpointed crawls need.
+    """
+
+    def __init__(self, index, retailer, since=None, commit_every=500):
+        self.index = index
+        self.retailer = retailer
+        self.since = since
+        self.run_at = since or datetime.now().isoformat()
+        self.commit_every = commit_every
+        self._added = set()
+        self._pending = []
+
+    def __contains__(self, product_id):
+        product_id = str(product_id)
+        if product_id in self._added:
+            return True
+        last_seen = self.index.last_seen(self.retailer, product_id)
+        if last_seen is None:
+            return False
+        return self.since is None or last_seen >= self.since
+
+    def add(self, product_id):
+        product_id = str(product_id)
+        if product_id in self._added:
+            return
+        self._added.add(product_id)
+        self._pending.append(product_id)
+        if self.commit_every and len(self._pending) >= self.commit_every:
+            self.flush()
+
+    def __len__(self):
+        return len(self._added)
+
+    def flush(self, commit=True):
+        """Write IDs added this run to the index"""
+        if self._pending:
+            self.index.mark(self.retailer, self._pending, self.run_at)
+            self._pending = []
+        if commit:
+            self.index.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import existing JSON snapshots into the seen-ID index")
+    parser.add_argument("retailer", choices=["bonkers", "capsul", "snitch", "zara"])
+    parser.add_argument("paths", nargs="+", help="snapshot files, e.g. Snitch/snitch_processed_*.json")
+    parser.add_argument("--index", default=INDEX_PATH, help="index database path")
+    args = parser.parse_args()
+
+    index = SeenIndex(args.index)
+    total = index.import_snapshots(args.retailer, args.paths)
+    print(f"Imported {total} records; {index.count(args.retailer)} unique {args.retailer} products indexed")
+    index.close()
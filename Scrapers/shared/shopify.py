@@ -0,0 +1,66 @@
+import html
+import re
+
+from shared.fetcher import check_page
+
+# Largest page Shopify's storefront products.json serves
+MAX_LIMIT = 250
+
+_TAG = re.compile(r"<[^>]+>")
+_SPACE = re.compile(r"\s+")
+
+
+def products_json_url(collection_url):
+    """``/collections/<handle>`` -> ``/collections/<handle>/products.json``"""
+    return f"{collection_url.rstrip('/')}/products.json"
+
+
+def _decode(response):
+    if response is None or response.status_code != 200:
+        return None
+    return response.json().get("products")
+
+
+async def fetch_collection(engine, collection_url, label=None, limit=MAX_LIMIT):
+    """Every product of a collection as raw products.json pages, in order.
+
+    A page shorter than ``limit`` is the last one, so a collection of up
+    to ``limit`` products costs a single request. A failed page raises
+    ``PageFailed``.
+    """
+    pages = []
+    page = 1
+    while True:
+        url = products_json_url(collection_url)
+        response, products = await engine.fetch_parsed(
+            url,
+            _decode,
+            params={"limit": limit, "page": page},
+            retries=2,
+            label=label,
+        )
+        check_page(url, response)
+        if not products:
+            break
+        pages.append(products)
+        if len(products) < limit:
+            break
+        page += 1
+    return pages
+
+
+def lowest_price(product):
+    """Cheapest variant price as a float, or None"""
+    prices = [float(v["price"]) for v in product.get("variants", []) if v.get("price") is not None]
+    return min(prices) if prices else None
+
+
+def image_urls(product):
+    return [image["src"] for image in product.get("images", []) if image.get("src")]
+
+
+def plain_text(body_html):
+    """``body_html`` with tags dropped and entities decoded"""
+    if not body_html:
+        return ""
+    return _SPACE.sub(" ", html.unescape(_TAG.sub(" ", body_html))).strip()
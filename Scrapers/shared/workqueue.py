@@ -0,0 +1,415 @@
+"""Durable crawl frontier: leased category/page tasks shared by many workers.
+
+Run from the Scrapers directory. With ``--shared-volume``, ``--db`` may sit on a
+volume several hosts mount, as long as it honours POSIX file locks:
+    python -m shared.workqueue seed run1 --retailers bonkers zara
+    python -m shared.workqueue --shared-volume work run1 --processes 4      # on every crawl box
+    python -m shared.workqueue status run1
+    python -m shared.workqueue merge run1
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+
+from shared.archive import PageParser, RawArchive, category_urls, load_constants
+from shared.fetcher import check_page
+from shared.output import NdjsonWriter
+from shared.paths import STATE_DIR
+from shared.ratelimit import shared_limiter
+
+QUEUE_PATH = os.path.join(STATE_DIR, "crawl_queue.sqlite3")
+
+ALL_RETAILERS = ["bonkers", "capsul", "snitch", "zara"]
+# Products per Snitch API page, the most the API allows
+SNITCH_LIMIT = 50
+
+
+class CrawlQueue:
+    """SQLite task table with leases, visibility timeouts and retry counts.
+
+    A worker leases a pending task, or one whose lease expired, for
+    ``visibility`` seconds. Completing it stores the parsed records, marks
+    it done and enqueues the pages it led to in one transaction, and only
+    if the worker still holds the lease, so a task that timed out and was
+    re-leased elsewhere is never recorded twice. A task that fails
+    ``max_attempts`` times is marked failed. Every write is one short
+    transaction. WAL mode lets readers run alongside the writer, but its
+    shared-memory index only works between processes on one host, so a
+    ``shared`` queue, used from several hosts, keeps a rollback journal.
+    """
+
+    def __init__(self, path=QUEUE_PATH, max_attempts=3, shared=False):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute(f"PRAGMA journal_mode={'DELETE' if shared else 'WAL'}")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                retailer TEXT NOT NULL,
+                category TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                error TEXT,
+                updated_at TEXT,
+                UNIQUE (run_id, retailer, category, page)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, lease_expires);
+            CREATE TABLE IF NOT EXISTS results (
+                task_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                product_id TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (task_id, position)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            );"""
+        )
+
+    def _write(self):
+        """Start a transaction that takes the write lock up front"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, run_id, retailer, category, page, url, seq=0):
+        self.conn.execute(
+            """INSERT OR IGNORE INTO tasks (run_id, retailer, category, seq, page, url, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (run_id, retailer, category, seq, page, url, datetime.now().isoformat()),
+        )
+
+    def lease(self, worker, retailers, visibility=120, run_id=None):
+        """Claim the next ready task for one of ``retailers``; returns a dict or None"""
+        now = time.time()
+        marks = ",".join("?" * len(retailers))
+        run_filter, run_args = ("AND run_id = ?", (run_id,)) if run_id else ("", ())
+        self._write()
+        try:
+            row = self.conn.execute(
+                f"""SELECT id, run_id, retailer, category, page, url, attempts FROM tasks
+                    WHERE retailer IN ({marks}) {run_filter}
+                      AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                    ORDER BY seq, page LIMIT 1""",
+                (*retailers, *run_args, now),
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            task_id = row[0]
+            if row[6] >= self.max_attempts:
+                # Its last lease expired without a result
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'failed', error = 'lease expired', lease_owner = NULL WHERE id = ?",
+                    (task_id,),
+                )
+                self.conn.execute("COMMIT")
+                return self.lease(worker, retailers, visibility, run_id)
+            self.conn.execute(
+                """UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?,
+                   lease_expires = ?, updated_at = ? WHERE id = ?""",
+                (worker, now + visibility, datetime.now().isoformat(), task_id),
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        keys = ("id", "run_id", "retailer", "category", "page", "url", "attempts")
+        return dict(zip(keys, row[:6] + (row[6] + 1,)))
+
+    def reserve_host(self, url, rate):
+        """Book the next request slot for ``url``'s host at ``rate`` requests/s; returns the wait.
+
+        Slots come from one row per host, so every worker on every box
+        draws from the same schedule and together they keep to one rate.
+        """
+        host = urlparse(url).netloc or url
+        self._write()
+        try:
+            row = self.conn.execute("SELECT next_at FROM hosts WHERE host = ?", (host,)).fetchone()
+            now = time.time()
+            start = max(now, row[0]) if row else now
+            self.conn.execute("INSERT OR REPLACE INTO hosts VALUES (?, ?)", (host, start + 1 / rate))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return start - now
+
+    def extend(self, task, worker, visibility=120):
+        """Push a held lease's deadline out; False if the lease was lost"""
+        return self.conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + visibility, task["id"], worker),
+        ).rowcount == 1
+
+    def complete(self, task, worker, records, next_pages=()):
+        """Store a task's records and enqueue ``next_pages`` of its category; False if the lease was lost"""
+        self._write()
+        try:
+            done = self.conn.execute(
+                """UPDATE tasks SET status = 'done', lease_owner = NULL, error = NULL, updated_at = ?
+                   WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (datetime.now().isoformat(), task["id"], worker),
+            ).rowcount
+            if not done:
+                self.conn.execute("ROLLBACK")
+                return False
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                [(task["id"], n, str(r["id"]), json.dumps(r, ensure_ascii=False)) for n, r in enumerate(records)],
+            )
+            if next_pages:
+                seq = self.conn.execute("SELECT seq FROM tasks WHERE id = ?", (task["id"],)).fetchone()[0]
+                for page in next_pages:
+                    self.enqueue(task["run_id"], task["retailer"], task["category"], page, task["url"], seq)
+            self.conn.execute("COMMIT")
+            return True
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def fail(self, task, worker, error):
+        """Give a task back for retry, or mark it failed after ``max_attempts``"""
+        self.conn.execute(
+            """UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+               lease_owner = NULL, lease_expires = NULL, error = ?, updated_at = ?
+               WHERE id = ? AND lease_owner = ?""",
+            (self.max_attempts, error, datetime.now().isoformat(), task["id"], worker),
+        )
+
+    def status(self, run_id):
+        """``{retailer: {status: count}}`` for one run"""
+        counts = {}
+        for retailer, status, count in self.conn.execute(
+            "SELECT retailer, status, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY retailer, status", (run_id,)
+        ):
+            counts.setdefault(retailer, {})[status] = count
+        return counts
+
+    def outstanding(self, run_id, retailers):
+        marks = ",".join("?" * len(retailers))
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM tasks WHERE run_id = ? AND retailer IN ({marks}) AND status IN ('pending', 'leased')",
+            (run_id, *retailers),
+        ).fetchone()[0]
+
+    def records(self, run_id, retailer):
+        """``(category, product_id, record)`` in crawl order: category, then page, then position"""
+        return self.conn.execute(
+            """SELECT t.category, r.product_id, r.record FROM results r JOIN tasks t ON t.id = r.task_id
+               WHERE t.run_id = ? AND t.retailer = ? ORDER BY t.seq, t.page, r.position""",
+            (run_id, retailer),
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def seed(queue, run_id, retailers):
+    """Enqueue page 1 of every category of ``retailers``; returns the task count"""
+    count = 0
+    for retailer in retailers:
+        for seq, (category, url) in enumerate(category_urls(retailer).items()):
+            queue.enqueue(run_id, retailer, category, 1, url, seq)
+            count += 1
+    return count
+
+
+class TaskHandlers:
+    """Fetch one page task, archive the body and parse it with ``PageParser``.
+
+    ``parse`` returns ``(records, next_pages)``. Listings are walked one
+    page after another, except Snitch: its first page reports
+    ``total_count``, so every other page is queued at once and can be
+    fetched in parallel.
+
+    Requests carry the retailer's own scraper headers. Their pace comes
+    from the queue's shared per-host schedule, at the rate this process's
+    adaptive limiter currently allows the host, so adding workers does not
+    multiply the load on a retailer.
+    """
+
+    def __init__(self, retailers, queue):
+        self.parser = PageParser(retailers)
+        self.skipped = self.parser.skipped
+        self.retailers = list(self.parser.classes)
+        self.queue = queue
+        self.archives = {}
+        self.headers = {retailer: self.parser.headers(retailer) for retailer in self.retailers}
+        self.rates = {retailer: load_constants(retailer).REQUESTS_PER_SECOND for retailer in self.retailers}
+        self.limiter = shared_limiter()
+        self.session = requests.Session()
+
+    def _get(self, task, params=None):
+        url = task["url"]
+        self.limiter.configure(url, self.rates[task["retailer"]])
+        bucket = self.limiter.bucket(url)
+        wait = max(self.queue.reserve_host(url, bucket.rate), bucket.blocked_until - time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.session.get(url, params=params, headers=self.headers[task["retailer"]], timeout=30)
+            return response
+        finally:
+            self.limiter.feedback(url, response, time.perf_counter() - started)
+
+    def _params(self, task):
+        retailer = task["retailer"]
+        if retailer == "zara":
+            return {"v1": int(time.time() * 1000), "regionGroupId": "80", "ajax": "true", "page": task["page"]}
+        if retailer == "snitch":
+            return {"page": task["page"], "limit": SNITCH_LIMIT}
+        if retailer == "bonkers":
+            return {"page": task["page"]}
+        # A Capsul collection is one ld+json page
+        return None
+
+    def _archive(self, task):
+        key = (task["retailer"], task["run_id"])
+        if key not in self.archives:
+            self.archives[key] = RawArchive(*key)
+        return self.archives[key]
+
+    def fetch(self, task):
+        return self._get(task, self._params(task))
+
+    def parse(self, task, response):
+        retailer = task["retailer"]
+        # Any other error raises, so the worker gives the task back for a retry
+        check_page(task["url"], response)
+        if response.status_code == 404:
+            return [], []
+        self._archive(task).store(task["category"], response.url, response.content)
+        records, more = self.parser.parse(retailer, task["category"], response.url, response.content)
+        if retailer == "snitch":
+            if task["page"] != 1:
+                # Queued together with the rest of the feed by page 1
+                return records, []
+            total = json.loads(response.content).get("data", {}).get("total_count", 0)
+            return records, list(range(2, math.ceil(total / SNITCH_LIMIT) + 1))
+        return records, [task["page"] + 1] if more else []
+
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+
+
+def work(path, run_id, retailers, worker=None, visibility=120, idle_wait=2.0, shared=False):
+    """Lease and run tasks until ``run_id`` has nothing pending for these retailers"""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = CrawlQueue(path, shared=shared)
+    handlers = TaskHandlers(retailers, queue)
+    for retailer, reason in handlers.skipped.items():
+        print(f"[{worker}] skipping {retailer}: {reason}")
+    available = handlers.retailers
+    done = failed = 0
+    while available:
+        task = queue.lease(worker, available, visibility, run_id)
+        if task is None:
+            # Other workers may still enqueue next pages from leased tasks
+            if not queue.outstanding(run_id, available):
+                break
+            time.sleep(idle_wait)
+            continue
+        try:
+            response = handlers.fetch(task)
+            # The rate limiter may have held the fetch back for a while; renew the
+            # lease before parsing, or drop the page if another worker took it over
+            if not queue.extend(task, worker, visibility):
+                continue
+            records, next_pages = handlers.parse(task, response)
+        except Exception as e:
+            queue.fail(task, worker, f"{type(e).__name__}: {e}")
+            failed += 1
+            continue
+        if queue.complete(task, worker, records, next_pages):
+            done += 1
+    handlers.limiter.save()
+    handlers.close()
+    queue.close()
+    print(f"[{worker}] {done} tasks done, {failed} failed attempts")
+    return done, failed
+
+
+def merge(queue, run_id, retailer, stem):
+    """Write one retailer's records to NDJSON in crawl order, first occurrence of each ID only"""
+    writer = NdjsonWriter(stem, ensure_ascii=False)
+    seen = set()
+    kept = 0
+    for _, product_id, record in queue.records(run_id, retailer):
+        if product_id in seen:
+            continue
+        seen.add(product_id)
+        writer.write(json.loads(record))
+        kept += 1
+    writer.close()
+    return kept
+
+
+def _work_process(path, run_id, retailers, worker, shared):
+    work(path, run_id, retailers, worker, shared=shared)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=QUEUE_PATH, help="queue database")
+    parser.add_argument("--shared-volume", action="store_true",
+                        help="--db is used from several hosts: rollback journal instead of WAL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    seed_cmd = sub.add_parser("seed", help="enqueue the first page of every category")
+    seed_cmd.add_argument("run_id")
+    seed_cmd.add_argument("--retailers", nargs="+", default=ALL_RETAILERS, choices=ALL_RETAILERS)
+    work_cmd = sub.add_parser("work", help="process tasks until the run is drained")
+    work_cmd.add_argument("run_id")
+    work_cmd.add_argument("--retailers", nargs="+", default=ALL_RETAILERS, choices=ALL_RETAILERS)
+    work_cmd.add_argument("--processes", type=int, default=1, help="worker processes on this host")
+    status_cmd = sub.add_parser("status", help="task counts by retailer and status")
+    status_cmd.add_argument("run_id")
+    merge_cmd = sub.add_parser("merge", help="write deduplicated NDJSON per retailer")
+    merge_cmd.add_argument("run_id")
+    merge_cmd.add_argument("--retailers", nargs="+", default=ALL_RETAILERS, choices=ALL_RETAILERS)
+    args = parser.parse_args()
+
+    if args.command == "work":
+        ctx = multiprocessing.get_context("spawn")
+        processes = [
+            ctx.Process(target=_work_process, args=(args.db, args.run_id, args.retailers,
+                                                    f"{socket.gethostname()}:{n}", args.shared_volume))
+            for n in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        sys.exit(0)
+
+    queue = CrawlQueue(args.db, shared=args.shared_volume)
+    if args.command == "seed":
+        print(f"Enqueued {seed(queue, args.run_id, args.retailers)} tasks for {args.run_id}")
+    elif args.command == "status":
+        for retailer, counts in queue.status(args.run_id).items():
+            print(f"{retailer:<8} " + " | ".join(f"{status} {count}" for status, count in sorted(counts.items())))
+    else:
+        for retailer in args.retailers:
+            stem = f"{retailer}_{args.run_id}"
+            print(f"{retailer:<8} {merge(queue, args.run_id, retailer, stem)} products -> {stem}-*.ndjson")
+    queue.close()
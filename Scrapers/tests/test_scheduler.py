@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from shared.archive import category_urls
+from shared.scheduler import ChangeModel, plan
+
+
+def churning_model(path, retailer="zara", runs=4):
+    """A model whose categories replace most of their products every run"""
+    model = ChangeModel(str(path))
+    start = datetime(2025, 3, 1)
+    for run in range(runs):
+        rows = [
+            (f"{category}-{run}-{n}", 1000, category)
+            for category in category_urls(retailer)
+            for n in range(20)
+        ]
+        model.add_run(retailer, (start + timedelta(hours=run)).isoformat(), rows)
+    return model
+
+
+def test_saturated_plan_books_at_most_one_crawl_per_slot(tmp_path):
+    model = churning_model(tmp_path / "schedule.sqlite3")
+    for slot_hours in (2, 3, 5):
+        crawl_plan = plan(model, budget=1e6, slot_hours=slot_hours, now=datetime(2025, 3, 2),
+                          archive_root=str(tmp_path))
+        slots = crawl_plan["slots"]
+        for unit in crawl_plan["categories"]:
+            assert unit["crawls_per_day"] <= 24 / slot_hours
+            booked = sum(
+                1 for slot in slots for crawl in slot["crawls"]
+                if (crawl["retailer"], crawl["category"]) == (unit["retailer"], unit["category"])
+            )
+            assert booked <= len(slots)
+        booked_requests = sum(slot["requests"] for slot in slots)
+        assert booked_requests <= crawl_plan["requests_per_day"] * crawl_plan["window_hours"] / 24 + 1e-6
+    model.close()
+
+
+def test_planned_run_does_not_read_dedup_moves_as_changes(tmp_path):
+    model = ChangeModel(str(tmp_path / "schedule.sqlite3"))
+    first, second = list(category_urls("zara"))[:2]
+    shared = [f"both-{n}" for n in range(10)]
+    only_second = [f"second-{n}" for n in range(10)]
+    # A full run records the products listed in both categories under the first one
+    full = [(pid, 1000, first) for pid in shared] + [(pid, 1000, second) for pid in only_second]
+    model.add_run("zara", "2025-03-01T00:00:00", full)
+    # A planned run of the second category alone finds them there instead
+    planned = [(pid, 1000, second) for pid in shared + only_second]
+    assert model.add_run("zara", "2025-03-01T06:00:00", planned) == {second: 0}
+    # A product the first category no longer lists is a change when it turns up in the second
+    model.add_run("zara", "2025-03-02T00:00:00", full[1:])
+    assert model.add_run("zara", "2025-03-02T06:00:00", planned)[second] == 1
+    model.close()
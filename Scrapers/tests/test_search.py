@@ -0,0 +1,38 @@
+import json
+import os
+
+from shared.search import SearchIndex, update
+
+
+def write_snapshot(path, products, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(products, f)
+    os.utime(path, (mtime, mtime))
+
+
+def product(product_id, category, price="Rs. 1,299.00"):
+    return {
+        "id": product_id, "name": f"Black oversized tee {product_id}", "price": price, "category": category,
+        "url": f"//www.zara.com/in/en/p{product_id}.html", "images": [], "timestamp": "2025-04-19T16:13:18",
+    }
+
+
+def test_latest_snapshot_prunes_delisted_products_in_its_categories(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    full = tmp_path / "zara_products_20250419_161318.json"
+    write_snapshot(full, [product(1, "Tees"), product(2, "Tees"), product(3, "Shirts")], 1000)
+    assert update(index, {"zara": [str(full)]}) == {"zara": (3, 0, 0, 0)}
+
+    # A run of the tees alone, where product 2 is gone and product 1 is cheaper
+    tees = tmp_path / "zara_products_20250420_060000.json"
+    write_snapshot(tees, [product(1, "Tees", "Rs. 999.00")], 2000)
+    assert update(index, {"zara": [str(tees), str(full)]}) == {"zara": (0, 1, 1, 1)}
+
+    assert {r["product_id"] for r in index.search("tee")} == {"1", "3"}
+    # Raises if the text index still holds the deleted product
+    index.conn.execute("INSERT INTO terms (terms, rank) VALUES ('integrity-check', 1)")
+    assert index.search(category="tees") == [{
+        "retailer": "zara", "product_id": "1", "title": "Black oversized tee 1", "price": 999.0,
+        "category": "tees", "url": "https://www.zara.com/in/en/p1.html", "image": None,
+    }]
+    index.close()